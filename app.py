@@ -1,19 +1,47 @@
 import os
-from flask import Flask, render_template, jsonify, request, send_file
-from flask_socketio import SocketIO, emit
-from sqlalchemy.orm import DeclarativeBase
+from flask import Flask, render_template, jsonify, request, send_file, g, Response, stream_with_context
+from flask_socketio import SocketIO, emit, join_room
 from database import db
 from utils.ai_engine import AIEngine
-import json, requests
+from utils.engine_registry import EngineRegistry
+from utils.persistence import EngineStore
+from utils.shared_engine import SharedEngineClient
+from utils.auth_cache import VerifiedKeyCache
+from utils.blob_store import BlobStore
+from utils.github_sync import (
+    GitHubClient, MODEL_FILE_EXTENSIONS, download_files, git_blob_sha, parse_repo_url, push_files
+)
+from utils.stream_readers import open_stream_reader, stream_format
+from utils.telemetry import TrainingTelemetry
+from utils.jobs import JobScheduler, JobCancelled, QueueFull, ACTIVE_STATUSES
+from utils.serving import MicroBatcher, VersionedCache
+from utils.metrics import MetricsRegistry, EngineMetrics, instrument_flask, instrument_socketio
+from utils.profiler import SamplingProfiler
+from utils.integrations import LazyService, huggingface_api, module, prewarm
+from utils.hf_datasets import (
+    DatasetSource, TTLCache, batched, check_dataset_id, infer_columns, iter_pairs, peek,
+    search_datasets
+)
+from utils.schema import upgrade_schema
+from utils.model_export import (
+    check_export_options, compress_stream, export_etag, export_filename,
+    iter_export_json, iter_export_msgpack
+)
+import atexit
+import click
+import itertools
+import threading
+from collections import defaultdict
+from contextlib import nullcontext
+import json
 from functools import wraps
-from datasets import load_dataset
-from huggingface_hub import list_datasets, HfApi, Repository
-from huggingface_hub.utils import RepositoryNotFoundError
-import time
 from werkzeug.utils import secure_filename
-import tempfile
-from github import Github
-import base64
+import hashlib
+import hmac
+import uuid
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import load_only, selectinload
 
 app = Flask(__name__)
 
@@ -27,11 +55,176 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "dev_key"
 socketio = SocketIO(app)
 db.init_app(app)
 
+# Route latency, SQL time per request, engine timings and Socket.IO volume,
+# scraped from /metrics
+metrics = MetricsRegistry()
+engine_metrics = EngineMetrics(metrics)
+metrics_enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+if metrics_enabled:
+    instrument_flask(app, metrics)
+    instrument_socketio(socketio, metrics)
+profiler = SamplingProfiler()
+
 # Import models after db initialization to avoid circular imports
-from models import TrainingData, AIMemory, Dataset, AIModel
+from models import Blob, Dataset, DatasetRow, AIModel, GitHubImport, Job
+
+# Training steps are coalesced into per-client frames instead of being
+# pushed to every client per sample
+telemetry = TrainingTelemetry(
+    lambda sid, frame, on_ack: socketio.emit('training_frame', frame, to=sid, callback=on_ack),
+    interval=float(os.environ.get("TELEMETRY_INTERVAL", 0.25)),
+    max_rate=float(os.environ.get("TELEMETRY_MAX_RATE", 4))
+)
+
+# The shared engine; opened by start_services()
+engine_store = None
+ai_engine = None
+
+def _open_shared_engine():
+    global engine_store, ai_engine
+    if os.environ.get("ENGINE_MODE") == "worker":
+        # Multi-process mode: reads come from the owner's memory-mapped index,
+        # training goes to the owner process (python -m utils.shared_engine)
+        ai_engine = SharedEngineClient(
+            os.environ.get("ENGINE_OWNER_ADDRESS", "/tmp/ai-engine.sock"),
+            os.environ.get("ENGINE_INDEX_PATH", "data/engine/patterns.idx"),
+            os.environ.get("ENGINE_AUTHKEY", "dev_key").encode()
+        )
+        return
+    # The shared engine is restored from its latest snapshot plus WAL tail
+    engine_store = EngineStore(
+        os.environ.get("ENGINE_DATA_DIR", "data/engine"),
+        snapshot_every=int(os.environ.get("ENGINE_SNAPSHOT_EVERY", 100000))
+    )
+    ai_engine = engine_store.load()
+    atexit.register(engine_store.close)
+    ai_engine.training_observer = telemetry.observer('shared', ai_engine)
+    if metrics_enabled:
+        ai_engine.metrics = engine_metrics.labelled('shared')
+
+# Hugging Face clients load on first use; importing `datasets` alone takes
+# most of a second. PREWARM_INTEGRATIONS=1 loads them in the background
+# shortly after startup instead
+hf_api = LazyService('huggingface_hub', huggingface_api)
+hf_datasets = LazyService('datasets', module('datasets'))
+integrations = [hf_api, hf_datasets]
+# Dataset ids naming a directory under HF_LOCAL_DATASETS_DIR are read from
+# disk instead of the Hub
+hf_source = DatasetSource(
+    lambda *args, **kwargs: hf_datasets.get().load_dataset(*args, **kwargs),
+    local_root=os.environ.get("HF_LOCAL_DATASETS_DIR")
+)
+hf_search_cache = TTLCache(ttl=float(os.environ.get("HF_SEARCH_CACHE_TTL", 300)))
+hf_preview_cache = TTLCache(ttl=float(os.environ.get("HF_SEARCH_CACHE_TTL", 300)))
+
+# Model artifacts live outside the database, named by their SHA-256
+blob_store = BlobStore(os.environ.get("BLOB_STORE_DIR", "data/blobs"))
+
+def _load_model_engine(model_id):
+    model = db.session.get(AIModel, model_id)
+    if model is None:
+        raise KeyError(model_id)
+    configuration = model.configuration or {}
+    engine = AIEngine.from_state(
+        (model.state or {}).get('engine'),
+        approximate_matching=configuration.get('approximate_matching', False)
+    )
+    engine.training_observer = telemetry.observer(model_id, engine)
+    if metrics_enabled:
+        engine.metrics = engine_metrics.labelled('model')
+    return engine
+
+def _save_model_engine(model_id, engine):
+    # Evictions happen inside whatever request needed room; a context of its
+    # own gives the write-back its own session, so that request's unfinished
+    # changes are not committed along with it
+    with app.app_context():
+        model = db.session.get(AIModel, model_id)
+        if model is None:
+            return
+        model.state = {**(model.state or {}), 'engine': engine.to_state()}
+        db.session.commit()
+
+max_engine_bytes = os.environ.get("ENGINE_CACHE_MAX_BYTES")
+engine_registry = EngineRegistry(
+    _load_model_engine,
+    _save_model_engine,
+    max_engines=int(os.environ.get("ENGINE_CACHE_MAX_ENGINES", 16)),
+    max_bytes=int(max_engine_bytes) if max_engine_bytes else None
+)
+
+def _flush_engines():
+    with app.app_context():
+        engine_registry.flush()
+
+# Bulk jobs write back when they finish; this catches everything else
+atexit.register(_flush_engines)
+
+verified_keys = VerifiedKeyCache(
+    max_entries=int(os.environ.get("API_KEY_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("API_KEY_CACHE_TTL", 300))
+)
+
+def _model_room(model_id):
+    return f"model:{model_id}"
+
+def _emit_to_models(event, payload, model_ids):
+    """Send to the clients that subscribed with one of these models' API keys"""
+    rooms = [_model_room(model_id) for model_id in model_ids if model_id is not None]
+    if rooms:
+        socketio.emit(event, payload, to=rooms)
 
-ai_engine = AIEngine()
-hf_api = HfApi()
+# Heavy operations run on a bounded pool of job workers; status is kept in
+# the job table and pushed as job_status events to the clients of the
+# models that may see the job
+job_scheduler = JobScheduler(
+    app,
+    Job,
+    on_update=lambda job, owners: _emit_to_models('job_status', job, owners),
+    workers=int(os.environ.get("JOB_WORKERS", 4)),
+    max_queued=int(os.environ.get("JOB_MAX_QUEUED", 1000))
+)
+JOB_SPOOL_DIR = os.environ.get("JOB_SPOOL_DIR", "data/jobs")
+os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+# Queued jobs run highest priority first. Small documents a client is
+# waiting on go ahead of spooled bulk uploads, and both go ahead of imports
+# and exports bound by a remote service, which take longest anyway
+JOB_PRIORITY_INTERACTIVE = 20
+JOB_PRIORITY_UPLOAD = 10
+JOB_PRIORITY_REMOTE = 0
+
+def _remove_spool(params):
+    """Job cleanup: delete the spooled upload a job was given, if any"""
+    path = params.get('path')
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+# Built once: the recheck runs on every authenticated request
+_key_owner_query = db.select(AIModel.id).where(AIModel.api_key_id == bindparam('key_id'))
+
+def _authenticate_api_key(api_key):
+    """Return the ID of the model owning api_key, or None if it is invalid"""
+    key_id = AIModel.parse_api_key_id(api_key)
+    if not key_id:
+        return None
+    # Recently verified keys skip the slow KDF, but their key ID is still
+    # looked up: another worker may have rotated or deleted the key, and
+    # only that worker's cache was invalidated
+    model_id = verified_keys.get(api_key)
+    if model_id is not None:
+        if db.session.execute(_key_owner_query, {'key_id': key_id}).scalar() == model_id:
+            return model_id
+        verified_keys.discard(api_key)
+        return None
+    generation = verified_keys.generation()
+    model = AIModel.query.filter_by(api_key_id=key_id).first()
+    if not model or not model.verify_api_key(api_key):
+        return None
+    verified_keys.put(api_key, model.id, generation)
+    return model.id
 
 def require_api_key(f):
     @wraps(f)
@@ -39,11 +232,12 @@ def require_api_key(f):
         api_key = request.headers.get('X-API-Key')
         if not api_key:
             return jsonify({"error": "No API key provided"}), 401
-            
-        model = AIModel.query.filter_by(api_key_hash=api_key).first()
-        if not model or not model.verify_api_key(api_key):
+        
+        model_id = _authenticate_api_key(api_key)
+        if model_id is None:
             return jsonify({"error": "Invalid API key"}), 401
-            
+        
+        g.api_model_id = model_id
         return f(*args, **kwargs)
     return decorated_function
 
@@ -51,45 +245,658 @@ def require_api_key(f):
 def index():
     return render_template('index.html')
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _parse_fields(model_cls):
+    """Resolve ?fields=a,b or ?view=full into a tuple of serialized fields"""
+    if request.args.get('view') == 'full':
+        return model_cls.ALL_FIELDS
+    requested = request.args.get('fields')
+    if not requested:
+        return model_cls.SUMMARY_FIELDS
+    fields = tuple(f.strip() for f in requested.split(',') if f.strip())
+    unknown = set(fields) - set(model_cls.ALL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ('id',) + tuple(f for f in fields if f != 'id')
+
+def _paginated_listing(model_cls, key, fields, options, serialize, embedded_versions=None):
+    """Cursor-paginated listing with ETag support.
+
+    The page's ids and update times are read first with a narrow query, so
+    a matching If-None-Match returns 304 before any heavy column is loaded.
+    Listings that embed related rows pass embedded_versions(ids), returning
+    the ids and update times of those rows, so the tag changes with them too.
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor', 0, type=int)
+
+    page = (db.session.query(model_cls.id, model_cls.updated_at)
+            .filter(model_cls.id > cursor)
+            .order_by(model_cls.id)
+            .limit(limit + 1)
+            .all())
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    versions = [(row.id, row.updated_at) for row in page]
+    if embedded_versions is not None and page:
+        versions.append(embedded_versions([row.id for row in page]))
+    etag = hashlib.sha1(repr((key, fields, versions, has_more)).encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    ids = [row.id for row in page]
+    rows = (model_cls.query.options(*options)
+            .filter(model_cls.id.in_(ids))
+            .order_by(model_cls.id)
+            .all()) if ids else []
+
+    response = jsonify({
+        key: [serialize(row) for row in rows],
+        "next_cursor": str(ids[-1]) if has_more else None
+    })
+    response.set_etag(etag)
+    return response
+
 @app.route('/api/datasets', methods=['GET'])
 def list_datasets():
-    datasets = Dataset.query.all()
-    return jsonify({
-        "datasets": [dataset.to_dict() for dataset in datasets]
-    })
+    try:
+        fields = _parse_fields(Dataset)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    # Summary columns are cheap and always loaded; heavy ones only on request
+    columns = [getattr(Dataset, f) for f in set(Dataset.SUMMARY_FIELDS + fields)]
+    return _paginated_listing(Dataset, "datasets", fields, [load_only(*columns)],
+                              lambda dataset: dataset.to_dict(fields))
+
+def _run_dataset_import(ctx):
+    """Stream a spooled dataset document into DatasetRow batches"""
+    def report_progress(dataset_name, rows):
+        # The import is one transaction; the job row is written after it
+        ctx.report(message=f"Imported {rows} rows", defer=True)
+
+    with open(ctx.params['path'], 'rb') as f:
+        reader = open_stream_reader(f, 'dataset.json')
+        try:
+            dataset = Dataset.import_stream(reader, db.session.get(AIModel, ctx.params['model_id']),
+                                            on_progress=report_progress,
+                                            defaults={'version': '1.0'})
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON body")
+    db.session.commit()
+    return {"dataset_id": dataset.id, "rows": dataset.row_count}
+
+job_scheduler.register('dataset_import', _run_dataset_import, priority=JOB_PRIORITY_INTERACTIVE,
+                       cleanup=_remove_spool)
 
 @app.route('/api/datasets', methods=['POST'])
+@require_api_key
 def create_dataset():
-    data = request.json
+    """Queue an import of {"name", "version"?, "description"?, "data"} into the key's model;
+    the job result holds the new dataset_id"""
+    try:
+        params = {"path": _spool_upload(request.stream, 'dataset.json'), "model_id": g.api_model_id}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return _submit_job('dataset_import', params, model_id=g.api_model_id, requested_by=g.api_model_id)
+
+def _load_row_dataset(dataset_id):
+    """Fetch a dataset without its legacy payload, migrating that to rows if needed"""
+    summary = load_only(*[getattr(Dataset, f) for f in Dataset.SUMMARY_FIELDS])
+    dataset = Dataset.query.options(summary).get_or_404(dataset_id)
+    if not dataset.uses_legacy_data:
+        return dataset, True
+    # Lock the row so concurrent first reads migrate it once. SQLite has no
+    # row locks; there the slower reader's duplicate positions are rejected
+    # and it reads the rows the other one wrote
+    dataset = db.session.get(Dataset, dataset_id, options=[summary],
+                             with_for_update=True, populate_existing=True)
+    try:
+        if not dataset.ensure_row_storage():
+            db.session.commit()
+            return dataset, False
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        dataset = db.session.get(Dataset, dataset_id, options=[summary], populate_existing=True)
+    return dataset, True
+
+@app.route('/api/datasets/<int:dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    dataset, row_storage = _load_row_dataset(dataset_id)
+    if not row_storage:
+        return jsonify(dataset.to_dict())
+
+    # Stream the rows into the JSON body instead of materializing them
+    header = json.dumps(dataset.to_dict(Dataset.SUMMARY_FIELDS))
+
+    def generate():
+        yield header[:-1] + ', "data": ['
+        for i, content in enumerate(dataset.iter_raw_rows()):
+            yield content if i == 0 else ',' + content
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route('/api/datasets/<int:dataset_id>/rows', methods=['GET'])
+def get_dataset_rows(dataset_id):
+    dataset, row_storage = _load_row_dataset(dataset_id)
+    if not row_storage:
+        return jsonify({"error": "Dataset data is not a list of rows"}), 400
+
     try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(max(int(request.args.get('limit', 100)), 1), Dataset.ROW_BATCH_SIZE)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    if offset < 0:
+        # A bad cursor must not silently restart a client's paging at row 0
+        return jsonify({"error": "offset must not be negative"}), 400
+    return jsonify({
+        "dataset_id": dataset.id,
+        "offset": offset,
+        "limit": limit,
+        "row_count": dataset.row_count,
+        "rows": list(dataset.iter_rows(offset, limit))
+    })
+
+@app.route('/api/datasets/<int:dataset_id>/rows.ndjson', methods=['GET'])
+def stream_dataset_rows(dataset_id):
+    dataset, row_storage = _load_row_dataset(dataset_id)
+    if not row_storage:
+        return jsonify({"error": "Dataset data is not a list of rows"}), 400
+
+    def generate():
+        for content in dataset.iter_raw_rows():
+            yield content + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+BULK_TRAIN_BATCH_SIZE = 1000
+
+def _parse_training_line(line):
+    record = json.loads(line)
+    input_text = record.get('input', record.get('input_text'))
+    expected_output = record.get('output', record.get('expected_output'))
+    if not isinstance(input_text, str) or not isinstance(expected_output, str):
+        raise ValueError("each line needs string 'input' and 'output' fields")
+    return input_text, expected_output
+
+def _spool_upload(stream, filename=''):
+    """Copy a request body or upload to a file a job can read later"""
+    path = os.path.join(JOB_SPOOL_DIR, f"{uuid.uuid4().hex}-{secure_filename(filename)}")
+    with open(path, 'wb') as f:
+        while True:
+            chunk = stream.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+    return path
+
+def _submit_job(kind, params, **kwargs):
+    """Queue a job and build the 202 response, or a 503 if the queue is full.
+
+    Jobs run at the priority registered for their kind; clients cannot
+    choose one, or they could starve everyone else's jobs.
+    """
+    try:
+        job = job_scheduler.submit(kind, params, **kwargs)
+    except QueueFull as e:
+        _remove_spool(params)
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    return jsonify({"status": "accepted", "job_id": job.id}), 202
+
+# Engines are not safe to train from two threads at once
+_training_locks = defaultdict(threading.Lock)
+
+def _lease_engine(model_id):
+    """The engine to train: the shared one, or a model's, pinned in the registry"""
+    return nullcontext(ai_engine) if model_id is None else engine_registry.lease(model_id)
+
+def _run_train_bulk(ctx):
+    """Feed a spooled JSON Lines body into engine.train_batch in chunks"""
+    model_id = ctx.params.get('model_id')
+    with _lease_engine(model_id) as engine:
+        result = _train_spooled_file(ctx, engine, model_id)
+        if model_id is not None:
+            with _training_locks[model_id]:
+                engine_registry.write_back(model_id)
+    return result
+
+def _train_spooled_file(ctx, engine, model_id):
+    trained = 0
+    score_total = 0.0
+    batch = []
+    
+    def train(batch):
+        with _training_locks[model_id]:
+            return engine.train_batch(batch)[0]
+    
+    with open(ctx.params['path'], 'rb') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                batch.append(_parse_training_line(line))
+            except (ValueError, AttributeError) as e:
+                raise ValueError(f"Invalid record on line {line_number}: {str(e)} "
+                                 f"({trained} records trained)")
+            
+            if len(batch) >= BULK_TRAIN_BATCH_SIZE:
+                scores = train(batch)
+                trained += len(scores)
+                score_total += sum(scores)
+                batch = []
+                ctx.report(progress=f.tell() / ctx.params['size'] if ctx.params['size'] else None,
+                           message=f"Trained {trained} records")
+        
+        if batch:
+            scores = train(batch)
+            trained += len(scores)
+            score_total += sum(scores)
+    
+    return {
+        "trained": trained,
+        "mean_score": score_total / trained if trained else 0.0,
+        "level": engine.current_level,
+        "level_stats": engine.memory['level_stats']
+    }
+
+job_scheduler.register('train_bulk', _run_train_bulk, priority=JOB_PRIORITY_UPLOAD,
+                       cleanup=_remove_spool)
+
+def _submit_train_bulk(model_id=None):
+    path = _spool_upload(request.stream)
+    params = {"path": path, "size": os.path.getsize(path), "model_id": model_id}
+    return _submit_job('train_bulk', params, model_id=model_id, requested_by=g.api_model_id)
+
+@app.route('/api/train/bulk', methods=['POST'])
+@require_api_key
+def train_bulk():
+    """Queue training on a JSON Lines body of {"input": ..., "output": ...} records"""
+    return _submit_train_bulk()
+
+@app.route('/api/models/<int:model_id>/train/bulk', methods=['POST'])
+@require_api_key
+def train_model_bulk(model_id):
+    """Queue bulk training for the engine of a stored model"""
+    if g.api_model_id != model_id:
+        return jsonify({"error": "API key does not belong to this model"}), 403
+    if db.session.get(AIModel, model_id) is None:
+        return jsonify({"error": "Model not found"}), 404
+    return _submit_train_bulk(model_id)
+
+HF_SEARCH_MAX_RESULTS = 50
+hf_hub_offline = os.environ.get("HF_HUB_OFFLINE", "").upper() in ("1", "ON", "YES", "TRUE")
+HF_PREVIEW_MAX_ROWS = 50
+
+@app.route('/api/datasets/huggingface/search', methods=['GET'])
+def search_huggingface_datasets():
+    query = request.args.get('query', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), HF_SEARCH_MAX_RESULTS)
+    try:
+        # Local datasets are listed afresh so a newly written one shows up at
+        # once; only the Hub's answer is cached
+        local = [{"id": name, "name": name, "description": "Local dataset",
+                  "downloads": 0, "likes": 0}
+                 for name in hf_source.local_datasets() if query.lower() in name.lower()]
+        hub = []
+        if len(local) < limit and not hf_hub_offline:
+            cache_key = (query.lower(), limit)
+            hub = hf_search_cache.get(cache_key)
+            if hub is None:
+                hub = search_datasets(hf_api.get(), query, limit)
+                hf_search_cache.put(cache_key, hub)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"datasets": (local + hub)[:limit]})
+
+@app.route('/api/datasets/huggingface/preview/<path:source_id>', methods=['GET'])
+def preview_huggingface_dataset(source_id):
+    """Features and the first ?rows= records of ?split= (train), read by streaming"""
+    rows = min(max(request.args.get('rows', 5, type=int), 1), HF_PREVIEW_MAX_ROWS)
+    config = request.args.get('config') or None
+    split = request.args.get('split', 'train')
+    try:
+        check_dataset_id(source_id)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    try:
+        # Rewriting a local dataset's files changes the key
+        cache_key = (source_id, config, split, rows, hf_source.local_version(source_id))
+    except OSError as e:
+        return jsonify({"error": str(e)}), 500
+    preview = hf_preview_cache.get(cache_key)
+    if preview is None:
+        try:
+            preview = hf_source.preview(source_id, rows, config, split)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        hf_preview_cache.put(cache_key, preview)
+    return jsonify(preview)
+
+def _run_hf_dataset_import(ctx):
+    """Stream a Hugging Face split into DatasetRow batches, optionally training on them"""
+    model_id = ctx.params.get('train_model_id')
+    if model_id is None:
+        return _import_hf_rows(ctx, None, None)
+    with engine_registry.lease(model_id) as engine:
+        try:
+            return _import_hf_rows(ctx, engine, model_id)
+        finally:
+            # Training done before a failure is kept, so save it either way
+            with _training_locks[model_id]:
+                engine_registry.write_back(model_id)
+
+def _import_hf_rows(ctx, engine, model_id):
+    params = ctx.params
+    max_rows = params.get('max_rows')
+    imported = trained = 0
+    skipped = [0]
+    try:
+        first, records = peek(hf_source.open(params['source'], params.get('config'), params['split']))
+        if first is None:
+            raise ValueError("The split is empty")
+        columns = infer_columns(first, params.get('input_column'), params.get('output_column'))
+        pairs = iter_pairs(records, *columns, skipped=skipped)
+        if max_rows:
+            pairs = itertools.islice(pairs, max_rows)
+
+        for batch in batched(pairs, Dataset.ROW_BATCH_SIZE):
+            dataset = db.session.get(Dataset, params['dataset_id'])
+            dataset.append_rows({"input": i, "output": o} for i, o in batch)
+            db.session.commit()
+            imported += len(batch)
+            if engine is not None:
+                with _training_locks[model_id]:
+                    engine.train_batch(batch)
+                trained += len(batch)
+            ctx.report(progress=imported / max_rows if max_rows else None,
+                       message=f"Imported {imported} rows")
+    except Exception:
+        # Leave no half-imported dataset behind; training already done stays
+        db.session.rollback()
+        db.session.execute(db.delete(DatasetRow).where(DatasetRow.dataset_id == params['dataset_id']))
+        db.session.execute(db.delete(Dataset).where(Dataset.id == params['dataset_id']))
+        db.session.commit()
+        raise
+
+    return {
+        "dataset_id": params['dataset_id'],
+        "rows": imported,
+        "skipped": skipped[0],
+        "trained": trained,
+        "columns": {"input": columns[0], "output": columns[1]}
+    }
+
+job_scheduler.register('hf_dataset_import', _run_hf_dataset_import, priority=JOB_PRIORITY_REMOTE)
+
+@app.route('/api/datasets/huggingface/import', methods=['POST'])
+@require_api_key
+def import_huggingface_dataset():
+    """Queue a streaming import of {"dataset_id", "config"?, "split"?, "input_column"?,
+    "output_column"?, "max_rows"?, "train"?}; train feeds the rows to the key's model"""
+    data = request.get_json(silent=True) or {}
+    try:
+        source = check_dataset_id(data.get('dataset_id'))
+        max_rows = int(data['max_rows']) if data.get('max_rows') else None
+        if max_rows is not None and max_rows < 1:
+            raise ValueError("max_rows must be positive")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    split = data.get('split') or 'train'
+    try:
+        # The dataset exists from the start, empty, and fills in batch by batch
         dataset = Dataset(
-            name=data['name'],
-            version=data.get('version', '1.0'),
-            description=data.get('description', ''),
-            data=data['data']
+            name=(data.get('name') or source)[:100],
+            version='1.0',
+            description=f"Imported from Hugging Face: {source} ({split})",
+            row_count=0,
+            byte_size=0,
+            model_id=g.api_model_id
         )
         db.session.add(dataset)
         db.session.commit()
-        
-        return jsonify({
-            "status": "success",
-            "dataset_id": dataset.id
-        })
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": str(e)}), 400
+        return jsonify({"error": str(e)}), 500
 
-@app.route('/api/datasets/<int:dataset_id>', methods=['GET'])
-def get_dataset(dataset_id):
-    dataset = Dataset.query.get_or_404(dataset_id)
-    return jsonify(dataset.to_dict())
+    params = {
+        "dataset_id": dataset.id,
+        "source": source,
+        "config": data.get('config') or None,
+        "split": split,
+        "input_column": data.get('input_column') or None,
+        "output_column": data.get('output_column') or None,
+        "max_rows": max_rows,
+        "train_model_id": g.api_model_id if data.get('train') else None
+    }
+    response, status = _submit_job('hf_dataset_import', params, model_id=params['train_model_id'],
+                                   requested_by=g.api_model_id)
+    if status != 202:
+        db.session.delete(dataset)
+        db.session.commit()
+        return response, status
+    return jsonify({**response.json, "dataset_id": dataset.id}), 202
+
+CHAT_MAX_TOP_K = 20
+
+def _match_chat(items):
+    """Score (model_id, engine, normalized_text, top_k) items, one pass per engine"""
+    groups = defaultdict(list)
+    for i, (model_id, engine, text, top_k) in enumerate(items):
+        groups[model_id].append(i)
+
+    results = [None] * len(items)
+    for model_id, indexes in groups.items():
+        engine = items[indexes[0]][1]
+        top_k = max(items[i][3] for i in indexes)
+        with _training_locks[model_id]:
+            version = engine.version_token
+            matches = engine.find_best_matches([items[i][2] for i in indexes], top_k=top_k)
+        for i, (best_match, best_score, candidates) in zip(indexes, matches):
+            results[i] = (version, (best_match, best_score, candidates[:items[i][3]]))
+    return results
+
+# Concurrent chat requests are scored together; with CHAT_MAX_BATCH=1 each
+# request is scored on its own thread
+chat_max_batch = int(os.environ.get("CHAT_MAX_BATCH", 64))
+chat_batcher = MicroBatcher(
+    _match_chat,
+    max_batch=chat_max_batch,
+    max_wait=float(os.environ.get("CHAT_MAX_WAIT_MS", 2)) / 1000
+) if chat_max_batch > 1 else None
+chat_cache = VersionedCache(max_entries=int(os.environ.get("CHAT_CACHE_SIZE", 10000)))
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    """Respond to {"message", "top_k"?, "model_id"?}; model engines need their X-API-Key"""
+    data = request.get_json(silent=True) or {}
+    message = data.get('message')
+    if not isinstance(message, str) or not message.strip():
+        return jsonify({"error": "message is required"}), 400
+    try:
+        top_k = min(max(int(data.get('top_k') or 0), 0), CHAT_MAX_TOP_K)
+        model_id = int(data['model_id']) if data.get('model_id') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k and model_id must be integers"}), 400
+
+    try:
+        if model_id is None:
+            engine = ai_engine
+        else:
+            if _authenticate_api_key(request.headers.get('X-API-Key') or '') != model_id:
+                return jsonify({"error": "Invalid API key for this model"}), 401
+            engine = engine_registry.get(model_id)
+
+        if not hasattr(engine, 'find_best_matches'):
+            # Worker mode reads the owner's shared index one query at a time
+            response, confidence = engine.generate_response(message)
+            return jsonify({"response": response, "confidence": confidence, "cached": False})
+
+        # Matching only looks at the set of lowercased words, so inputs
+        # differing in case, order or repetition share a cache entry
+        text = ' '.join(sorted(set(message.lower().split())))
+        namespace = 'shared' if model_id is None else model_id
+        # A reloaded engine restarts its memory_version, so the token also
+        # names the engine instance
+        match = chat_cache.get(namespace, (text, top_k), engine.version_token)
+        cached = match is not None
+        if not cached:
+            item = (model_id, engine, text, top_k)
+            version, match = chat_batcher.submit(item) if chat_batcher else _match_chat([item])[0]
+            chat_cache.put(namespace, (text, top_k), version, match)
+
+        best_match, best_score, candidates = match
+        response, confidence = engine.choose_response(best_match, best_score)
+        result = {"response": response, "confidence": confidence, "cached": cached}
+        if top_k:
+            result["candidates"] = [{"pattern": pattern, "score": score} for pattern, score in candidates]
+        return jsonify(result)
+    except KeyError:
+        return jsonify({"error": "Model not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/engines/stats', methods=['GET'])
+def engine_stats():
+    stats = engine_registry.stats()
+    stats['persistence'] = engine_store.stats() if engine_store else None
+    stats['telemetry'] = telemetry.stats()
+    stats['chat'] = {
+        'batching': chat_batcher.stats() if chat_batcher else None,
+        'cache': chat_cache.stats()
+    }
+    return jsonify(stats)
+
+def _collect_app_metrics():
+    """Gauges and counters read from components that already keep them"""
+    registry_stats = engine_registry.stats()
+    key_stats = verified_keys.stats()
+    chat_stats = chat_cache.stats()
+    job_stats = job_scheduler.stats()
+    telemetry_stats = telemetry.stats()
+    caches = {'engine_registry': registry_stats, 'api_keys': key_stats, 'chat': chat_stats}
+    families = [
+        ('cache_hits_total', 'counter', 'Cache hits',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('cache_misses_total', 'counter', 'Cache misses',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('cache_entries', 'gauge', 'Cached entries',
+         [({'cache': 'engine_registry'}, registry_stats['engines']),
+          ({'cache': 'api_keys'}, key_stats['entries']),
+          ({'cache': 'chat'}, chat_stats['entries'])]),
+        ('engine_registry_bytes', 'gauge', 'Approximate memory of loaded model engines',
+         [({}, registry_stats['approximate_bytes'])]),
+        ('engine_registry_evictions_total', 'counter', 'Model engines evicted',
+         [({}, registry_stats['evictions'])]),
+        ('jobs_running', 'gauge', 'Jobs running', [({}, job_stats['running'])]),
+        ('jobs_queued', 'gauge', 'Jobs waiting for a worker', [({}, job_stats['queued'])]),
+        ('telemetry_subscribers', 'gauge', 'Training telemetry subscribers',
+         [({}, telemetry_stats['subscribers'])]),
+        ('telemetry_frames_total', 'counter', 'Training telemetry frames',
+         [({'outcome': 'sent'}, telemetry_stats['frames_sent']),
+          ({'outcome': 'skipped'}, telemetry_stats['frames_skipped'])]),
+    ]
+    if chat_batcher is not None:
+        batch_stats = chat_batcher.stats()
+        families.append(('chat_batches_total', 'counter', 'Chat scoring batches',
+                         [({}, batch_stats['batches'])]))
+        families.append(('chat_batched_requests_total', 'counter', 'Chat requests scored in batches',
+                         [({}, batch_stats['items'])]))
+    if engine_store is not None:
+        families.append(('engine_patterns', 'gauge', 'Patterns in the shared engine',
+                         [({'engine': 'shared'}, len(ai_engine.pattern_keys))]))
+        families.append(('engine_level', 'gauge', 'Training level of the shared engine',
+                         [({'engine': 'shared'}, ai_engine.current_level)]))
+    families.append(('integration_loaded', 'gauge', 'Whether a lazily loaded client is loaded',
+                     [({'service': service.name}, int(service.loaded)) for service in integrations]))
+    return families
+
+metrics.collector(_collect_app_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def require_profiler_token(f):
+    """The profiler exposes code paths, so it needs PROFILER_TOKEN as X-Profiler-Token"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = os.environ.get("PROFILER_TOKEN")
+        if not token:
+            return jsonify({"error": "Profiler is disabled"}), 404
+        if not hmac.compare_digest(request.headers.get('X-Profiler-Token', ''), token):
+            return jsonify({"error": "Invalid profiler token"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/api/profiler', methods=['GET'])
+@require_profiler_token
+def profiler_status():
+    return jsonify(profiler.stats())
+
+@app.route('/api/profiler/start', methods=['POST'])
+@require_profiler_token
+def start_profiler():
+    """Start sampling stacks: {"interval": seconds, "duration": seconds}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        interval = min(max(float(data.get('interval', 0.01)), 0.001), 1.0)
+        duration = float(data['duration']) if data.get('duration') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "interval and duration must be numbers"}), 400
+    if not profiler.start(interval=interval, duration=duration):
+        return jsonify({"error": "Profiler is already running"}), 409
+    return jsonify(profiler.stats())
+
+@app.route('/api/profiler/stop', methods=['POST'])
+@require_profiler_token
+def stop_profiler():
+    profiler.stop()
+    return jsonify(profiler.stats())
+
+@app.route('/api/profiler/stacks', methods=['GET'])
+@require_profiler_token
+def profiler_stacks():
+    """Collapsed stacks of the last run, for flamegraph.pl or speedscope"""
+    return Response(profiler.folded(), mimetype='text/plain')
 
 @app.route('/api/models', methods=['GET'])
 def list_models():
-    models = AIModel.query.all()
-    return jsonify({
-        "models": [model.to_dict() for model in models]
-    })
+    try:
+        fields = _parse_fields(AIModel)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    columns = [getattr(AIModel, f) for f in set(AIModel.SUMMARY_FIELDS + fields) if f != 'datasets']
+    options = [load_only(*columns)]
+    embedded_versions = None
+    if 'datasets' in fields:
+        # One extra query for all datasets on the page, summaries only
+        summary_columns = [getattr(Dataset, f) for f in Dataset.SUMMARY_FIELDS]
+        options.append(selectinload(AIModel.datasets).load_only(*summary_columns))
+        embedded_versions = _dataset_versions
+    return _paginated_listing(AIModel, "models", fields, options,
+                              lambda model: model.to_dict(fields, Dataset.SUMMARY_FIELDS),
+                              embedded_versions)
+
+def _dataset_versions(model_ids):
+    """(model_id, id, updated_at) of the datasets embedded in a models page"""
+    return [tuple(row) for row in
+            db.session.query(Dataset.model_id, Dataset.id, Dataset.updated_at)
+            .filter(Dataset.model_id.in_(model_ids))
+            .order_by(Dataset.id)]
 
 @app.route('/api/models', methods=['POST'])
 def create_model():
@@ -114,32 +921,158 @@ def create_model():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@app.route('/api/models/<int:model_id>/api-key', methods=['POST'])
+@require_api_key
+def rotate_api_key(model_id):
+    if g.api_model_id != model_id:
+        return jsonify({"error": "API key does not belong to this model"}), 403
+    try:
+        model = AIModel.query.get_or_404(model_id)
+        api_key = model.set_api_key()
+        db.session.commit()
+        verified_keys.invalidate_model(model_id)
+        
+        return jsonify({
+            "status": "success",
+            "model_id": model.id,
+            "api_key": api_key
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/models/<int:model_id>', methods=['DELETE'])
+@require_api_key
+def delete_model(model_id):
+    if g.api_model_id != model_id:
+        return jsonify({"error": "API key does not belong to this model"}), 403
+    try:
+        model = AIModel.query.get_or_404(model_id)
+        for dataset in model.datasets:
+            dataset.model_id = None
+        model.release_artifacts()
+        GitHubImport.query.filter_by(model_id=model_id).delete()
+        db.session.delete(model)
+        db.session.commit()
+        verified_keys.invalidate_model(model_id)
+        engine_registry.discard(model_id)
+        
+        return jsonify({"status": "success"})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/models/<int:model_id>/export', methods=['GET'])
 @require_api_key
 def export_model(model_id):
+    if g.api_model_id != model_id:
+        return jsonify({"error": "API key does not belong to this model"}), 403
     try:
-        model = AIModel.query.get_or_404(model_id)
-        export_data = model.serialize_state()
+        # Everything the body needs, in two queries; deferred columns would
+        # otherwise each be fetched separately while the body streams
+        full = [selectinload(AIModel.datasets)]
+        revalidating = bool(request.if_none_match)
+        if revalidating:
+            # Only what the ETag and file name need, since a 304 needs no more
+            model = AIModel.query.options(
+                load_only(AIModel.id, AIModel.name, AIModel.version, AIModel.updated_at),
+                selectinload(AIModel.datasets).load_only(Dataset.id, Dataset.updated_at, Dataset.row_count)
+            ).get_or_404(model_id)
+        else:
+            model = AIModel.query.options(*full).get_or_404(model_id)
+        export_format = request.args.get('format', 'json')
+        compression = request.args.get('compression', 'none')
+        try:
+            check_export_options(export_format, compression)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp:
-            json.dump(export_data, tmp, indent=2)
-            
-        response = send_file(
-            tmp.name,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f"{model.name.lower().replace(' ', '_')}_v{model.version}.json"
-        )
+        etag = export_etag(model, export_format, compression)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        if revalidating:
+            model = db.session.get(AIModel, model_id, options=full, populate_existing=True)
         
-        @response.call_on_close
-        def cleanup():
-            os.unlink(tmp.name)
-            
+        chunks = iter_export_json(model) if export_format == 'json' else iter_export_msgpack(model)
+        mimetype = {
+            'none': 'application/json' if export_format == 'json' else 'application/msgpack',
+            'gzip': 'application/gzip',
+            'zstd': 'application/zstd'
+        }[compression]
+        
+        response = Response(
+            stream_with_context(compress_stream(chunks, compression)),
+            mimetype=mimetype
+        )
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(model, export_format, compression)}"'
+        )
+        # Export dates differ between downloads, so the tag is weak
+        response.set_etag(etag, weak=True)
         return response
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/models/<int:model_id>/artifacts/<path:artifact_path>', methods=['GET'])
+@require_api_key
+def get_model_artifact(model_id, artifact_path):
+    if g.api_model_id != model_id:
+        return jsonify({"error": "API key does not belong to this model"}), 403
+    model = AIModel.query.options(load_only(AIModel.id, AIModel.state)).get_or_404(model_id)
+    entry = model.artifacts.get(artifact_path)
+    if entry is None or not blob_store.exists(entry['sha256']):
+        return jsonify({"error": "Artifact not found"}), 404
+    
+    # send_file answers Range and If-None-Match requests itself and hands
+    # the open file to the server's file wrapper (sendfile where available)
+    return send_file(
+        blob_store.path(entry['sha256']),
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=os.path.basename(artifact_path),
+        conditional=True,
+        etag=entry['sha256']
+    )
+
+def _trusted_blobs(model_id):
+    """{sha256: size} of stored blobs the model's manifest references"""
+    model = db.session.get(AIModel, model_id) if model_id is not None else None
+    if model is None:
+        return {}
+    return {entry['sha256']: entry['size'] for entry in model.artifacts.values()
+            if blob_store.exists(entry['sha256'])}
+
+def _run_model_import(ctx):
+    """Import an uploaded model file; the API key was issued at upload time.
+
+    Artifacts named by the file are only kept if the uploading key's model
+    already references their blobs, as it does when re-importing its export.
+    """
+    total_rows = {}
+    
+    def report_progress(dataset_name, rows):
+        total_rows[dataset_name] = rows
+        # The import is one transaction; the job row is written after it
+        ctx.report(message=f"Imported {sum(total_rows.values())} rows", defer=True)
+    
+    with open(ctx.params['path'], 'rb') as f:
+        reader = open_stream_reader(f, ctx.params['filename'])
+        try:
+            model = AIModel.import_stream(reader, on_progress=report_progress,
+                                          trusted_blobs=_trusted_blobs(ctx.params.get('requested_by')))
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON file")
+    model.api_key_id = ctx.params['api_key_id']
+    model.api_key_hash = ctx.params['api_key_hash']
+    db.session.commit()
+    return {"model_id": model.id, "rows": sum(total_rows.values()), "artifacts": len(model.artifacts)}
+
+job_scheduler.register('model_import', _run_model_import, priority=JOB_PRIORITY_UPLOAD,
+                       cleanup=_remove_spool)
+
 @app.route('/api/models/import', methods=['POST'])
 @require_api_key
 def import_model():
@@ -150,37 +1083,106 @@ def import_model():
         file = request.files['model_file']
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
-            
-        if not file.filename.endswith('.json'):
-            return jsonify({"error": "Invalid file format. Please upload a JSON file"}), 400
         
         try:
-            import_data = json.load(file)
-            AIModel.validate_import_data(import_data)
-            
-            model_info = import_data['model_info']
-            model = AIModel.from_dict(model_info)
-            api_key = model.set_api_key()
-            
-            db.session.add(model)
-            db.session.commit()
-            
-            return jsonify({
-                "status": "success",
-                "message": "Model imported successfully",
-                "model_id": model.id,
-                "api_key": api_key
-            })
-            
-        except json.JSONDecodeError:
-            return jsonify({"error": "Invalid JSON file"}), 400
+            compression, file_format = stream_format(file.filename)
+            check_export_options(file_format, compression)
         except ValueError as ve:
             return jsonify({"error": str(ve)}), 400
+        
+        # The key is returned now and attached to the model when the job
+        # creates it; only its hash is stored with the job
+        api_key, api_key_id, api_key_hash = AIModel.generate_api_key()
+        params = {
+            "path": _spool_upload(file.stream, file.filename),
+            "filename": file.filename,
+            "api_key_id": api_key_id,
+            "api_key_hash": api_key_hash,
+            "requested_by": g.api_model_id
+        }
+        response, status = _submit_job('model_import', params, requested_by=g.api_model_id)
+        if status == 202:
+            response = jsonify({**response.json, "api_key": api_key})
+        return response, status
             
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+GITHUB_IMPORT_WORKERS = int(os.environ.get("GITHUB_IMPORT_WORKERS", 8))
+
+def _github_client(repo_url):
+    github_token = os.environ.get('GITHUB_TOKEN')
+    if not github_token:
+        raise RuntimeError("GitHub token not configured")
+    return GitHubClient(github_token, parse_repo_url(repo_url), pool_size=GITHUB_IMPORT_WORKERS)
+
+def _emit_github_import(github_import):
+    _emit_to_models('github_import_progress', github_import.to_dict(), [github_import.model_id])
+
+def _run_github_import(ctx):
+    """Download a repository's model files, committing after every file"""
+    import_id = ctx.params['import_id']
+    github_import = db.session.get(GitHubImport, import_id)
+    model = db.session.get(AIModel, github_import.model_id)
+    try:
+        client = _github_client(github_import.repo_url)
+        if github_import.commit_sha is None:
+            github_import.commit_sha = client.resolve_branch(client.default_branch())
+        tree_sha = client.get_commit(github_import.commit_sha)['tree']['sha']
+        entries = [entry for entry in client.list_tree(tree_sha)
+                   if entry['path'].endswith(MODEL_FILE_EXTENSIONS)]
+        
+        # Files recorded by an earlier run are skipped
+        manifest = model.artifacts
+        pending = [entry for entry in entries
+                   if manifest.get(entry['path'], {}).get('git_sha') != entry['sha']]
+        github_import.status = 'running'
+        github_import.error = None
+        github_import.total_files = len(entries)
+        github_import.total_bytes = sum(entry.get('size', 0) for entry in entries)
+        github_import.completed_files = len(entries) - len(pending)
+        github_import.completed_bytes = github_import.total_bytes - sum(entry.get('size', 0) for entry in pending)
+        model.configuration = {**(model.configuration or {}),
+                               "files": [entry['path'] for entry in entries]}
+        db.session.commit()
+        _emit_github_import(github_import)
+        
+        def record_file(entry, sha256, size):
+            model.add_artifact(entry['path'], {"sha256": sha256, "size": size, "git_sha": entry['sha']})
+            github_import.completed_files += 1
+            github_import.completed_bytes += size
+            db.session.commit()
+            _emit_github_import(github_import)
+            ctx.report(progress=github_import.completed_files / github_import.total_files,
+                       message=f"{github_import.completed_files}/{github_import.total_files} files")
+        
+        download_files(client, pending, blob_store, record_file, workers=GITHUB_IMPORT_WORKERS)
+        github_import.status = 'complete'
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        github_import = db.session.get(GitHubImport, import_id)
+        github_import.status = 'cancelled' if isinstance(e, JobCancelled) else 'failed'
+        github_import.error = None if isinstance(e, JobCancelled) else str(e)
+        db.session.commit()
+        _emit_github_import(github_import)
+        raise
+    _emit_github_import(github_import)
+    return {"model_id": model.id, "files": github_import.total_files}
+
+# Completed files are committed one by one, so an interrupted run resumes
+job_scheduler.register('github_import', _run_github_import, priority=JOB_PRIORITY_REMOTE,
+                       resumable=True)
+
+def _submit_github_import(github_import):
+    response, status = _submit_job('github_import', {"import_id": github_import.id},
+                                   model_id=github_import.model_id, requested_by=g.api_model_id)
+    if status == 202:
+        github_import.job_id = response.json['job_id']
+        github_import.status = 'pending'
+        db.session.commit()
+    return response, status
+
 @app.route('/api/models/github/import', methods=['POST'])
 @require_api_key
 def import_github_model():
@@ -189,43 +1191,109 @@ def import_github_model():
         repo_url = data.get('repo_url')
         if not repo_url:
             return jsonify({"error": "No repository URL provided"}), 400
+        try:
+            full_name = parse_repo_url(repo_url)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
             
-        github_token = os.environ.get('GITHUB_TOKEN')
-        if not github_token:
+        if not os.environ.get('GITHUB_TOKEN'):
             return jsonify({"error": "GitHub token not configured"}), 500
-            
-        g = Github(github_token)
-        repo = g.get_repo(repo_url.split('github.com/')[-1])
         
-        model_files = {}
-        for content in repo.get_contents(""):
-            if content.path.endswith(('.json', '.h5', '.pt', '.ckpt')):
-                model_files[content.path] = base64.b64decode(content.content)
-                
+        # The model exists from the start; its manifest fills in as files land
         model = AIModel(
-            name=f"GitHub: {repo.name}",
+            name=f"GitHub: {full_name.split('/')[-1]}",
             version="1.0",
             configuration={
                 "source": "github",
                 "repo_url": repo_url,
-                "files": list(model_files.keys())
+                "files": []
             },
-            state=model_files
+            state={}
         )
-        
         api_key = model.set_api_key()
         db.session.add(model)
+        db.session.flush()
+        github_import = GitHubImport(id=uuid.uuid4().hex, model_id=model.id, repo_url=repo_url)
+        db.session.add(github_import)
         db.session.commit()
         
+        response, status = _submit_github_import(github_import)
+        if status != 202:
+            return response, status
         return jsonify({
-            "status": "success",
+            **response.json,
+            "import_id": github_import.id,
             "model_id": model.id,
             "api_key": api_key
-        })
+        }), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+def _load_github_import(import_id):
+    github_import = GitHubImport.query.get_or_404(import_id)
+    if g.api_model_id != github_import.model_id:
+        return None, (jsonify({"error": "API key does not belong to this model"}), 403)
+    return github_import, None
+
+@app.route('/api/models/github/import/<import_id>', methods=['GET'])
+@require_api_key
+def get_github_import(import_id):
+    github_import, error = _load_github_import(import_id)
+    if error:
+        return error
+    return jsonify(github_import.to_dict())
+
+@app.route('/api/models/github/import/<import_id>/resume', methods=['POST'])
+@require_api_key
+def resume_github_import(import_id):
+    github_import, error = _load_github_import(import_id)
+    if error:
+        return error
+    job = db.session.get(Job, github_import.job_id) if github_import.job_id else None
+    if job is not None and job.status in ACTIVE_STATUSES:
+        return jsonify({"error": "Import is already running", "job_id": job.id}), 409
+    if github_import.status == 'complete':
+        return jsonify(github_import.to_dict())
+    response, status = _submit_github_import(github_import)
+    if status != 202:
+        return response, status
+    return jsonify({**github_import.to_dict(), **response.json}), 202
+
+def _run_github_export(ctx):
+    """Publish a model's artifacts to GitHub as a single commit"""
+    params = ctx.params
+    client = _github_client(params['repo_url'])
+    model = db.session.get(AIModel, params['model_id'])
+    if model is None:
+        raise ValueError("Model not found")
+    
+    # Git blob SHAs are cached in the manifest so unchanged files are
+    # recognised without reading them
+    manifest = model.artifacts
+    for path, entry in manifest.items():
+        if 'git_sha' not in entry:
+            model.add_artifact(path, {**entry, "git_sha": git_blob_sha(blob_store.open_mmap(entry['sha256']))})
+    db.session.commit()
+    manifest = model.artifacts
+    ctx.report(message="Comparing with the remote tree", force=True)
+    
+    result = push_files(
+        client,
+        params.get('branch') or client.default_branch(),
+        {path: entry['git_sha'] for path, entry in manifest.items()},
+        lambda path: blob_store.open_mmap(manifest[path]['sha256']),
+        params['commit_message'],
+        workers=GITHUB_IMPORT_WORKERS
+    )
+    return {
+        "message": "Model exported to GitHub successfully" if result['changed_files'] else "No changes to export",
+        "commit_sha": result['commit_sha'],
+        "changed_files": result['changed_files']
+    }
+
+job_scheduler.register('github_export', _run_github_export, priority=JOB_PRIORITY_REMOTE)
+
 @app.route('/api/models/github/export', methods=['POST'])
 @require_api_key
 def export_github_model():
@@ -233,48 +1301,168 @@ def export_github_model():
     try:
         model_id = data.get('model_id')
         repo_url = data.get('repo_url')
-        commit_message = data.get('commit_message', 'Updated model')
         
         if not model_id or not repo_url:
             return jsonify({"error": "Missing required parameters"}), 400
-            
-        github_token = os.environ.get('GITHUB_TOKEN')
-        if not github_token:
+        try:
+            model_id = int(model_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "model_id must be an integer"}), 400
+        if g.api_model_id != model_id:
+            return jsonify({"error": "API key does not belong to this model"}), 403
+        try:
+            parse_repo_url(repo_url)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        if not os.environ.get('GITHUB_TOKEN'):
             return jsonify({"error": "GitHub token not configured"}), 500
-            
-        model = AIModel.query.get_or_404(model_id)
-        g = Github(github_token)
-        repo = g.get_repo(repo_url.split('github.com/')[-1])
+        if db.session.get(AIModel, model_id) is None:
+            return jsonify({"error": "Model not found"}), 404
         
-        # Export model files
-        for filename, content in model.state.items():
-            if isinstance(content, (str, bytes)):
-                try:
-                    repo.create_file(
-                        filename,
-                        commit_message,
-                        content if isinstance(content, bytes) else content.encode(),
-                        branch="main"
-                    )
-                except Exception as e:
-                    # Update file if it already exists
-                    contents = repo.get_contents(filename)
-                    repo.update_file(
-                        contents.path,
-                        commit_message,
-                        content if isinstance(content, bytes) else content.encode(),
-                        contents.sha,
-                        branch="main"
-                    )
-        
-        return jsonify({
-            "status": "success",
-            "message": "Model exported to GitHub successfully"
-        })
+        return _submit_job('github_export', {
+            "model_id": model_id,
+            "repo_url": repo_url,
+            "branch": data.get('branch'),
+            "commit_message": data.get('commit_message', 'Updated model')
+        }, model_id=model_id, requested_by=g.api_model_id)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-if __name__ == "__main__":
+def _load_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    owners = {job.model_id, job.requested_by} - {None}
+    if owners and g.api_model_id not in owners:
+        return None, (jsonify({"error": "API key does not belong to this job"}), 403)
+    return job, None
+
+@app.route('/api/jobs', methods=['GET'])
+@require_api_key
+def list_jobs():
+    query = Job.query.filter((Job.model_id == g.api_model_id) | (Job.requested_by == g.api_model_id))
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Job.status == status)
+    jobs = query.order_by(Job.created_at.desc()).limit(100).all()
+    return jsonify({"jobs": [job.to_dict() for job in jobs], "scheduler": job_scheduler.stats()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_api_key
+def get_job(job_id):
+    job, error = _load_job(job_id)
+    if error:
+        return error
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@require_api_key
+def cancel_job(job_id):
+    job, error = _load_job(job_id)
+    if error:
+        return error
+    if not job_scheduler.cancel(job.id):
+        return jsonify({"error": f"Job is already {job.status}"}), 409
+    return jsonify(db.session.get(Job, job.id).to_dict())
+
+@app.cli.command('gc-blobs')
+def gc_blobs():
+    """Delete artifact blobs that no model manifest references"""
+    Blob.query.filter(Blob.ref_count <= 0).delete()
+    db.session.commit()
+    referenced = {sha256 for (sha256,) in db.session.query(Blob.sha256)}
+    grace = float(os.environ.get("BLOB_GC_GRACE_SECONDS", 3600))
+    removed = blob_store.collect_garbage(referenced, grace_seconds=grace)
+    click.echo(f"Removed {removed} unreferenced blobs")
+
+@socketio.on('subscribe_training')
+def subscribe_training(data=None):
+    """Stream coalesced training frames for the shared engine or one model"""
+    data = data or {}
+    try:
+        model_id = int(data['model_id']) if data.get('model_id') is not None else None
+        max_rate = float(data['max_rate']) if data.get('max_rate') else None
+    except (TypeError, ValueError):
+        emit('training_error', {"error": "model_id and max_rate must be numbers"})
+        return
+    if model_id is not None:
+        # Model frames include pattern text, so they need that model's key
+        if _authenticate_api_key(data.get('api_key') or '') != model_id:
+            emit('training_error', {"error": "Invalid API key for this model"})
+            return
+        # Loading the engine registers it with telemetry for the first snapshot
+        try:
+            engine_registry.get(model_id)
+        except KeyError:
+            emit('training_error', {"error": "Model not found"})
+            return
+    stream = 'shared' if model_id is None else model_id
+    telemetry.subscribe(request.sid, stream, max_rate=max_rate)
+
+@socketio.on('subscribe_jobs')
+def subscribe_jobs(data=None):
+    """Receive job_status and github_import_progress events for the API key's model"""
+    model_id = _authenticate_api_key((data or {}).get('api_key') or '')
+    if model_id is None:
+        emit('job_error', {"error": "Invalid API key"})
+        return
+    join_room(_model_room(model_id))
+
+@socketio.on('unsubscribe_training')
+def unsubscribe_training(data=None):
+    telemetry.unsubscribe(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    telemetry.unsubscribe(request.sid)
+
+def _prepare_database():
+    """Create missing tables and upgrade ones an older release created"""
     with app.app_context():
-        db.create_all()
+        try:
+            db.create_all()
+            applied = upgrade_schema(db.engine, db.metadata)
+        except OperationalError as e:
+            app.logger.warning("Skipping schema upgrade: %s", e)
+            return
+        for description in applied:
+            app.logger.info("Schema upgrade: %s", description)
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_services():
+    """Open the shared engine, upgrade the database and start the background work.
+
+    Importing this module does none of it, so tests, benchmarks, CLI
+    commands and a reloader's file-watching process stay light. The first
+    request or Socket.IO connection a process handles calls this, so WSGI
+    servers that import ``app:app`` (gunicorn, uwsgi) need no hook; a server
+    may also call it itself, e.g. from gunicorn's ``post_fork``, to warm up
+    before traffic arrives. Each process starts its services once; later
+    calls, including concurrent ones, wait for that start and do nothing.
+    """
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        _open_shared_engine()
+        _prepare_database()
+        job_scheduler.start()
+        socketio.start_background_task(telemetry.run, socketio.sleep)
+        if os.environ.get("PREWARM_INTEGRATIONS", "0") == "1":
+            socketio.start_background_task(prewarm, integrations, socketio.sleep,
+                                           float(os.environ.get("PREWARM_DELAY", 2)))
+        _services_started = True
+
+@app.before_request
+def _ensure_services():
+    start_services()
+
+@socketio.on('connect')
+def handle_connect(*args):
+    start_services()
+
+if __name__ == "__main__":
+    start_services()
     app.run(host='0.0.0.0', port=5000)
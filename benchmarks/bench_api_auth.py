@@ -0,0 +1,55 @@
+"""Throughput of API-key authenticated endpoints with and without the verified-key cache.
+
+Runs the Flask app through its test client against an in-memory SQLite
+database.
+
+    python benchmarks/bench_api_auth.py --requests 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("ENGINE_DATA_DIR", tempfile.mkdtemp(prefix="bench-engine-"))
+
+import app as app_module
+
+
+def run(client, path, api_key, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path, headers={'X-API-Key': api_key})
+        assert response.status_code == 200, response.get_json()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    flask_app = app_module.app
+    with flask_app.app_context():
+        app_module.db.create_all()
+    client = flask_app.test_client()
+    created = client.post('/api/models', json={'name': 'bench'}).get_json()
+    path = f"/api/models/{created['model_id']}/export"
+
+    cache = app_module.verified_keys
+    max_entries = cache.max_entries
+    cache.max_entries = 0
+    uncached = run(client, path, created['api_key'], max(1, args.requests // 10))
+    cache.max_entries = max_entries
+    cached = run(client, path, created['api_key'], args.requests)
+
+    print(f"{'mode':>10} {'req/s':>10}")
+    print(f"{'kdf':>10} {uncached:>10.1f}")
+    print(f"{'cached':>10} {cached:>10.1f}")
+    print(f"speedup: {cached / uncached:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Recall/latency report for AIEngine approximate (MinHash/LSH) matching.
+
+Builds synthetic memories, then answers perturbed copies of stored patterns
+with the exact token-index lookup, the original _calculate_similarity scan
+and the approximate LSH mode. Recall is the fraction of queries for which
+the approximate mode returns the same best match as the exact lookup.
+
+    python benchmarks/bench_approximate_matching.py --sizes 10000 100000 1000000
+
+--full adds the 10^7 point. Peak RSS is about 2.8 KB per pattern (2.7 GB at
+10^6), almost all of it the Python-side pattern memory, so 10^7 needs
+roughly 28 GB; sizes that would not fit in physical memory are reported
+as skipped rather than run into the OOM killer, unless --force is given.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ai_engine import AIEngine
+
+FULL_SIZE = 10_000_000
+# Peak RSS per pattern, measured at 10^6 patterns with the default vocabulary
+BYTES_PER_PATTERN = 2800
+
+
+def physical_memory_bytes():
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def build_engine(pattern_count: int, vocab_size: int, rng: np.random.Generator,
+                 max_recall_loss: float) -> AIEngine:
+    """Load a synthetic memory, like a snapshot restore. Every pattern has two
+    Zipf-distributed common words ("the", "what") plus uniform rare words."""
+    engine = AIEngine(approximate_matching=True, max_recall_loss=max_recall_loss)
+    lengths = rng.integers(4, 10, size=pattern_count)
+    common_ids = rng.zipf(1.5, size=(pattern_count, 2)) % 100
+    rare_ids = rng.integers(100, vocab_size, size=int(lengths.sum()))
+    patterns = engine.patterns
+    start = 0
+    for length, common in zip(lengths, common_ids):
+        words = [f"w{w}" for w in common] + [f"w{w}" for w in rare_ids[start:start + length - 2]]
+        key = ' '.join(words)
+        start += length - 2
+        if key not in patterns:
+            patterns.add(key, 'response', 1.0)
+    engine.rebuild_index()
+    return engine
+
+
+def make_queries(engine: AIEngine, count: int, rng: np.random.Generator):
+    """Replace one word of a stored pattern so an above-threshold match exists"""
+    queries = []
+    for pattern_id in rng.integers(0, len(engine.pattern_keys), size=count):
+        words = engine.pattern_keys[pattern_id].split()
+        words[rng.integers(0, len(words))] = f"q{rng.integers(1 << 30)}"
+        queries.append(' '.join(words))
+    return queries
+
+
+def scan_best_match(engine: AIEngine, input_text: str):
+    best_match = None
+    best_score = 0
+    for pattern, confidence in zip(engine.pattern_keys, engine.patterns.confidences):
+        similarity = engine._calculate_similarity(input_text, pattern)
+        combined_score = similarity * confidence
+        if combined_score > best_score:
+            best_score = combined_score
+            best_match = pattern
+    return best_match, best_score
+
+
+def run_mode(engine: AIEngine, queries, approximate: bool):
+    lsh = engine.lsh
+    if not approximate:
+        engine.lsh = None
+    try:
+        start = time.perf_counter()
+        results = [engine._find_best_match(q) for q in queries]
+        elapsed = (time.perf_counter() - start) / len(queries)
+    finally:
+        engine.lsh = lsh
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--vocab', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--max-recall-loss', type=float, default=0.05)
+    parser.add_argument('--scan-limit', type=int, default=100000,
+                        help='skip the full-scan baseline above this many patterns')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--full', action='store_true',
+                        help=f'also run {FULL_SIZE} patterns (about 28 GB of RAM)')
+    parser.add_argument('--force', action='store_true',
+                        help='run sizes even if they look too large for physical memory')
+    args = parser.parse_args()
+    sizes = list(args.sizes)
+    if args.full and FULL_SIZE not in sizes:
+        sizes.append(FULL_SIZE)
+    memory = physical_memory_bytes()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'patterns':>10} {'build_s':>8} {'scan_us':>10} {'exact_us':>10} "
+          f"{'approx_us':>10} {'recall':>7}")
+    for size in sizes:
+        needed = size * BYTES_PER_PATTERN
+        if memory is not None and needed > memory and not args.force:
+            print(f"{size:>10} skipped: needs ~{needed / 1e9:.0f} GB, "
+                  f"{memory / 1e9:.0f} GB available (--force to run anyway)", flush=True)
+            continue
+        start = time.perf_counter()
+        engine = build_engine(size, args.vocab, rng, args.max_recall_loss)
+        build_time = time.perf_counter() - start
+        queries = make_queries(engine, args.queries, rng)
+
+        exact_time, exact_results = run_mode(engine, queries, approximate=False)
+        approx_time, approx_results = run_mode(engine, queries, approximate=True)
+        recall = sum(a == e for a, e in zip(approx_results, exact_results)) / len(queries)
+
+        scan_column = f"{'-':>10}"
+        if size <= args.scan_limit:
+            scan_queries = queries[:20]
+            start = time.perf_counter()
+            for q in scan_queries:
+                scan_best_match(engine, q)
+            scan_column = f"{(time.perf_counter() - start) / len(scan_queries) * 1e6:>10.1f}"
+
+        print(f"{size:>10} {build_time:>8.1f} {scan_column} {exact_time * 1e6:>10.1f} "
+              f"{approx_time * 1e6:>10.1f} {recall:>7.3f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
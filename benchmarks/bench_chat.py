@@ -0,0 +1,127 @@
+"""Latency and throughput of /api/chat under concurrent load.
+
+Serves the app from a threaded WSGI server and drives it from client
+processes, so the load generator does not compete with the server for the
+GIL, with micro-batching on or off and with repeated (cacheable) or unique
+inputs.
+
+    python benchmarks/bench_chat.py --patterns 20000 --clients 16 --requests 4000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("ENGINE_DATA_DIR", tempfile.mkdtemp(prefix="bench-engine-"))
+os.environ.setdefault("JOB_SPOOL_DIR", tempfile.mkdtemp(prefix="bench-jobs-"))
+
+import numpy as np
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import app as app_module
+from utils.serving import MicroBatcher
+
+
+def make_messages(count, vocabulary, rng, words=(3, 8)):
+    return [' '.join(rng.choices(vocabulary, k=rng.randint(*words))) for _ in range(count)]
+
+
+class QuietHandler(WSGIRequestHandler):
+    # Keep-alive, so each client reuses one connection and server thread
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def client(url, messages):
+    session = requests.Session()
+    latencies = []
+    for message in messages:
+        start = time.perf_counter()
+        response = session.post(url, json={'message': message, 'top_k': 3})
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+def run_load(pool, url, messages, clients):
+    start = time.perf_counter()
+    shares = pool.starmap(client, [(url, messages[i::clients]) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate(shares) * 1000
+    return len(messages) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def make_pairs(count, vocabulary, rng):
+    """Pairs whose response repeats most of the input, so patterns get real confidence"""
+    pairs = []
+    for message in make_messages(count, vocabulary, rng):
+        words = message.split()
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+        pairs.append((message, ' '.join(words)))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patterns', type=int, default=20000)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--distinct', type=int, default=200,
+                        help="distinct messages in the repeated-input runs")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"w{i}" for i in range(args.vocabulary)]
+    app_module.start_services()
+    engine = app_module.ai_engine
+    pairs = make_pairs(args.patterns, vocabulary, rng)
+    for i in range(0, len(pairs), 1000):
+        engine.train_batch(pairs[i:i + 1000])
+
+    # Clients are forked before the server thread starts
+    pool = multiprocessing.get_context('fork').Pool(args.clients)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/chat"
+
+    batcher = app_module.chat_batcher or MicroBatcher(app_module._match_chat)
+    cache = app_module.chat_cache
+    cache_size = cache.max_entries
+    repeated = make_messages(args.distinct, vocabulary, rng)
+
+    print(f"{'batching':>9} {'inputs':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'batch':>7}")
+    for batching in (False, True):
+        app_module.chat_batcher = batcher if batching else None
+        for inputs in ('unique', 'repeated'):
+            if inputs == 'unique':
+                cache.max_entries = 0
+                messages = make_messages(args.requests, vocabulary, rng)
+            else:
+                cache.max_entries = cache_size
+                messages = [rng.choice(repeated) for _ in range(args.requests)]
+            before = batcher.stats()
+            rps, p50, p99 = run_load(pool, url, messages, args.clients)
+            after = batcher.stats()
+            batches = after['batches'] - before['batches']
+            mean_batch = (after['items'] - before['items']) / batches if batches else 1.0
+            print(f"{'on' if batching else 'off':>9} {inputs:>9} {rps:>9.0f} {p50:>9.2f} "
+                  f"{p99:>9.2f} {mean_batch:>7.1f}")
+    print(f"cache: {cache.stats()}")
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark AIEngine.generate_response lookup latency against pattern count.
+
+Compares the inverted token index with the original full scan over every
+pattern and checks that both pick the same match and score.
+
+    python benchmarks/bench_generate_response.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ai_engine import AIEngine
+
+
+def make_vocab(size: int, rng: random.Random):
+    return [f"w{i}_{rng.randrange(1 << 20):x}" for i in range(size)]
+
+
+def build_engine(pattern_count: int, vocab, rng: random.Random) -> AIEngine:
+    engine = AIEngine()
+    for _ in range(pattern_count):
+        words = rng.sample(vocab, rng.randint(3, 8))
+        engine._train_basic_patterns(' '.join(words), ' '.join(words[:3] + rng.sample(vocab, 2)))
+    return engine
+
+
+def scan_best_match(engine: AIEngine, input_text: str):
+    """The original linear scan, kept here as the reference implementation"""
+    best_match = None
+    best_score = 0
+    for pattern, confidence in zip(engine.pattern_keys, engine.patterns.confidences):
+        similarity = engine._calculate_similarity(input_text, pattern)
+        combined_score = similarity * confidence
+        if combined_score > best_score:
+            best_score = combined_score
+            best_match = pattern
+    return best_match, best_score
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--vocab', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-limit', type=int, default=100000,
+                        help='skip the full-scan baseline above this many patterns')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocab(args.vocab, rng)
+
+    print(f"{'patterns':>10} {'index_us':>10} {'scan_us':>10} {'speedup':>8}")
+    for size in args.sizes:
+        engine = build_engine(size, vocab, rng)
+        queries = [' '.join(rng.sample(vocab, rng.randint(2, 6))) for _ in range(args.queries)]
+
+        index_time, index_results = time_queries(engine._find_best_match, queries)
+        if size <= args.scan_limit:
+            scan_time, scan_results = time_queries(
+                lambda q: scan_best_match(engine, q), queries)
+            if scan_results != index_results:
+                raise SystemExit(f"Index results differ from full scan at {size} patterns")
+            print(f"{size:>10} {index_time * 1e6:>10.1f} {scan_time * 1e6:>10.1f} "
+                  f"{scan_time / index_time:>7.1f}x")
+        else:
+            print(f"{size:>10} {index_time * 1e6:>10.1f} {'-':>10} {'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
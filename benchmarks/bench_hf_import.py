@@ -0,0 +1,107 @@
+"""Peak memory and throughput of the streaming Hugging Face dataset import.
+
+Writes a local on-disk dataset of JSON Lines shards, then imports it
+through POST /api/datasets/huggingface/import with HF_LOCAL_DATASETS_DIR
+pointing at it, so no network is needed. Each size runs in its own
+process under tracemalloc; with streaming, peak memory should stay flat
+as the dataset grows. --materialize instead reads every pair into a list
+before inserting, as a whole-dataset import would.
+
+    python benchmarks/bench_hf_import.py --rows 10000 100000 --train
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_fixture(root, rows, shards=4):
+    """SQuAD-like records: a question and a {"text": [answers]} dict"""
+    path = os.path.join(root, 'bench-qa')
+    os.makedirs(path, exist_ok=True)
+    files = [open(os.path.join(path, f'train-{i:05d}.jsonl'), 'w') for i in range(shards)]
+    try:
+        for i in range(rows):
+            record = {'id': str(i), 'question': f"what is item {i} made of",
+                      'answers': {'text': [f"item {i} is made of part {i % 97}"]}}
+            files[i % shards].write(json.dumps(record) + '\n')
+    finally:
+        for f in files:
+            f.close()
+    return 'bench-qa'
+
+
+def measure(args):
+    scratch = tempfile.mkdtemp(prefix="bench-hf-import-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    os.environ.setdefault("ENGINE_DATA_DIR", os.path.join(scratch, "engine"))
+    os.environ.setdefault("BLOB_STORE_DIR", os.path.join(scratch, "blobs"))
+    os.environ.setdefault("JOB_SPOOL_DIR", os.path.join(scratch, "jobs"))
+    os.environ["HF_LOCAL_DATASETS_DIR"] = os.path.join(scratch, "hf")
+    os.environ["HF_DATASETS_OFFLINE"] = "1"
+    source = write_fixture(os.environ["HF_LOCAL_DATASETS_DIR"], args.size)
+
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.start_services()
+    client = app_module.app.test_client()
+    created = client.post('/api/models', json={'name': 'bench'}).get_json()
+    headers = {'X-API-Key': created['api_key']}
+    app_module.hf_datasets.get()  # library import is not part of the import cost
+
+    if args.materialize:
+        from utils import hf_datasets
+        original = hf_datasets.iter_pairs
+        app_module.iter_pairs = lambda *a, **kw: iter(list(original(*a, **kw)))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post('/api/datasets/huggingface/import', headers=headers,
+                           json={'dataset_id': source, 'train': args.train})
+    job_id = response.get_json()['job_id']
+    while True:
+        job = client.get(f'/api/jobs/{job_id}', headers=headers).get_json()
+        if job['status'] not in app_module.ACTIVE_STATUSES:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if job['status'] != 'complete':
+        raise SystemExit(f"import {job['status']}: {job.get('error')}")
+    return {'rows': job['result']['rows'], 'seconds': elapsed, 'peak_bytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--train', action='store_true', help="also train the model's engine")
+    parser.add_argument('--materialize', action='store_true',
+                        help="collect all pairs before inserting, for comparison")
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        print(json.dumps(measure(args)))
+        return
+
+    # One process per size, so one run's freed memory does not hide the next
+    print(f"{'rows':>9} {'seconds':>8} {'rows/s':>9} {'peak MB':>8}")
+    for rows in args.rows:
+        command = [sys.executable, __file__, '--size', str(rows)]
+        command += ['--train'] * args.train + ['--materialize'] * args.materialize
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['rows']:>9} {result['seconds']:>8.2f} "
+              f"{result['rows'] / result['seconds']:>9.0f} {result['peak_bytes'] / 2 ** 20:>8.1f}",
+              flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Memory used by AIEngine pattern storage: the old dict layout against PatternMemory.
+
+The old layout is {key: [responses]} plus a parallel {key: confidence}
+dict, and the pattern_keys list and pattern_ids dict the index kept next
+to them. Each layout is built in its own process from the same synthetic
+training stream, with fresh string objects per record as JSON parsing
+would produce, and measured with tracemalloc.
+
+    python benchmarks/bench_pattern_memory.py --patterns 1000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pattern_memory import PatternMemory
+
+
+def records(count, vocab, distinct_responses, extra, seed):
+    """(key, response, confidence) for count patterns; a fraction get extra responses"""
+    rng = random.Random(seed)
+    for i in range(count):
+        key = ' '.join(f"w{rng.randrange(vocab)}" for _ in range(rng.randint(3, 8))) + f" p{i}"
+        for _ in range(1 + (rng.random() < extra)):
+            yield key, f"response number {rng.randrange(distinct_responses)}", rng.random()
+
+
+def build_dicts(stream):
+    patterns, confidence_scores = {}, {}
+    pattern_keys, pattern_ids = [], {}
+    for key, response, confidence in stream:
+        if key not in patterns:
+            patterns[key] = []
+            pattern_ids[key] = len(pattern_keys)
+            pattern_keys.append(key)
+        patterns[key].append(response)
+        confidence_scores[key] = max(confidence, confidence_scores.get(key, 0))
+    return patterns, confidence_scores, pattern_keys, pattern_ids
+
+
+def build_compact(stream):
+    memory = PatternMemory()
+    for key, response, confidence in stream:
+        memory.add(key, response, confidence)
+    return memory
+
+
+LAYOUTS = {'dict': build_dicts, 'compact': build_compact}
+
+
+def measure(layout, args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = LAYOUTS[layout](records(args.patterns, args.vocab, args.distinct_responses,
+                                    args.extra_responses, args.seed))
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return {'layout': layout, 'bytes': current, 'build_s': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patterns', type=int, default=1000000)
+    parser.add_argument('--vocab', type=int, default=50000)
+    parser.add_argument('--distinct-responses', type=int, default=100000)
+    parser.add_argument('--extra-responses', type=float, default=0.2,
+                        help="fraction of patterns trained with a second response")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.layout:
+        print(json.dumps(measure(args.layout, args)))
+        return
+
+    # One process per layout, so neither sees the other's freed memory
+    results = []
+    for layout in ('dict', 'compact'):
+        output = subprocess.run([sys.executable, __file__, '--layout', layout] + sys.argv[1:],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output))
+
+    print(f"{'layout':>8} {'patterns':>9} {'MB':>9} {'B/pattern':>10} {'build_s':>8}")
+    for result in results:
+        print(f"{result['layout']:>8} {args.patterns:>9} {result['bytes'] / 2 ** 20:>9.1f} "
+              f"{result['bytes'] / args.patterns:>10.0f} {result['build_s']:>8.1f}")
+    print(f"reduction: {1 - results[1]['bytes'] / results[0]['bytes']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
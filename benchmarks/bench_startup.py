@@ -0,0 +1,156 @@
+"""Startup cost of the app: import time and time to the first served request.
+
+Each sample runs in a fresh interpreter. The import sample times
+`import app` and lists which heavy client libraries it loaded; the serve
+sample starts the app (start_services() included) behind a WSGI server
+on a free port and times from process start until the first request to
+--path is answered, interpreter startup included. Medians over --runs samples are checked against budgets
+and the run exits with status 1 if any is exceeded, or if `import app`
+loaded a module that should only load on first use (--lazy-module).
+
+    python benchmarks/bench_startup.py --runs 5 --import-budget 1.0 --first-request-budget 2.0
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ['datasets', 'huggingface_hub', 'pyarrow', 'pandas']
+
+
+def child_import(args):
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import app  # noqa: F401
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'import_s': elapsed,
+                      'loaded': [name for name in args.lazy_module if name in sys.modules]}))
+
+
+def child_serve(args):
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    app_module.start_services()
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    make_server('127.0.0.1', args.port, app_module.app, threaded=True,
+                request_handler=QuietHandler).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child_env():
+    """A scratch database and data directories, unless the caller set them"""
+    scratch = tempfile.mkdtemp(prefix="bench-startup-")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    env.setdefault("ENGINE_DATA_DIR", os.path.join(scratch, "engine"))
+    env.setdefault("BLOB_STORE_DIR", os.path.join(scratch, "blobs"))
+    env.setdefault("JOB_SPOOL_DIR", os.path.join(scratch, "jobs"))
+    return env
+
+
+def sample_import(args):
+    command = [sys.executable, __file__, '--child', 'import']
+    for name in args.lazy_module:
+        command += ['--lazy-module', name]
+    output = subprocess.run(command, check=True, capture_output=True, text=True,
+                            env=child_env()).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def sample_first_request(args):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{args.path}"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, __file__, '--child', 'serve', '--port', str(port)],
+                               env=child_env(), stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < args.timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=args.timeout) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except urllib.error.HTTPError:
+                # Any HTTP answer means the app is serving
+                return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"no response from {url} within {args.timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/', help="path requested as the first request")
+    parser.add_argument('--import-budget', type=float, default=1.2,
+                        help="seconds allowed for the median `import app`")
+    parser.add_argument('--first-request-budget', type=float, default=2.0,
+                        help="seconds allowed for the median time to first response")
+    parser.add_argument('--lazy-module', action='append', default=None,
+                        help=f"module `import app` must not load (default: {', '.join(LAZY_MODULES)})")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--child', choices=['import', 'serve'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.lazy_module is None:
+        args.lazy_module = LAZY_MODULES
+
+    if args.child == 'import':
+        return child_import(args)
+    if args.child == 'serve':
+        return child_serve(args)
+
+    imports, first_requests, loaded = [], [], set()
+    for _ in range(args.runs):
+        result = sample_import(args)
+        imports.append(result['import_s'])
+        loaded.update(result['loaded'])
+        first_requests.append(sample_first_request(args))
+
+    failures = []
+    print(f"{'measure':<22} {'min s':>8} {'median s':>9} {'max s':>8} {'budget s':>9}  status")
+    for name, values, budget in (('import app', imports, args.import_budget),
+                                 ('first request', first_requests, args.first_request_budget)):
+        status = 'ok' if median(values) <= budget else 'OVER BUDGET'
+        if status != 'ok':
+            failures.append(name)
+        print(f"{name:<22} {min(values):>8.3f} {median(values):>9.3f} {max(values):>8.3f} "
+              f"{budget:>9.3f}  {status}")
+    if loaded:
+        print(f"\nloaded at import: {', '.join(sorted(loaded))}")
+        failures.append('lazy modules')
+    if failures:
+        print(f"\nstartup budget exceeded: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
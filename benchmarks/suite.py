@@ -0,0 +1,328 @@
+"""Benchmark suite for the engine and HTTP hot paths, with baseline comparison.
+
+Every case runs at each requested size on synthetic data generated from a
+fixed seed: training streams for the engine, and models and datasets in a
+database behind the Flask test client. The database is a fresh SQLite file
+unless DATABASE_URL points elsewhere, e.g. at a local Postgres.
+
+    python benchmarks/suite.py --sizes small medium --output results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.25
+    python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+
+Results are JSON: per case and size, the min, median and p95 time per
+operation over several samples. With --baseline, one of them (--statistic,
+min by default as the least noisy) is compared against the stored value
+and the run exits with status 1 if any case is slower by more than its
+threshold (--threshold, overridable per case with
+--case-threshold 'http.*=0.5').
+"""
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_scratch = tempfile.mkdtemp(prefix="bench-suite-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'bench.db')}")
+os.environ.setdefault("ENGINE_DATA_DIR", os.path.join(_scratch, "engine"))
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(_scratch, "blobs"))
+os.environ.setdefault("JOB_SPOOL_DIR", os.path.join(_scratch, "jobs"))
+
+import numpy as np
+
+from utils.ai_engine import AIEngine
+
+SIZES = {'small': 1000, 'medium': 10000, 'large': 100000}
+CASES = {}
+
+
+def case(name, number=100, repeat=7):
+    """Register fn(fixture, i) as a case; one sample times `number` calls"""
+    def register(fn):
+        CASES[name] = {'fn': fn, 'number': number, 'repeat': repeat}
+        return fn
+    return register
+
+
+def sentences(rng, vocabulary, count, words=(3, 10)):
+    return [' '.join(rng.choices(vocabulary, k=rng.randint(*words))) for _ in range(count)]
+
+
+def training_stream(rng, vocabulary, count):
+    """Pairs whose output reuses part of the input, like conversational data"""
+    pairs = []
+    for text in sentences(rng, vocabulary, count):
+        words = text.split()
+        pairs.append((text, ' '.join(words[:3] + rng.choices(vocabulary, k=rng.randint(1, 5)))))
+    return pairs
+
+
+class Fixture:
+    """Synthetic engine, queries and database rows for one size"""
+
+    def __init__(self, size, seed, app_module):
+        rng = random.Random(seed)
+        vocabulary = [f"w{i}" for i in range(max(200, size // 4))]
+        self.size = size
+        self.pairs = training_stream(rng, vocabulary, size)
+        self.extra_pairs = training_stream(rng, vocabulary, 2000)
+        self.queries = sentences(rng, vocabulary, 1000)
+        self.engine = AIEngine()
+        self.engine.train_batch(self.pairs)
+        self.app = app_module
+        self.client = app_module.app.test_client()
+        self._database_rows(rng)
+
+    def _database_rows(self, rng):
+        client = self.client
+        created = client.post('/api/models', json={'name': f'bench-{self.size}'}).get_json()
+        self.model_id = created['model_id']
+        self.api_key = created['api_key']
+        with self.app.app.app_context():
+            model = self.app.db.session.get(self.app.AIModel, self.model_id)
+            model.state = {'engine': self.engine.to_state()}
+            self.app.db.session.commit()
+
+        rows = [{'input': i, 'output': o} for i, o in self.pairs]
+        response = client.post('/api/datasets', json={'name': f'bench-{self.size}', 'data': rows},
+                               headers=self.headers)
+        job_id = response.get_json()['job_id']
+        while True:
+            job = client.get(f'/api/jobs/{job_id}', headers=self.headers).get_json()
+            if job['status'] not in self.app.ACTIVE_STATUSES:
+                break
+            time.sleep(0.05)
+        self.dataset_id = job['result']['dataset_id']
+        export = client.get(f'/api/models/{self.model_id}/export', headers=self.headers)
+        self.export_etag = export.headers['ETag']
+
+    @property
+    def headers(self):
+        return {'X-API-Key': self.api_key}
+
+    def get(self, path, **kwargs):
+        response = self.client.get(path, **kwargs)
+        assert response.status_code < 400, (path, response.status_code)
+        response.get_data()
+        return response
+
+
+@case('engine.train', number=200)
+def bench_train(f, i):
+    f.engine.train(*f.extra_pairs[i % len(f.extra_pairs)])
+
+
+@case('engine.train_batch_100', number=5)
+def bench_train_batch(f, i):
+    start = (i * 100) % (len(f.extra_pairs) - 100)
+    f.engine.train_batch(f.extra_pairs[start:start + 100])
+
+
+@case('engine.generate_response', number=50)
+def bench_generate_response(f, i):
+    f.engine.generate_response(f.queries[i % len(f.queries)])
+
+
+@case('engine.find_best_matches_64', number=5)
+def bench_find_best_matches(f, i):
+    start = (i * 64) % (len(f.queries) - 64)
+    f.engine.find_best_matches(f.queries[start:start + 64], top_k=3)
+
+
+@case('engine.calculate_similarity', number=1000)
+def bench_similarity(f, i):
+    f.engine._calculate_similarity(*f.pairs[i % len(f.pairs)])
+
+
+@case('http.require_api_key_kdf', number=3, repeat=5)
+def bench_auth_kdf(f, i):
+    # A revalidation that hits the 304 path, so the key check dominates
+    cache = f.app.verified_keys
+    max_entries, cache.max_entries = cache.max_entries, 0
+    cache.invalidate_model(f.model_id)
+    try:
+        f.get(f'/api/models/{f.model_id}/export',
+              headers={**f.headers, 'If-None-Match': f.export_etag})
+    finally:
+        cache.max_entries = max_entries
+
+
+@case('http.require_api_key_cached', number=50)
+def bench_auth_cached(f, i):
+    f.get(f'/api/models/{f.model_id}/export', headers={**f.headers, 'If-None-Match': f.export_etag})
+
+
+@case('http.list_models', number=20)
+def bench_list_models(f, i):
+    f.get('/api/models')
+
+
+@case('http.list_datasets', number=20)
+def bench_list_datasets(f, i):
+    f.get('/api/datasets')
+
+
+@case('http.dataset_rows_page', number=20)
+def bench_dataset_rows(f, i):
+    f.get(f'/api/datasets/{f.dataset_id}/rows?offset={(i * 100) % f.size}&limit=100')
+
+
+@case('http.export_model', number=3, repeat=5)
+def bench_export(f, i):
+    f.get(f'/api/models/{f.model_id}/export', headers=f.headers)
+
+
+@case('http.chat', number=50)
+def bench_chat(f, i):
+    response = f.client.post('/api/chat', headers=f.headers, json={
+        'message': f.queries[i % len(f.queries)], 'top_k': 3, 'model_id': f.model_id})
+    assert response.status_code == 200, response.get_json()
+
+
+def measure(fn, fixture, number, repeat):
+    fn(fixture, 0)  # warm-up
+    samples = []
+    calls = 0
+    # Collector pauses land in whichever sample triggers them; collect
+    # between samples instead
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            for _ in range(number):
+                calls += 1
+                fn(fixture, calls)
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        gc.enable()
+    samples = np.array(samples) * 1e6
+    median = float(np.median(samples))
+    return {
+        'min_us': float(samples.min()),
+        'median_us': median,
+        'p95_us': float(np.percentile(samples, 95)),
+        'ops_per_s': 1e6 / median if median else None,
+        'samples': len(samples)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                               text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def threshold_for(name, default, overrides):
+    for pattern, value in overrides:
+        if fnmatch.fnmatch(name, pattern):
+            return value
+    return default
+
+
+def compare(results, baseline, default_threshold, overrides, statistic='min_us'):
+    """Print a comparison table; returns the names of regressed cases"""
+    regressions = []
+    print(f"\n{'case':<44} {'baseline us':>12} {'current us':>12} {'change':>8}  status")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None or statistic not in base:
+            print(f"{name:<44} {'-':>12} {current[statistic]:>12.1f} {'':>8}  new")
+            continue
+        change = current[statistic] / base[statistic] - 1
+        limit = threshold_for(name, default_threshold, overrides)
+        status = 'ok'
+        if change > limit:
+            status = f'REGRESSED (>{limit:.0%})'
+            regressions.append(name)
+        elif change < -limit:
+            status = 'improved'
+        print(f"{name:<44} {base[statistic]:>12.1f} {current[statistic]:>12.1f} "
+              f"{change:>+8.1%}  {status}")
+    return regressions
+
+
+def parse_case_threshold(value):
+    pattern, sep, threshold = value.rpartition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError("expected PATTERN=THRESHOLD")
+    return pattern, float(threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small', 'medium'])
+    parser.add_argument('--cases', nargs='+', default=['*'],
+                        help="glob patterns of case names to run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="compare against this results JSON")
+    parser.add_argument('--save-baseline', help="write results JSON as the new baseline")
+    parser.add_argument('--statistic', choices=['min', 'median', 'p95'], default='min',
+                        help="per-operation time compared against the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown, as a fraction")
+    parser.add_argument('--case-threshold', type=parse_case_threshold, action='append',
+                        default=[], metavar='PATTERN=THRESHOLD')
+    args = parser.parse_args()
+
+    import app as app_module
+    app_module.start_services()
+
+    results = {}
+    print(f"{'case':<44} {'min us':>12} {'median us':>12} {'p95 us':>12} {'ops/s':>10}")
+    for size_name in args.sizes:
+        fixture = Fixture(SIZES[size_name], args.seed, app_module)
+        for name, spec in CASES.items():
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in args.cases):
+                continue
+            key = f"{name}[{size_name}]"
+            results[key] = result = measure(spec['fn'], fixture, spec['number'], spec['repeat'])
+            print(f"{key:<44} {result['min_us']:>12.1f} {result['median_us']:>12.1f} "
+                  f"{result['p95_us']:>12.1f} "
+                  f"{result['ops_per_s']:>10.1f}", flush=True)
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+            'sizes': {name: SIZES[name] for name in args.sizes},
+            'seed': args.seed
+        },
+        'results': results
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('platform') != report['meta']['platform']:
+            print(f"\nnote: baseline was recorded on {baseline['meta'].get('platform')}")
+        regressions = compare(results, baseline['results'], args.threshold, args.case_threshold,
+                              statistic=f"{args.statistic}_us")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
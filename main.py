@@ -1,4 +1,10 @@
-from app import app, socketio
+import os
+
+from app import app, socketio, start_services
 
 if __name__ == "__main__":
+    # debug=True serves from a reloader child (WERKZEUG_RUN_MAIN=true); this
+    # parent only watches files, so it must not open the engine or run jobs
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_services()
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
@@ -1,5 +1,7 @@
 from database import db
 from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 import json
@@ -19,59 +21,266 @@ class AIMemory(db.Model):
     confidence = db.Column(db.Float, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class DatasetRow(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    # Raw JSON text, so rows can be streamed without re-serializing
+    content = db.Column(db.Text, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('dataset_id', 'position', name='uq_dataset_row_position'),
+    )
+
+class Blob(db.Model):
+    """Reference count for a file in the content-addressed blob store"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def acquire(sha256, size):
+        """Add a reference, creating the row on first use.
+
+        Counts change in SQL so concurrent imports of the same content
+        don't lose updates; if another transaction inserts the row first,
+        the failed insert is rolled back to a savepoint and counted instead.
+        """
+        if Blob._add_references(sha256, 1):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(Blob(sha256=sha256, size=size, ref_count=1))
+        except IntegrityError:
+            Blob._add_references(sha256, 1)
+    
+    @staticmethod
+    def release(sha256):
+        Blob._add_references(sha256, -1)
+    
+    @staticmethod
+    def _add_references(sha256, delta):
+        query = update(Blob).where(Blob.sha256 == sha256)
+        if delta < 0:
+            query = query.where(Blob.ref_count > 0)
+        return db.session.execute(query.values(ref_count=Blob.ref_count + delta)).rowcount
+
 class Dataset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     version = db.Column(db.String(20), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    data = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Legacy whole-dataset payload; list payloads move to DatasetRow on first use
+    data = db.Column(db.JSON)
+    row_count = db.Column(db.Integer)
+    byte_size = db.Column(db.BigInteger)
     model_id = db.Column(db.Integer, db.ForeignKey('ai_model.id'))
     
+    ROW_BATCH_SIZE = 1000
+    
+    # Fields listings return by default; heavy JSON columns must be asked for
+    SUMMARY_FIELDS = ('id', 'name', 'version', 'description', 'created_at', 'row_count', 'byte_size')
+    ALL_FIELDS = SUMMARY_FIELDS + ('data',)
+    
     def __repr__(self):
         return f'<Dataset {self.name} v{self.version}>'
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=ALL_FIELDS):
+        result = {
             'id': self.id,
             'name': self.name,
             'version': self.version,
             'description': self.description,
             'created_at': self.created_at.isoformat(),
-            'data': self.data
+            'row_count': self.row_count,
+            'byte_size': self.byte_size,
         }
+        if 'data' in fields:
+            result['data'] = self.data if self.uses_legacy_data else list(self.iter_rows())
+        return {key: value for key, value in result.items() if key in fields}
+    
+    @property
+    def uses_legacy_data(self):
+        return self.row_count is None
+    
+    def append_rows(self, rows):
+        """Bulk-insert rows after the current last row, in batches. Requires an id."""
+        position = self.row_count or 0
+        byte_size = self.byte_size or 0
+        batch = []
+        for row in rows:
+            content = json.dumps(row, ensure_ascii=False)
+            batch.append({'dataset_id': self.id, 'position': position, 'content': content})
+            position += 1
+            byte_size += len(content.encode('utf-8'))
+            if len(batch) >= self.ROW_BATCH_SIZE:
+                db.session.execute(db.insert(DatasetRow), batch)
+                batch = []
+        if batch:
+            db.session.execute(db.insert(DatasetRow), batch)
+        self.row_count = position
+        self.byte_size = byte_size
+    
+    def ensure_row_storage(self):
+        """Move a legacy list payload into DatasetRow; returns True if rows are usable"""
+        if not self.uses_legacy_data:
+            return True
+        if not isinstance(self.data, list):
+            return False
+        rows, self.data = self.data, None
+        self.append_rows(rows)
+        return True
+    
+    def iter_raw_rows(self, offset=0, limit=None):
+        """Yield row JSON text in order, reading ROW_BATCH_SIZE rows per query"""
+        end = self.row_count or 0
+        if limit is not None:
+            end = min(end, offset + limit)
+        position = offset
+        while position < end:
+            batch_end = min(position + self.ROW_BATCH_SIZE, end)
+            contents = db.session.execute(
+                db.select(DatasetRow.position, DatasetRow.content)
+                .where(DatasetRow.dataset_id == self.id,
+                       DatasetRow.position >= position,
+                       DatasetRow.position < batch_end)
+                .order_by(DatasetRow.position)
+            ).all()
+            if not contents:
+                return
+            for _, content in contents:
+                yield content
+            position = batch_end
+    
+    def iter_rows(self, offset=0, limit=None):
+        for content in self.iter_raw_rows(offset, limit):
+            yield json.loads(content)
+    
+    @staticmethod
+    def import_stream(reader, model, on_progress=None, defaults=None):
+        """Read one dataset object from a stream reader, bulk-inserting its rows.
+        
+        defaults supplies fields the object may leave out, such as version.
+        """
+        fields = dict(defaults or {})
+        dataset = None
+        for key in reader.iter_object():
+            if key != 'data':
+                fields[key] = reader.read_value()
+                continue
+            
+            dataset = Dataset(
+                name=fields.get('name', ''),
+                version=fields.get('version', ''),
+                description=fields.get('description', ''),
+                model=model
+            )
+            db.session.add(dataset)
+            db.session.flush()
+            
+            items = reader.iter_array_if_next()
+            if items is None:
+                dataset.data = reader.read_value()
+                continue
+            
+            def rows():
+                count = 0
+                for _ in items:
+                    yield reader.read_value()
+                    count += 1
+                    if on_progress and count % Dataset.ROW_BATCH_SIZE == 0:
+                        on_progress(dataset.name, count)
+                if on_progress:
+                    on_progress(dataset.name, count)
+            
+            dataset.append_rows(rows())
+        
+        if dataset is None or 'name' not in fields or 'version' not in fields:
+            raise ValueError("Invalid dataset format: missing required fields")
+        dataset.name = fields['name']
+        dataset.version = fields['version']
+        dataset.description = fields.get('description', '')
+        return dataset
 
 class AIModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     version = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    api_key_id = db.Column(db.String(16), unique=True, index=True)
     api_key_hash = db.Column(db.String(256))
     configuration = db.Column(db.JSON)
     state = db.Column(db.JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     datasets = db.relationship('Dataset', backref='model', lazy=True)
     
+    SUMMARY_FIELDS = ('id', 'name', 'version', 'created_at', 'configuration')
+    ALL_FIELDS = SUMMARY_FIELDS + ('state', 'datasets')
+    
     def set_api_key(self):
-        api_key = secrets.token_urlsafe(32)
-        self.api_key_hash = generate_password_hash(api_key)
+        api_key, self.api_key_id, self.api_key_hash = AIModel.generate_api_key()
         return api_key
     
+    @staticmethod
+    def generate_api_key():
+        """Return (api_key, key_id, key_hash) for a new key"""
+        # Keys look like "<key_id>.<secret>"; the public key ID is indexed so
+        # the owning row is found without comparing against salted hashes
+        key_id = secrets.token_hex(8)
+        api_key = f"{key_id}.{secrets.token_urlsafe(32)}"
+        return api_key, key_id, generate_password_hash(api_key)
+    
+    @staticmethod
+    def parse_api_key_id(api_key):
+        key_id, sep, secret = api_key.partition('.')
+        return key_id if sep and key_id and secret else None
+    
     def verify_api_key(self, api_key):
         return check_password_hash(self.api_key_hash, api_key)
     
     def __repr__(self):
         return f'<AIModel {self.name} v{self.version}>'
     
-    def to_dict(self):
-        return {
+    @property
+    def artifacts(self):
+        """Manifest of stored files: {path: {"sha256": ..., "size": ...}}"""
+        return (self.state or {}).get('artifacts', {})
+    
+    def set_artifacts(self, manifest):
+        """Replace the artifact manifest, moving blob references to match"""
+        for entry in manifest.values():
+            Blob.acquire(entry['sha256'], entry['size'])
+        for entry in self.artifacts.values():
+            Blob.release(entry['sha256'])
+        self.state = {**(self.state or {}), 'artifacts': manifest}
+    
+    def add_artifact(self, path, entry):
+        """Add or replace one manifest entry without touching the others"""
+        Blob.acquire(entry['sha256'], entry['size'])
+        previous = self.artifacts.get(path)
+        if previous is not None:
+            Blob.release(previous['sha256'])
+        self.state = {**(self.state or {}), 'artifacts': {**self.artifacts, path: entry}}
+    
+    def release_artifacts(self):
+        self.set_artifacts({})
+    
+    def to_dict(self, fields=ALL_FIELDS, dataset_fields=Dataset.ALL_FIELDS):
+        result = {
             'id': self.id,
             'name': self.name,
             'version': self.version,
             'created_at': self.created_at.isoformat(),
             'configuration': self.configuration,
-            'state': self.state,
-            'datasets': [ds.to_dict() for ds in self.datasets]
         }
+        if 'state' in fields:
+            result['state'] = self.state
+        if 'datasets' in fields:
+            result['datasets'] = [ds.to_dict(dataset_fields) for ds in self.datasets]
+        return {key: value for key, value in result.items() if key in fields}
     
     @staticmethod
     def from_dict(data):
@@ -112,9 +321,150 @@ class AIModel(db.Model):
         if not all(field in data for field in required_fields):
             raise ValueError("Invalid model file format: missing required fields")
             
-        model_info = data['model_info']
+        AIModel.validate_model_info(data['model_info'])
+        return True
+    
+    @staticmethod
+    def validate_model_info(model_info):
         required_model_fields = ['name', 'version', 'configuration', 'state']
         if not all(field in model_info for field in required_model_fields):
             raise ValueError("Invalid model info format: missing required fields")
-            
         return True
+    
+    @staticmethod
+    def import_stream(reader, on_progress=None, trusted_blobs=None):
+        """Import an exported model document from a stream reader.
+        
+        Dataset rows are bulk-inserted as they are read. Objects are added to
+        the session but not committed; the caller commits or rolls back.
+        Validation runs as soon as the fields it needs have been read, which
+        for exported files is before the first dataset row is written.
+        
+        Exports carry artifact manifests but not the blobs, and naming a hash
+        proves nothing about owning it. Only manifest entries whose blob is
+        in trusted_blobs ({sha256: size}) are kept; the rest are dropped.
+        """
+        model = None
+        has_metadata = False
+        for key in reader.iter_object():
+            if key == 'model_info':
+                model = AIModel._import_model_info(reader, on_progress, trusted_blobs or {})
+            elif key == 'metadata':
+                reader.read_value()
+                has_metadata = True
+            else:
+                reader.read_value()
+        
+        if model is None or not has_metadata:
+            raise ValueError("Invalid model file format: missing required fields")
+        return model
+    
+    @staticmethod
+    def _import_model_info(reader, on_progress, trusted_blobs):
+        info = {}
+        model = None
+        for key in reader.iter_object():
+            if key != 'datasets':
+                info[key] = reader.read_value()
+                continue
+            
+            items = reader.iter_array_if_next()
+            if items is None:
+                if reader.read_value():
+                    raise ValueError("Invalid model info format: datasets must be a list")
+                continue
+            
+            # Create the model before its first dataset row is written
+            AIModel.validate_model_info(info)
+            model = model or AIModel._from_model_info(info, trusted_blobs)
+            for _ in items:
+                Dataset.import_stream(reader, model, on_progress)
+        
+        AIModel.validate_model_info(info)
+        return model or AIModel._from_model_info(info, trusted_blobs)
+    
+    @staticmethod
+    def _from_model_info(info, trusted_blobs):
+        state = dict(info.get('state') or {})
+        manifest = {}
+        for path, entry in (state.pop('artifacts', None) or {}).items():
+            sha256 = entry.get('sha256') if isinstance(entry, dict) else None
+            if isinstance(sha256, str) and sha256 in trusted_blobs:
+                manifest[path] = {'sha256': sha256, 'size': trusted_blobs[sha256]}
+        model = AIModel(
+            name=info['name'],
+            version=info.get('version', '1.0'),
+            configuration=info.get('configuration', {}),
+            state=state
+        )
+        model.set_artifacts(manifest)
+        db.session.add(model)
+        db.session.flush()
+        return model
+
+class GitHubImport(db.Model):
+    """Progress of a GitHub import, kept so an interrupted import can resume"""
+    id = db.Column(db.String(32), primary_key=True)
+    model_id = db.Column(db.Integer, db.ForeignKey('ai_model.id', ondelete='CASCADE'), nullable=False)
+    repo_url = db.Column(db.String(500), nullable=False)
+    # Pinned on the first run so a resumed import sees the same tree
+    commit_sha = db.Column(db.String(40))
+    job_id = db.Column(db.String(32))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    total_files = db.Column(db.Integer, default=0)
+    completed_files = db.Column(db.Integer, default=0)
+    total_bytes = db.Column(db.BigInteger, default=0)
+    completed_bytes = db.Column(db.BigInteger, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'import_id': self.id,
+            'model_id': self.model_id,
+            'repo_url': self.repo_url,
+            'commit_sha': self.commit_sha,
+            'job_id': self.job_id,
+            'status': self.status,
+            'total_files': self.total_files,
+            'completed_files': self.completed_files,
+            'total_bytes': self.total_bytes,
+            'completed_bytes': self.completed_bytes,
+            'error': self.error
+        }
+
+class Job(db.Model):
+    """A background operation run by utils.jobs.JobScheduler"""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    # The model the job works on, and the model whose API key submitted it
+    model_id = db.Column(db.Integer, index=True)
+    requested_by = db.Column(db.Integer, index=True)
+    params = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    progress = db.Column(db.Float, default=0.0)
+    message = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    owner = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'model_id': self.model_id,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,5 +1,29 @@
 let currentDatasetId = null;
 
+// Imports and exports run as background jobs; resolves with the finished
+// job, or rejects if it failed or was cancelled
+function waitForJob(jobId, apiKey, interval = 1000) {
+    return fetch(`/api/jobs/${jobId}`, {
+        headers: {
+            'X-API-Key': apiKey
+        }
+    })
+    .then(response => response.json())
+    .then(job => {
+        if (!job.status) {
+            throw new Error(job.error || 'Job not found');
+        }
+        if (['queued', 'running', 'cancelling'].includes(job.status)) {
+            return new Promise(resolve => setTimeout(resolve, interval))
+                .then(() => waitForJob(jobId, apiKey, interval));
+        }
+        if (job.status !== 'complete') {
+            throw new Error(job.error || `Job ${job.status}`);
+        }
+        return job;
+    });
+}
+
 function searchHuggingFaceDatasets() {
     const query = document.getElementById('huggingfaceSearch').value;
     const resultsContainer = document.getElementById('huggingfaceResults');
@@ -108,7 +132,8 @@ function importDataset() {
             return;
         }
         
-        alert('Dataset imported successfully!');
+        // Rows are imported by a background job; the dataset fills in as it runs
+        alert('Dataset import started');
         loadDatasets();
     })
     .catch(error => {
@@ -238,10 +263,13 @@ function importHuggingFaceModel(modelId) {
             return;
         }
         
-        localStorage.setItem(`model_${data.model_id}_api_key`, data.api_key);
-        bootstrap.Modal.getInstance(document.getElementById('huggingFaceImportModal')).hide();
-        alert('Model imported successfully!');
-        loadModels();
+        // The model is created by the job; its ID arrives with the result
+        return waitForJob(data.job_id, apiKey).then(job => {
+            localStorage.setItem(`model_${job.result.model_id}_api_key`, data.api_key);
+            bootstrap.Modal.getInstance(document.getElementById('huggingFaceImportModal')).hide();
+            alert('Model imported successfully!');
+            loadModels();
+        });
     })
     .catch(error => {
         alert(`Error: ${error.message}`);
@@ -292,10 +320,14 @@ function importFromGitHub() {
             return;
         }
         
+        // The model exists from the start, so an interrupted import can be resumed with its key
         localStorage.setItem(`model_${data.model_id}_api_key`, data.api_key);
-        bootstrap.Modal.getInstance(document.getElementById('githubImportModal')).hide();
-        alert('Model imported successfully!');
         loadModels();
+        return waitForJob(data.job_id, data.api_key).then(() => {
+            bootstrap.Modal.getInstance(document.getElementById('githubImportModal')).hide();
+            alert('Model imported successfully!');
+            loadModels();
+        });
     })
     .catch(error => {
         alert(`Error: ${error.message}`);
@@ -314,15 +346,21 @@ function exportToGitHub() {
         return;
     }
     
-    const progressBar = document.getElementById('githubExportProgress');
-    progressBar.classList.remove('d-none');
+    const currentModelId = document.querySelector('#modelsTable tr[data-selected="true"]')?.dataset.modelId;
+    if (!currentModelId) {
+        alert('Please select a model to export');
+        return;
+    }
     
-    const apiKey = localStorage.getItem('current_api_key');
+    const apiKey = localStorage.getItem(`model_${currentModelId}_api_key`);
     if (!apiKey) {
-        alert('Please generate an API key first');
+        alert('API key not found for this model');
         return;
     }
     
+    const progressBar = document.getElementById('githubExportProgress');
+    progressBar.classList.remove('d-none');
+    
     fetch('/api/models/github/export', {
         method: 'POST',
         headers: {
@@ -330,6 +368,7 @@ function exportToGitHub() {
             'X-API-Key': apiKey
         },
         body: JSON.stringify({
+            model_id: Number(currentModelId),
             repo_url: repoUrl,
             commit_message: commitMessage
         })
@@ -341,8 +380,10 @@ function exportToGitHub() {
             return;
         }
         
-        bootstrap.Modal.getInstance(document.getElementById('githubExportModal')).hide();
-        alert('Model exported successfully!');
+        return waitForJob(data.job_id, apiKey).then(job => {
+            bootstrap.Modal.getInstance(document.getElementById('githubExportModal')).hide();
+            alert(job.result.message);
+        });
     })
     .catch(error => {
         alert(`Error: ${error.message}`);
@@ -394,13 +435,16 @@ function importModel() {
             return;
         }
         
-        localStorage.setItem(`model_${data.model_id}_api_key`, data.api_key);
-        
-        bootstrap.Modal.getInstance(document.getElementById('importModelModal')).hide();
-        
-        alert('Model imported successfully!');
-        
-        loadModels();
+        // The model is created by the job; its ID arrives with the result
+        return waitForJob(data.job_id, apiKey).then(job => {
+            localStorage.setItem(`model_${job.result.model_id}_api_key`, data.api_key);
+            
+            bootstrap.Modal.getInstance(document.getElementById('importModelModal')).hide();
+            
+            alert('Model imported successfully!');
+            
+            loadModels();
+        });
     })
     .catch(error => {
         alert(`Error: ${error.message}`);
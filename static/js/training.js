@@ -60,6 +60,37 @@ function createErrorContainer() {
     return container;
 }
 
+// Training telemetry arrives as coalesced delta frames; acknowledging each
+// frame lets the server hold back further frames while this tab is busy.
+// A reset frame is always followed by a snapshot frame that refills the view
+function applyTrainingFrame(frame) {
+    if (frame.reset) {
+        memoryPatterns.clear();
+    }
+    for (const [pattern, confidence] of Object.entries(frame.patterns)) {
+        memoryPatterns.set(pattern, confidence);
+    }
+    if (frame.level_stats) {
+        currentLevel = frame.level;
+        trainingStats.successRate = frame.level_stats.success_rate;
+        trainingStats.patternDiversity = frame.level_stats.pattern_diversity;
+        trainingStats.iterations = frame.level_stats.training_count;
+    }
+    if (trainingChart) trainingChart.update('none');
+    if (memoryChart) memoryChart.update('none');
+}
+
+socket.on('connect', () => {
+    socket.emit('subscribe_training', {});
+    // Job status and import progress only go to clients holding the model's key
+    const apiKey = localStorage.getItem('current_api_key');
+    if (apiKey) socket.emit('subscribe_jobs', {api_key: apiKey});
+});
+socket.on('training_frame', (frame, ack) => {
+    applyTrainingFrame(frame);
+    if (ack) ack(frame.seq);
+});
+
 document.addEventListener('DOMContentLoaded', async function() {
     try {
         // Create error container
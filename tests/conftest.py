@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_scratch = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ.setdefault("ENGINE_DATA_DIR", os.path.join(_scratch, "engine"))
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(_scratch, "blobs"))
+os.environ.setdefault("JOB_SPOOL_DIR", os.path.join(_scratch, "jobs"))
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app as app_module
+    app_module.start_services()
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def make_model(client):
+    """Create a model; returns (model_id, headers with its API key)"""
+    def make(name='test-model'):
+        created = client.post('/api/models', json={'name': name}).get_json()
+        return created['model_id'], {'X-API-Key': created['api_key']}
+    return make
+
+
+@pytest.fixture
+def wait_for_job(client, app_module):
+    def wait(job_id, headers, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = client.get(f'/api/jobs/{job_id}', headers=headers).get_json()
+            if job['status'] not in app_module.ACTIVE_STATUSES:
+                return job
+            assert time.monotonic() < deadline, f"job still {job['status']}"
+            time.sleep(0.05)
+    return wait
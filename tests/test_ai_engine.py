@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from utils.ai_engine import AIEngine
+
+
+def training_stream(count, seed=0):
+    """Pairs with repeats, shared words and some invalid samples.
+
+    Stretches of near-echo pairs score high enough to level the engine up,
+    so every level's scoring path is replayed.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(300)]
+    pairs = []
+    for i in range(count):
+        if i % 97 == 0:
+            pairs.append(('', 'empty input'))
+            continue
+        words = rng.choices(vocabulary, k=rng.randint(1, 12))
+        if (i // 250) % 2 == 0:
+            pairs.append((' '.join(words), ' '.join(words + rng.choices(vocabulary, k=rng.randint(0, 1)))))
+            continue
+        if pairs and rng.random() < 0.2:
+            pairs.append(rng.choice(pairs))
+            continue
+        output = words[:rng.randint(0, 3)] + rng.choices(vocabulary, k=rng.randint(1, 8))
+        pairs.append((' '.join(words), ' '.join(output)))
+    return pairs
+
+
+class SummingEngine(AIEngine):
+    """Level stats computed as before the running entry counter: summing every response list"""
+
+    def _update_level_stats(self, score):
+        stats = self.memory['level_stats']
+        stats['training_count'] += 1
+        stats['success_rate'] = (
+            (stats['success_rate'] * (stats['training_count'] - 1) + score) /
+            stats['training_count']
+        )
+        unique_patterns = len(self.patterns)
+        total_patterns = sum(len(responses) for _, responses in self.patterns.items())
+        stats['pattern_diversity'] = unique_patterns / max(1, total_patterns)
+        if (stats['success_rate'] > 0.8 and
+                stats['pattern_diversity'] > 0.6 and
+                stats['training_count'] >= 5):
+            self._try_level_up()
+
+
+def test_running_entry_count_matches_summing():
+    reference = SummingEngine()
+    engine = AIEngine()
+    level_ups = 0
+    for step, (input_text, output_text) in enumerate(training_stream(3000)):
+        level = engine.current_level
+        assert engine.train(input_text, output_text)[0] == reference.train(input_text, output_text)[0]
+        assert engine.memory['level_stats'] == reference.memory['level_stats'], step
+        assert engine.current_level == reference.current_level, step
+        level_ups += engine.current_level > level
+    assert level_ups == engine.max_level - 1
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 256, 5000])
+def test_train_batch_matches_train(batch_size):
+    pairs = training_stream(5000)
+    one_by_one = AIEngine()
+    single_scores = [one_by_one.train(i, o)[0] for i, o in pairs]
+
+    batched = AIEngine()
+    batch_scores = []
+    for start in range(0, len(pairs), batch_size):
+        batch_scores.extend(batched.train_batch(pairs[start:start + batch_size])[0])
+
+    assert batch_scores == pytest.approx(single_scores)
+    assert batched.to_state() == one_by_one.to_state()
+    assert batched.current_level == one_by_one.current_level == one_by_one.max_level
+
+
+def scan_best_match(engine, input_text):
+    """The original full scan: _calculate_similarity against every pattern"""
+    best_match = None
+    best_score = 0
+    for pattern, confidence in zip(engine.pattern_keys, engine.patterns.confidences):
+        combined_score = engine._calculate_similarity(input_text, pattern) * confidence
+        if combined_score > best_score:
+            best_score = combined_score
+            best_match = pattern
+    return best_match, best_score
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_indexed_lookup_matches_full_scan(seed):
+    rng = random.Random(seed)
+    stop_words = ['the', 'what', 'is']
+    vocabulary = [f"w{i}" for i in range(60)]
+    engine = AIEngine()
+    for input_text, output_text in training_stream(400, seed):
+        words = input_text.split()
+        if words and rng.random() < 0.7:
+            input_text = ' '.join(stop_words[:rng.randint(1, 3)] + words)
+        engine.train(input_text, output_text)
+    # Same token sets under different keys tie; the first one trained must win
+    for words in (['w1', 'w2'], ['w2', 'w1'], ['W1', 'w2'], ['w3', 'w4', 'w5'], ['w5', 'w4', 'w3']):
+        engine.train(' '.join(words), 'w1 w2 w3 w4 w5')
+
+    queries = ['', '   ', 'the', 'THE what', 'the what is', 'unknown words only',
+               'w1 w2', 'w2 W1', 'w3 w4 w5', 'w1 w2 zzz']
+    queries += [' '.join(rng.sample(vocabulary, rng.randint(1, 6)) + rng.sample(stop_words, rng.randint(0, 3)))
+                for _ in range(300)]
+    queries += [rng.choice(engine.pattern_keys) for _ in range(50)]
+
+    batch = engine.find_best_matches(queries)
+    for i, query in enumerate(queries):
+        expected = scan_best_match(engine, query)
+        assert engine._find_best_match(query) == expected, query
+        assert batch[i][:2] == expected, query
+
+        random.seed(i)
+        indexed = engine.generate_response(query)
+        random.seed(i)
+        assert indexed == engine.choose_response(*expected), query
@@ -0,0 +1,173 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import AIModel
+from utils.auth_cache import VerifiedKeyCache
+
+
+def export_status(client, model_id, headers):
+    return client.get(f'/api/models/{model_id}/export', headers=headers).status_code
+
+
+def test_generated_keys_carry_their_key_id():
+    api_key, key_id, key_hash = AIModel.generate_api_key()
+    assert AIModel.parse_api_key_id(api_key) == key_id
+    assert api_key.startswith(f'{key_id}.')
+    assert api_key not in key_hash
+
+
+@pytest.mark.parametrize('api_key', ['', 'nodot', '.secret', 'keyid.', '.'])
+def test_malformed_keys_have_no_key_id(api_key):
+    assert AIModel.parse_api_key_id(api_key) is None
+
+
+def test_key_id_finds_the_owning_model(app_module, client, make_model):
+    model_id, headers = make_model()
+    other_id, other_headers = make_model('other')
+    with app_module.app.app_context():
+        assert app_module._authenticate_api_key(headers['X-API-Key']) == model_id
+        assert app_module._authenticate_api_key(other_headers['X-API-Key']) == other_id
+    assert export_status(client, model_id, headers) == 200
+    assert export_status(client, model_id, other_headers) == 403
+
+
+@pytest.mark.parametrize('api_key', ['nodot', '.secret', 'keyid.', 'unknownid.secret'])
+def test_malformed_or_unknown_keys_are_rejected(client, make_model, api_key):
+    model_id, _ = make_model()
+    assert export_status(client, model_id, {'X-API-Key': api_key}) == 401
+
+
+def test_wrong_secret_for_a_known_key_id_is_rejected(app_module, client, make_model):
+    model_id, headers = make_model()
+    key_id = AIModel.parse_api_key_id(headers['X-API-Key'])
+    forged = {'X-API-Key': f'{key_id}.not-the-secret'}
+    assert export_status(client, model_id, forged) == 401
+    assert app_module.verified_keys.get(forged['X-API-Key']) is None
+
+
+def test_old_format_keys_are_rejected(app_module, client, make_model):
+    model_id, _ = make_model()
+    legacy_key = 'legacykeywithoutanyid'
+    with app_module.app.app_context():
+        model = app_module.db.session.get(AIModel, model_id)
+        model.api_key_id = None
+        model.api_key_hash = generate_password_hash(legacy_key)
+        app_module.db.session.commit()
+    assert export_status(client, model_id, {'X-API-Key': legacy_key}) == 401
+
+
+def test_rotated_key_stops_working_before_the_ttl(app_module, client, make_model):
+    model_id, headers = make_model()
+    assert export_status(client, model_id, headers) == 200
+    assert app_module.verified_keys.get(headers['X-API-Key']) == model_id
+
+    response = client.post(f'/api/models/{model_id}/api-key', headers=headers)
+    assert response.status_code == 200
+    new_headers = {'X-API-Key': response.get_json()['api_key']}
+    assert app_module.verified_keys.get(headers['X-API-Key']) is None
+    assert export_status(client, model_id, headers) == 401
+    assert export_status(client, model_id, new_headers) == 200
+
+
+def test_deleted_models_key_stops_working_before_the_ttl(app_module, client, make_model):
+    model_id, headers = make_model()
+    assert export_status(client, model_id, headers) == 200
+    assert app_module.verified_keys.get(headers['X-API-Key']) == model_id
+
+    assert client.delete(f'/api/models/{model_id}', headers=headers).status_code == 200
+    assert app_module.verified_keys.get(headers['X-API-Key']) is None
+    assert client.post('/api/datasets', headers=headers, json={'name': 'x'}).status_code == 401
+
+
+def test_key_rotated_by_another_worker_stops_working(app_module, client, make_model):
+    model_id, headers = make_model()
+    assert export_status(client, model_id, headers) == 200
+    assert app_module.verified_keys.get(headers['X-API-Key']) == model_id
+
+    # Another process rotates the key; this process's cache is not told
+    with app_module.app.app_context():
+        model = app_module.db.session.get(AIModel, model_id)
+        new_key = model.set_api_key()
+        app_module.db.session.commit()
+    assert app_module.verified_keys.get(headers['X-API-Key']) == model_id
+    assert export_status(client, model_id, headers) == 401
+    assert app_module.verified_keys.get(headers['X-API-Key']) is None
+    assert export_status(client, model_id, {'X-API-Key': new_key}) == 200
+
+
+def test_model_deleted_by_another_worker_stops_its_key(app_module, client, make_model):
+    model_id, headers = make_model()
+    assert export_status(client, model_id, headers) == 200
+    with app_module.app.app_context():
+        app_module.db.session.delete(app_module.db.session.get(AIModel, model_id))
+        app_module.db.session.commit()
+    assert client.post('/api/datasets', headers=headers, json={'name': 'x'}).status_code == 401
+
+
+def test_key_verified_before_rotation_is_not_cached_after_it(app_module, make_model, monkeypatch):
+    model_id, headers = make_model()
+    api_key = headers['X-API-Key']
+    verify = AIModel.verify_api_key
+
+    def verify_then_rotate(model, key):
+        # The rotation commits and invalidates while this request is verifying
+        # the row it read before the rotation
+        verified = verify(model, key)
+        app_module.verified_keys.invalidate_model(model.id)
+        return verified
+
+    monkeypatch.setattr(AIModel, 'verify_api_key', verify_then_rotate)
+    with app_module.app.app_context():
+        assert app_module._authenticate_api_key(api_key) == model_id
+    assert app_module.verified_keys.get(api_key) is None
+
+
+def test_cache_drops_puts_from_before_an_invalidation():
+    cache = VerifiedKeyCache()
+    generation = cache.generation()
+    cache.invalidate_model(1)
+    cache.put('a.key', 1, generation)
+    cache.put('b.key', 2, generation)
+    assert cache.get('a.key') is None
+    assert cache.get('b.key') == 2
+    cache.put('a.key', 1, cache.generation())
+    assert cache.get('a.key') == 1
+
+
+def test_cache_entries_expire_after_the_ttl():
+    cache = VerifiedKeyCache(ttl=0.05)
+    cache.put('a.key', 1)
+    assert cache.get('a.key') == 1
+    time.sleep(0.1)
+    assert cache.get('a.key') is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'misses': 1}
+
+
+def test_cache_evicts_least_recently_used_keys():
+    cache = VerifiedKeyCache(max_entries=2)
+    cache.put('a.key', 1)
+    cache.put('b.key', 2)
+    assert cache.get('a.key') == 1
+    cache.put('c.key', 3)
+    assert cache.get('b.key') is None
+    assert cache.get('a.key') == 1
+    assert cache.get('c.key') == 3
+
+
+def test_cache_invalidates_only_the_given_model():
+    cache = VerifiedKeyCache()
+    cache.put('a.one', 1)
+    cache.put('a.two', 1)
+    cache.put('b.key', 2)
+    cache.invalidate_model(1)
+    assert cache.get('a.one') is None
+    assert cache.get('a.two') is None
+    assert cache.get('b.key') == 2
+
+
+def test_cache_does_not_hold_raw_keys():
+    cache = VerifiedKeyCache()
+    cache.put('abc.secret-value', 1)
+    assert all(isinstance(digest, bytes) and b'secret-value' not in digest for digest in cache._entries)
@@ -0,0 +1,16 @@
+import os
+import time
+
+from utils.blob_store import BlobStore
+
+
+def test_storing_existing_content_restarts_the_gc_grace_period(tmp_path):
+    store = BlobStore(str(tmp_path))
+    sha256, _ = store.put_bytes(b'artifact')
+    old = time.time() - 7200
+    os.utime(store.path(sha256), (old, old))
+
+    assert store.put_bytes(b'artifact')[0] == sha256
+    assert store.collect_garbage(set(), grace_seconds=3600) == 0
+    assert store.exists(sha256)
+    assert os.listdir(os.path.join(str(tmp_path), 'tmp')) == []
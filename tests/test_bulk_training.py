@@ -0,0 +1,53 @@
+import json
+
+from utils.ai_engine import AIEngine
+from utils.engine_registry import EngineRegistry
+
+
+def jsonl(pairs):
+    return ''.join(json.dumps({'input': i, 'output': o}) + '\n' for i, o in pairs)
+
+
+PAIRS = [(f"hello number {i}", f"hi number {i}") for i in range(50)]
+
+
+def test_bulk_training_requires_the_models_key(client, make_model):
+    model_id, headers = make_model()
+    _, other_headers = make_model('other')
+
+    assert client.post(f'/api/models/{model_id}/train/bulk', data=jsonl(PAIRS)).status_code == 401
+    response = client.post(f'/api/models/{model_id}/train/bulk', data=jsonl(PAIRS),
+                           headers=other_headers)
+    assert response.status_code == 403
+    assert client.post('/api/train/bulk', data=jsonl(PAIRS)).status_code == 401
+
+
+def test_bulk_training_is_written_back(client, make_model, wait_for_job):
+    model_id, headers = make_model()
+    before = client.get(f'/api/models/{model_id}/export', headers=headers)
+
+    response = client.post(f'/api/models/{model_id}/train/bulk', data=jsonl(PAIRS), headers=headers)
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'complete', job.get('error')
+
+    after = client.get(f'/api/models/{model_id}/export', headers=headers)
+    assert after.headers['ETag'] != before.headers['ETag']
+    state = after.get_json()['model_info']['state']
+    assert len(state['engine']['memory']['patterns']) == len(PAIRS)
+
+
+def test_leased_engines_are_not_evicted():
+    saved = []
+    registry = EngineRegistry(lambda model_id: AIEngine(),
+                              lambda model_id, engine: saved.append(model_id), max_engines=1)
+    with registry.lease(1) as engine:
+        engine.train("a b c", "d e f")
+        assert registry.get(2) is not None
+        assert registry.get(1) is engine
+        assert saved == []
+    # Released and over budget: the least recently used engine goes, saved first
+    assert registry.stats()['engines'] == 1
+    assert registry.get(1) is engine
+    registry.get(2)
+    assert saved == [1]
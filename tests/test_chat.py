@@ -0,0 +1,62 @@
+from utils.ai_engine import AIEngine
+from utils.serving import VersionedCache
+
+
+def test_reloaded_engine_does_not_reuse_cached_replies(app_module, client, make_model):
+    model_id, headers = make_model()
+    request = {'message': 'hello there', 'model_id': model_id, 'top_k': 1}
+
+    with app_module.app.app_context():
+        engine = app_module.engine_registry.get(model_id)
+    with app_module._training_locks[model_id]:
+        engine.train('hello there', 'hello there friend')
+    first = client.post('/api/chat', headers=headers, json=request).get_json()
+    assert first['response'] == 'hello there friend'
+    assert client.post('/api/chat', headers=headers, json=request).get_json()['cached']
+
+    # Reload an engine with different content at the same memory_version
+    replacement = AIEngine()
+    replacement.train('hello there', 'hello there pal')
+    assert replacement.memory_version == engine.memory_version
+    app_module.engine_registry.discard(model_id)
+    app_module.engine_registry.load_engine, load = (lambda _: replacement), \
+        app_module.engine_registry.load_engine
+    try:
+        second = client.post('/api/chat', headers=headers, json=request).get_json()
+    finally:
+        app_module.engine_registry.load_engine = load
+    assert not second['cached']
+    assert second['response'] == 'hello there pal'
+
+
+def test_cache_drops_a_namespace_when_its_version_moves_on():
+    cache = VersionedCache()
+    cache.put('a', 'x', (1, 1), 'old')
+    cache.put('b', 'x', (2, 1), 'other')
+    assert cache.get('a', 'x', (1, 2)) is None
+    assert cache.get('b', 'x', (2, 1)) == 'other'
+    assert cache.stats()['entries'] == 1
+
+
+def test_cache_ignores_stores_at_an_older_version():
+    cache = VersionedCache()
+    cache.put('a', 'x', (1, 2), 'current')
+    # A request that matched before the last training step finishes late
+    cache.put('a', 'y', (1, 1), 'stale')
+    assert cache.get('a', 'y', (1, 1)) is None
+    assert cache.get('a', 'x', (1, 2)) == 'current'
+    assert cache.get('a', 'y', (1, 2)) is None
+    assert cache.stats()['entries'] == 1
+
+
+def test_cache_evicts_least_recently_used_entries():
+    cache = VersionedCache(max_entries=3)
+    cache.put('a', 'x', (1, 1), 1)
+    cache.put('b', 'x', (2, 1), 2)
+    cache.put('a', 'y', (1, 1), 3)
+    assert cache.get('b', 'x', (2, 1)) == 2
+    cache.put('b', 'y', (2, 1), 4)
+    assert cache.get('a', 'x', (1, 1)) is None
+    assert cache.get('a', 'y', (1, 1)) == 3
+    assert cache.get('b', 'x', (2, 1)) == 2
+    assert cache.stats()['entries'] == 3
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+ROWS = [{'input': f'question {i}', 'output': f'answer {i}', 'tags': ['a', i]} for i in range(2500)]
+
+
+def import_dataset(client, wait_for_job, headers, body):
+    response = client.post('/api/datasets', headers=headers, data=body)
+    assert response.status_code == 202, response.get_json()
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'complete', job['error']
+    return job['result']['dataset_id']
+
+
+@pytest.fixture
+def dataset_id(client, make_model, wait_for_job):
+    _, headers = make_model()
+    return import_dataset(client, wait_for_job, headers, json.dumps({'name': 'rows', 'data': ROWS}))
+
+
+def rows_page(client, dataset_id, **args):
+    query = '&'.join(f'{key}={value}' for key, value in args.items())
+    return client.get(f'/api/datasets/{dataset_id}/rows?{query}')
+
+
+def test_rows_pages_cover_the_dataset_in_order(client, dataset_id):
+    collected, offset = [], 0
+    while True:
+        page = rows_page(client, dataset_id, offset=offset, limit=1000).get_json()
+        assert page['row_count'] == len(ROWS)
+        if not page['rows']:
+            break
+        collected.extend(page['rows'])
+        offset += len(page['rows'])
+    assert collected == ROWS
+
+
+@pytest.mark.parametrize('args, offset, limit, rows', [
+    ({}, 0, 100, ROWS[:100]),
+    ({'offset': 2490, 'limit': 50}, 2490, 50, ROWS[2490:]),
+    ({'offset': 2500}, 2500, 100, []),
+    ({'offset': 10 ** 6}, 10 ** 6, 100, []),
+    ({'limit': 0}, 0, 1, ROWS[:1]),
+    ({'limit': 10 ** 6}, 0, 1000, ROWS[:1000]),
+])
+def test_rows_page_bounds(client, dataset_id, args, offset, limit, rows):
+    page = rows_page(client, dataset_id, **args).get_json()
+    assert (page['offset'], page['limit'], page['rows']) == (offset, limit, rows)
+
+
+@pytest.mark.parametrize('args', [{'offset': -1}, {'offset': 'abc'}, {'offset': '1.5'}, {'limit': 'ten'}])
+def test_invalid_rows_cursor_is_rejected(client, dataset_id, args):
+    response = rows_page(client, dataset_id, **args)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_rows_of_a_missing_dataset_are_not_found(client):
+    assert rows_page(client, 10 ** 9).status_code == 404
+    assert client.get(f'/api/datasets/{10 ** 9}/rows.ndjson').status_code == 404
+
+
+def test_empty_dataset_has_no_rows(client, make_model, wait_for_job):
+    _, headers = make_model()
+    dataset_id = import_dataset(client, wait_for_job, headers, json.dumps({'name': 'empty', 'data': []}))
+    page = rows_page(client, dataset_id).get_json()
+    assert (page['row_count'], page['rows']) == (0, [])
+    response = client.get(f'/api/datasets/{dataset_id}/rows.ndjson')
+    assert response.status_code == 200
+    assert response.data == b''
+    assert client.get(f'/api/datasets/{dataset_id}').get_json()['data'] == []
+
+
+def test_ndjson_round_trips_through_import(client, make_model, wait_for_job, dataset_id):
+    response = client.get(f'/api/datasets/{dataset_id}/rows.ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.split(b'\n')
+    assert lines.pop() == b''
+    assert [json.loads(line) for line in lines] == ROWS
+
+    _, headers = make_model('copy')
+    copy_id = import_dataset(client, wait_for_job, headers,
+                             b'{"name": "copy", "data": [' + b','.join(lines) + b']}')
+    assert client.get(f'/api/datasets/{copy_id}/rows.ndjson').data == response.data
+    assert rows_page(client, copy_id, offset=1234, limit=3).get_json()['rows'] == ROWS[1234:1237]
@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+
+from utils.ai_engine import AIEngine
+from utils.engine_registry import EngineRegistry
+
+
+class BlockingStorage:
+    """load_engine/save_engine that block on chosen models until released"""
+
+    def __init__(self):
+        self.loads = []
+        self.saves = []
+        self.blocked = {}
+
+    def block(self, model_id):
+        started, release = threading.Event(), threading.Event()
+        self.blocked[model_id] = (started, release)
+        return started, release
+
+    def _wait(self, model_id):
+        if model_id in self.blocked:
+            started, release = self.blocked[model_id]
+            started.set()
+            assert release.wait(10)
+
+    def load(self, model_id):
+        self.loads.append(model_id)
+        self._wait(model_id)
+        return AIEngine()
+
+    def save(self, model_id, engine):
+        self._wait(model_id)
+        self.saves.append(model_id)
+
+
+def run(target, *args):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(target(*args)))
+    thread.start()
+    return thread, results
+
+
+def test_slow_load_does_not_block_other_models():
+    storage = BlockingStorage()
+    registry = EngineRegistry(storage.load, storage.save)
+    started, release = storage.block(1)
+    loader, loaded = run(registry.get, 1)
+    assert started.wait(5)
+    try:
+        assert registry.get(2) is not None
+        assert registry.stats()['engines'] == 1
+    finally:
+        release.set()
+        loader.join()
+    assert registry.get(1) is loaded[0]
+
+
+def test_concurrent_lookups_share_one_load():
+    storage = BlockingStorage()
+    registry = EngineRegistry(storage.load, storage.save)
+    started, release = storage.block(1)
+    threads = [run(registry.get, 1) for _ in range(4)]
+    assert started.wait(5)
+    release.set()
+    for thread, _ in threads:
+        thread.join()
+    assert storage.loads == [1]
+    assert len({id(results[0]) for _, results in threads}) == 1
+
+
+def test_failed_load_is_not_cached():
+    attempts = []
+
+    def load(model_id):
+        attempts.append(model_id)
+        if len(attempts) == 1:
+            raise KeyError(model_id)
+        return AIEngine()
+
+    registry = EngineRegistry(load, lambda model_id, engine: None)
+    with pytest.raises(KeyError):
+        registry.get(1)
+    assert registry.get(1) is not None
+    assert attempts == [1, 1]
+
+
+def test_eviction_writes_back_outside_the_lock():
+    storage = BlockingStorage()
+    registry = EngineRegistry(storage.load, storage.save, max_engines=1)
+    engine = registry.get(1)
+    engine.train("a b c", "d e f")
+    started, release = storage.block(1)
+    evicting, _ = run(registry.get, 2)
+    assert started.wait(5)
+    try:
+        # Other lookups go on while model 1 is saved, and model 1 itself is
+        # taken back with its unsaved training instead of reloaded
+        assert registry.get(3) is not None
+        assert registry.get(1) is engine
+        assert storage.loads == [1, 2, 3]
+    finally:
+        release.set()
+        evicting.join()
+    assert storage.saves == [1]
+    assert registry.stats()['writebacks'] == 1
+
+
+def test_failed_write_back_keeps_the_engine():
+    def save(model_id, engine):
+        raise RuntimeError("storage unavailable")
+
+    registry = EngineRegistry(lambda model_id: AIEngine(), save, max_engines=1)
+    engine = registry.get(1)
+    engine.train("a b c", "d e f")
+    with pytest.raises(RuntimeError):
+        registry.get(2)
+    registry.save_engine = lambda model_id, engine: None
+    assert registry.get(1) is engine
+    registry.flush()
+    assert registry.stats()['writebacks'] == 1
+
+
+def test_write_back_does_not_commit_the_callers_session(app_module, make_model):
+    model_id, _ = make_model()
+    other_id, _ = make_model('untouched')
+    engine = AIEngine()
+    engine.train("a b c", "d e f")
+    AIModel, db = app_module.AIModel, app_module.db
+    with app_module.app.app_context():
+        db.session.get(AIModel, other_id).name = 'half-finished'
+        app_module._save_model_engine(model_id, engine)
+        db.session.rollback()
+    with app_module.app.app_context():
+        assert db.session.get(AIModel, other_id).name == 'untouched'
+        assert db.session.get(AIModel, model_id).state['engine'] == engine.to_state()
@@ -0,0 +1,109 @@
+import io
+import re
+
+import pytest
+from sqlalchemy import event
+
+from utils.stream_readers import open_stream_reader
+
+
+def test_export_revalidation_skips_heavy_columns(app_module, client, make_model):
+    model_id, headers = make_model()
+    with app_module.app.app_context():
+        model = app_module.db.session.get(app_module.AIModel, model_id)
+        model.state = {'engine': {'marker': 'x' * 1000}}
+        app_module.db.session.commit()
+
+    full = client.get(f'/api/models/{model_id}/export', headers=headers)
+    assert full.get_json()['model_info']['state']['engine']['marker'] == 'x' * 1000
+
+    statements = []
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(f'/api/models/{model_id}/export',
+                              headers={**headers, 'If-None-Match': full.headers['ETag']})
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert response.status_code == 304
+    assert not any('ai_model.state' in s or 'dataset.data' in s for s in statements)
+
+
+def test_export_requires_the_models_key(client, make_model):
+    model_id, _ = make_model()
+    _, other_headers = make_model('other')
+    assert client.get(f'/api/models/{model_id}/export', headers=other_headers).status_code == 403
+
+
+def test_artifacts_require_the_models_key(client, make_model):
+    model_id, _ = make_model()
+    _, other_headers = make_model('other')
+    response = client.get(f'/api/models/{model_id}/artifacts/weights.bin', headers=other_headers)
+    assert response.status_code == 403
+
+
+ROWS = [{'input': f'in {i}', 'output': f'out {i} \u00e9'} for i in range(2500)]
+
+
+@pytest.fixture
+def exported_model(app_module, client, make_model, wait_for_job):
+    """A model with engine state and a row-stored dataset; yields (model_id, headers)"""
+    model_id, headers = make_model()
+    response = client.post('/api/datasets', headers=headers,
+                           json={'name': 'rows', 'description': 'round trip', 'data': ROWS})
+    assert wait_for_job(response.get_json()['job_id'], headers)['status'] == 'complete'
+    with app_module.app.app_context():
+        model = app_module.db.session.get(app_module.AIModel, model_id)
+        model.state = {'engine': {'marker': [1, 2.5, 'x']}}
+        app_module.db.session.commit()
+    return model_id, headers
+
+
+@pytest.mark.parametrize('export_format, compression', [
+    ('json', 'none'), ('json', 'gzip'), ('json', 'zstd'),
+    ('msgpack', 'none'), ('msgpack', 'gzip'), ('msgpack', 'zstd'),
+])
+def test_export_round_trips_through_import(app_module, client, exported_model, export_format, compression):
+    if export_format == 'msgpack':
+        pytest.importorskip('msgpack')
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    model_id, headers = exported_model
+    response = client.get(f'/api/models/{model_id}/export?format={export_format}&compression={compression}',
+                          headers=headers)
+    assert response.status_code == 200
+    body = response.data
+    response.close()
+    filename = re.search(r'filename="([^"]+)"', response.headers['Content-Disposition']).group(1)
+
+    AIModel = app_module.AIModel
+    with app_module.app.app_context():
+        try:
+            imported = AIModel.import_stream(open_stream_reader(io.BytesIO(body), filename))
+            assert (imported.name, imported.version) == ('test-model', '1.0')
+            assert imported.state['engine'] == {'marker': [1, 2.5, 'x']}
+            [dataset] = imported.datasets
+            assert (dataset.name, dataset.description, dataset.row_count) == ('rows', 'round trip', len(ROWS))
+            assert list(dataset.iter_rows()) == ROWS
+        finally:
+            app_module.db.session.rollback()
+
+
+def test_full_export_does_not_load_columns_one_by_one(app_module, client, exported_model):
+    model_id, headers = exported_model
+    statements = []
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(f'/api/models/{model_id}/export', headers=headers)
+        assert len(response.get_json()['model_info']['datasets'][0]['data']) == len(ROWS)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    # Besides the API key lookup: the model, its datasets, then the row batches
+    statements = [s for s in statements if 'api_key_id' not in s]
+    row_batches = sum('FROM dataset_row' in s for s in statements)
+    assert len(statements) - row_batches <= 2
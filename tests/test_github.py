@@ -0,0 +1,187 @@
+import hashlib
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from utils.fake_github import FakeRepository, create_fake_github
+from utils.github_sync import git_blob_sha
+
+REPO_URL = 'https://github.com/owner/model'
+
+
+@pytest.fixture
+def fake_github(monkeypatch):
+    """A fake GitHub serving owner/model, with one commit holding a README"""
+    repo = FakeRepository('owner/model')
+    repo.commit_files({'README.md': b'# model\n'})
+    fake = create_fake_github({'owner/model': repo})
+    server = make_server('127.0.0.1', 0, fake, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('GITHUB_API_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setenv('GITHUB_TOKEN', 'test-token')
+    repo.request_counts = lambda: fake.test_client().get('/_requests').get_json()
+    yield repo
+    server.shutdown()
+    thread.join()
+
+
+def set_artifacts(app_module, model_id, files):
+    with app_module.app.app_context():
+        model = app_module.db.session.get(app_module.AIModel, model_id)
+        for path, content in files.items():
+            sha256, size = app_module.blob_store.put_bytes(content)
+            model.add_artifact(path, {'sha256': sha256, 'size': size})
+        app_module.db.session.commit()
+
+
+def export(client, wait_for_job, model_id, headers, message):
+    response = client.post('/api/models/github/export', headers=headers, json={
+        'model_id': model_id, 'repo_url': REPO_URL, 'commit_message': message
+    })
+    assert response.status_code == 202, response.get_json()
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'complete', job['error']
+    return job['result']
+
+
+def test_export_creates_one_commit(app_module, client, make_model, wait_for_job, fake_github):
+    model_id, headers = make_model()
+    files = {'weights.pt': b'\x00weights' * 100, 'config/model.json': b'{"layers": 2}'}
+    set_artifacts(app_module, model_id, files)
+    initial = fake_github.refs['heads/main']
+
+    result = export(client, wait_for_job, model_id, headers, 'First export')
+    assert result['changed_files'] == sorted(files)
+    head = fake_github.refs['heads/main']
+    assert result['commit_sha'] == head
+    commit = fake_github.commits[head]
+    assert commit['message'] == 'First export'
+    assert commit['parents'] == [{'sha': initial}]
+
+    tree = fake_github.flatten(commit['tree']['sha'])
+    assert set(tree) == {'README.md', *files}
+    for path, content in files.items():
+        assert tree[path] == git_blob_sha(content)
+        assert fake_github.blobs[tree[path]] == content
+
+
+def test_reexport_uploads_only_changed_blobs(app_module, client, make_model, wait_for_job, fake_github):
+    model_id, headers = make_model()
+    set_artifacts(app_module, model_id, {'a.pt': b'first', 'b.pt': b'second', 'c.json': b'{}'})
+    export(client, wait_for_job, model_id, headers, 'First export')
+    uploads = fake_github.request_counts()['POST /repos/<owner>/<name>/git/blobs']
+    assert uploads == 3
+
+    unchanged = export(client, wait_for_job, model_id, headers, 'Nothing new')
+    assert unchanged == {'message': 'No changes to export',
+                         'commit_sha': fake_github.refs['heads/main'], 'changed_files': []}
+
+    set_artifacts(app_module, model_id, {'b.pt': b'second, retrained'})
+    previous = fake_github.refs['heads/main']
+    result = export(client, wait_for_job, model_id, headers, 'Retrained b')
+    assert result['changed_files'] == ['b.pt']
+    counts = fake_github.request_counts()
+    assert counts['POST /repos/<owner>/<name>/git/blobs'] == uploads + 1
+    assert counts['POST /repos/<owner>/<name>/git/commits'] == 2
+    commit = fake_github.commits[fake_github.refs['heads/main']]
+    assert commit['parents'] == [{'sha': previous}]
+    tree = fake_github.flatten(commit['tree']['sha'])
+    assert fake_github.blobs[tree['b.pt']] == b'second, retrained'
+    assert fake_github.blobs[tree['a.pt']] == b'first'
+
+
+def test_export_requires_the_models_key(client, make_model, fake_github):
+    model_id, _ = make_model()
+    _, other_headers = make_model('other')
+    response = client.post('/api/models/github/export', headers=other_headers,
+                           json={'model_id': model_id, 'repo_url': REPO_URL})
+    assert response.status_code == 403
+
+
+MODEL_FILES = {
+    'weights.pt': b'\x01' * 4096,
+    'checkpoints/step-100.ckpt': b'\x02' * 2048,
+    'config.json': b'{"hidden": 64}',
+    'notes/readme.txt': b'not a model file',
+}
+
+
+def start_import(client, headers):
+    response = client.post('/api/models/github/import', headers=headers, json={'repo_url': REPO_URL})
+    assert response.status_code == 202, response.get_json()
+    return response.get_json()
+
+
+def test_import_downloads_model_files(client, make_model, wait_for_job, fake_github):
+    fake_github.commit_files(MODEL_FILES, 'Add model')
+    _, headers = make_model()
+    created = start_import(client, headers)
+    job = wait_for_job(created['job_id'], headers)
+    assert job['status'] == 'complete', job['error']
+    model_files = sorted(path for path in MODEL_FILES if not path.endswith('.txt'))
+    assert job['result'] == {'model_id': created['model_id'], 'files': len(model_files)}
+
+    model_headers = {'X-API-Key': created['api_key']}
+    progress = client.get(f"/api/models/github/import/{created['import_id']}", headers=model_headers).get_json()
+    assert progress['status'] == 'complete'
+    assert progress['commit_sha'] == fake_github.refs['heads/main']
+    assert progress['completed_files'] == progress['total_files'] == len(model_files)
+    assert progress['completed_bytes'] == sum(len(MODEL_FILES[path]) for path in model_files)
+
+    model_id = created['model_id']
+    info = client.get(f'/api/models/{model_id}/export', headers=model_headers).get_json()['model_info']
+    assert sorted(info['configuration']['files']) == model_files
+    assert sorted(info['state']['artifacts']) == model_files
+    for path in model_files:
+        response = client.get(f'/api/models/{model_id}/artifacts/{path}', headers=model_headers)
+        assert response.status_code == 200
+        assert response.data == MODEL_FILES[path]
+
+
+def test_interrupted_import_resumes(client, make_model, wait_for_job, fake_github):
+    pinned = fake_github.commit_files(MODEL_FILES, 'Add model')
+    missing = fake_github.flatten(fake_github.commits[pinned]['tree']['sha'])['weights.pt']
+    weights = fake_github.blobs.pop(missing)
+    _, headers = make_model()
+    created = start_import(client, headers)
+    model_headers = {'X-API-Key': created['api_key']}
+    assert wait_for_job(created['job_id'], headers)['status'] == 'failed'
+
+    progress = client.get(f"/api/models/github/import/{created['import_id']}", headers=model_headers).get_json()
+    assert progress['status'] == 'failed'
+    assert progress['commit_sha'] == pinned
+    assert progress['completed_files'] < progress['total_files'] == 3
+    downloads = fake_github.request_counts()['GET /repos/<owner>/<name>/git/blobs/<sha>']
+
+    # The branch moves on, but the resumed import finishes the pinned tree,
+    # fetching only the files the first run did not record
+    fake_github.blobs[missing] = weights
+    fake_github.commit_files({**MODEL_FILES, 'extra.pt': b'later'}, 'Later commit')
+    response = client.post(f"/api/models/github/import/{created['import_id']}/resume", headers=model_headers)
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()['job_id'], model_headers)
+    assert job['status'] == 'complete', job['error']
+
+    resumed = fake_github.request_counts()['GET /repos/<owner>/<name>/git/blobs/<sha>'] - downloads
+    assert resumed == 3 - progress['completed_files']
+    model_id = created['model_id']
+    info = client.get(f'/api/models/{model_id}/export', headers=model_headers).get_json()['model_info']
+    assert sorted(info['state']['artifacts']) == ['checkpoints/step-100.ckpt', 'config.json', 'weights.pt']
+    response = client.get(f'/api/models/{model_id}/artifacts/weights.pt', headers=model_headers)
+    assert response.data == weights
+
+
+def test_import_rejects_blobs_that_do_not_match_their_sha(app_module, client, make_model,
+                                                         wait_for_job, fake_github):
+    pinned = fake_github.commit_files(MODEL_FILES, 'Add model')
+    sha = fake_github.flatten(fake_github.commits[pinned]['tree']['sha'])['weights.pt']
+    tampered = b'\x03' * 4096
+    fake_github.blobs[sha] = tampered
+    _, headers = make_model()
+    created = start_import(client, headers)
+    job = wait_for_job(created['job_id'], headers)
+    assert job['status'] == 'failed'
+    assert sha in job['error']
+    assert not app_module.blob_store.exists(hashlib.sha256(tampered).hexdigest())
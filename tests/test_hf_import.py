@@ -0,0 +1,103 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.hf_datasets import TTLCache
+
+PAIRS = [(f"what is item {i} made of", f"item {i} is made of part {i}") for i in range(40)]
+
+
+def test_trained_import_is_written_back(client, app_module, make_model, wait_for_job,
+                                        tmp_path, monkeypatch):
+    (tmp_path / 'qa').mkdir()
+    (tmp_path / 'qa' / 'train.jsonl').write_text(
+        ''.join(json.dumps({'question': i, 'answer': o}) + '\n' for i, o in PAIRS))
+    monkeypatch.setattr(app_module.hf_source, 'local_root', str(tmp_path))
+    model_id, headers = make_model()
+
+    response = client.post('/api/datasets/huggingface/import', headers=headers,
+                           json={'dataset_id': 'qa', 'train': True})
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()['job_id'], headers, timeout=60)
+    assert job['status'] == 'complete', job.get('error')
+    assert job['result']['rows'] == job['result']['trained'] == len(PAIRS)
+
+    # Evict the cached engine without saving; the export must already hold the training
+    app_module.engine_registry.discard(model_id)
+    state = client.get(f'/api/models/{model_id}/export', headers=headers).get_json()['model_info']['state']
+    assert len(state['engine']['memory']['patterns']) == len(PAIRS)
+
+
+@pytest.fixture
+def local_root(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.hf_source, 'local_root', str(tmp_path))
+    monkeypatch.setattr(app_module, 'hf_search_cache', TTLCache(ttl=300))
+    monkeypatch.setattr(app_module, 'hf_preview_cache', TTLCache(ttl=300))
+    return tmp_path
+
+
+def write_local_dataset(root, name, pairs):
+    (root / name).mkdir(exist_ok=True)
+    (root / name / 'train.jsonl').write_text(
+        ''.join(json.dumps({'question': i, 'answer': o}) + '\n' for i, o in pairs))
+
+
+def test_preview_is_capped_at_the_configured_rows(app_module, client, local_root, monkeypatch):
+    write_local_dataset(local_root, 'qa', PAIRS)
+    monkeypatch.setattr(app_module, 'HF_PREVIEW_MAX_ROWS', 7)
+    preview = client.get('/api/datasets/huggingface/preview/qa?rows=1000').get_json()
+    assert [sample['question'] for sample in preview['samples']] == [i for i, _ in PAIRS[:7]]
+    assert preview['columns'] == {'input': 'question', 'output': 'answer'}
+    assert len(client.get('/api/datasets/huggingface/preview/qa?rows=3').get_json()['samples']) == 3
+
+
+def test_preview_is_cached_until_the_local_dataset_is_rewritten(app_module, client, local_root):
+    write_local_dataset(local_root, 'qa', PAIRS)
+    path = '/api/datasets/huggingface/preview/qa?rows=2'
+    first = client.get(path).get_json()
+    assert client.get(path).get_json() == first
+    assert app_module.hf_preview_cache.stats()['hits'] == 1
+
+    write_local_dataset(local_root, 'qa', [('rewritten question', 'rewritten answer')] + PAIRS)
+    assert client.get(path).get_json()['samples'][0]['question'] == 'rewritten question'
+
+
+class FakeHub:
+    def __init__(self):
+        self.searches = 0
+
+    def list_datasets(self, search=None, limit=None, **kwargs):
+        self.searches += 1
+        return [SimpleNamespace(id=f'hub/{search}-{i}', description='', downloads=i, likes=0)
+                for i in range(2)]
+
+
+def test_repeated_search_is_served_from_the_cache(app_module, client, local_root, monkeypatch):
+    hub = FakeHub()
+    monkeypatch.setattr(app_module, 'hf_hub_offline', False)
+    monkeypatch.setattr(app_module.hf_api, 'get', lambda: hub)
+    write_local_dataset(local_root, 'qa-one', PAIRS)
+
+    first = client.get('/api/datasets/huggingface/search?query=qa').get_json()['datasets']
+    assert [d['id'] for d in first] == ['qa-one', 'hub/qa-0', 'hub/qa-1']
+    assert client.get('/api/datasets/huggingface/search?query=QA').get_json()['datasets'] == first
+    assert hub.searches == 1
+
+    # A dataset written since shows up without waiting for the TTL
+    write_local_dataset(local_root, 'qa-two', PAIRS)
+    second = client.get('/api/datasets/huggingface/search?query=qa').get_json()['datasets']
+    assert [d['id'] for d in second] == ['qa-one', 'qa-two', 'hub/qa-0', 'hub/qa-1']
+    assert hub.searches == 1
+
+
+def test_search_cache_entries_expire(app_module, client, local_root, monkeypatch):
+    hub = FakeHub()
+    monkeypatch.setattr(app_module, 'hf_hub_offline', False)
+    monkeypatch.setattr(app_module.hf_api, 'get', lambda: hub)
+    monkeypatch.setattr(app_module, 'hf_search_cache', TTLCache(ttl=0.05))
+    client.get('/api/datasets/huggingface/search?query=qa')
+    time.sleep(0.1)
+    client.get('/api/datasets/huggingface/search?query=qa')
+    assert hub.searches == 2
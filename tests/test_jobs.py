@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+ROWS = [{'input': f'question {i}', 'output': f'answer {i}'} for i in range(2500)]
+
+
+def job_events(socket_client):
+    return [args[0] for event in socket_client.get_received()
+            if event['name'] == 'job_status' for args in [event['args']]]
+
+
+def test_job_events_only_reach_the_owning_model(app_module, client, make_model, wait_for_job):
+    model_id, headers = make_model()
+    _, other_headers = make_model('other')
+    owner = app_module.socketio.test_client(app_module.app, flask_test_client=client)
+    other = app_module.socketio.test_client(app_module.app, flask_test_client=client)
+    anonymous = app_module.socketio.test_client(app_module.app, flask_test_client=client)
+    owner.emit('subscribe_jobs', {'api_key': headers['X-API-Key']})
+    other.emit('subscribe_jobs', {'api_key': other_headers['X-API-Key']})
+    anonymous.emit('subscribe_jobs', {'api_key': 'not.a-key'})
+    assert [e['name'] for e in anonymous.get_received()] == ['job_error']
+
+    body = ''.join(json.dumps(row) + '\n' for row in ROWS[:50])
+    response = client.post(f'/api/models/{model_id}/train/bulk', data=body, headers=headers)
+    job_id = response.get_json()['job_id']
+    assert wait_for_job(job_id, headers)['status'] == 'complete'
+
+    events = job_events(owner)
+    assert events and {e['job_id'] for e in events} == {job_id}
+    assert events[-1]['status'] == 'complete'
+    assert job_events(other) == []
+    assert job_events(anonymous) == []
+    for socket_client in (owner, other, anonymous):
+        socket_client.disconnect()
+
+
+def test_dataset_create_runs_as_a_job(client, make_model, wait_for_job):
+    model_id, headers = make_model()
+    assert client.post('/api/datasets', json={'name': 'rows', 'data': ROWS}).status_code == 401
+
+    response = client.post('/api/datasets', json={'name': 'rows', 'data': ROWS}, headers=headers)
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'complete', job.get('error')
+    assert job['result']['rows'] == len(ROWS)
+
+    dataset_id = job['result']['dataset_id']
+    dataset = client.get(f'/api/datasets/{dataset_id}').get_json()
+    assert (dataset['name'], dataset['version'], dataset['row_count']) == ('rows', '1.0', len(ROWS))
+    assert dataset['data'] == ROWS
+    datasets = client.get(f'/api/models/{model_id}/export', headers=headers).get_json()['model_info']['datasets']
+    assert [d['id'] for d in datasets] == [dataset_id]
+
+
+def test_dataset_create_reports_invalid_documents(client, make_model, wait_for_job):
+    _, headers = make_model()
+    response = client.post('/api/datasets', data='{"name": "broken", "data": [', headers=headers)
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'failed'
+    response = client.post('/api/datasets', json={'name': 'no data'}, headers=headers)
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['status'] == 'failed'
+
+
+def test_clients_cannot_choose_job_priority(app_module, client, make_model, wait_for_job):
+    _, headers = make_model()
+    response = client.post('/api/datasets?priority=100', json={'name': 'rows', 'data': ROWS[:3]},
+                           headers=headers)
+    job = wait_for_job(response.get_json()['job_id'], headers)
+    assert job['priority'] == app_module.JOB_PRIORITY_INTERACTIVE
+
+
+def test_importing_app_starts_no_services():
+    code = ("import threading, app; "
+            "assert app.ai_engine is None and app.engine_store is None; "
+            "assert not [t for t in threading.enumerate() if t.name.startswith('job-worker')]")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=120,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+
+
+def wait_until(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def busy_workers(app_module):
+    """Occupy every job worker; yields a function freeing one of them"""
+    scheduler = app_module.job_scheduler
+    releases = []
+
+    def block(ctx):
+        release = threading.Event()
+        releases.append(release)
+        release.wait(30)
+
+    scheduler.register('test_block', block)
+    with app_module.app.app_context():
+        for _ in range(scheduler.workers):
+            scheduler.submit('test_block', {})
+    wait_until(lambda: len(releases) == scheduler.workers)
+    yield lambda: releases.pop(0).set()
+    for release in releases:
+        release.set()
+    wait_until(lambda: scheduler.stats()['running'] == 0)
+
+
+def spool_path(app_module, job_id):
+    with app_module.app.app_context():
+        return app_module.db.session.get(app_module.Job, job_id).params['path']
+
+
+def test_cancelled_queued_job_removes_its_upload(app_module, client, make_model, busy_workers):
+    model_id, headers = make_model()
+    body = ''.join(json.dumps(row) + '\n' for row in ROWS[:50])
+    job_id = client.post(f'/api/models/{model_id}/train/bulk', data=body, headers=headers).get_json()['job_id']
+    path = spool_path(app_module, job_id)
+    assert os.path.exists(path)
+
+    response = client.post(f'/api/jobs/{job_id}/cancel', headers=headers)
+    assert response.get_json()['status'] == 'cancelled'
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('body, status', [
+    (json.dumps({'name': 'rows', 'data': ROWS[:10]}), 'complete'),
+    ('{"name": "broken", "data": [', 'failed'),
+])
+def test_finished_job_removes_its_upload(app_module, client, make_model, wait_for_job, body, status):
+    _, headers = make_model()
+    job_id = client.post('/api/datasets', data=body, headers=headers).get_json()['job_id']
+    path = spool_path(app_module, job_id)
+    assert wait_for_job(job_id, headers)['status'] == status
+    assert not os.path.exists(path)
+
+
+def test_queued_jobs_run_highest_priority_first(app_module, busy_workers):
+    scheduler = app_module.job_scheduler
+    ran = []
+    scheduler.register('test_low', lambda ctx: ran.append('low'), priority=-10)
+    scheduler.register('test_high', lambda ctx: ran.append('high'), priority=50)
+    with app_module.app.app_context():
+        scheduler.submit('test_low', {})
+        scheduler.submit('test_high', {})
+    busy_workers()
+    wait_until(lambda: len(ran) == 2)
+    assert ran == ['high', 'low']
+
+
+def test_job_kinds_have_distinct_priorities(app_module):
+    priorities = {kind: handler['priority'] for kind, handler in app_module.job_scheduler._handlers.items()}
+    assert priorities['dataset_import'] > priorities['train_bulk'] == priorities['model_import']
+    assert priorities['train_bulk'] > priorities['github_import'] == priorities['hf_dataset_import']
@@ -0,0 +1,22 @@
+def test_models_etag_covers_embedded_datasets(app_module, client, make_model):
+    model_id, _ = make_model()
+    with app_module.app.app_context():
+        dataset = app_module.Dataset(name='before', version='1.0', model_id=model_id,
+                                     row_count=0, byte_size=0)
+        app_module.db.session.add(dataset)
+        app_module.db.session.commit()
+        dataset_id = dataset.id
+
+    path = f'/api/models?cursor={model_id - 1}&limit=1&fields=datasets'
+    first = client.get(path)
+    assert first.get_json()['models'][0]['datasets'][0]['name'] == 'before'
+    etag = first.headers['ETag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    with app_module.app.app_context():
+        app_module.db.session.get(app_module.Dataset, dataset_id).name = 'after'
+        app_module.db.session.commit()
+
+    second = client.get(path, headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.get_json()['models'][0]['datasets'][0]['name'] == 'after'
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from utils.lsh_index import MinHashLSH, choose_bands
+
+
+@pytest.mark.parametrize('num_perm, threshold, max_recall_loss',
+                         [(128, 0.6, 0.05), (128, 0.8, 0.01), (64, 0.5, 0.1), (16, 1.0, 0.05)])
+def test_choose_bands_meets_the_recall_floor_with_the_most_rows(num_perm, threshold, max_recall_loss):
+    bands, rows = choose_bands(num_perm, threshold, max_recall_loss)
+    assert bands == num_perm // rows
+    assert 1 - (1 - threshold ** rows) ** bands >= 1 - max_recall_loss
+    if rows < num_perm:
+        wider = num_perm // (rows + 1)
+        assert 1 - (1 - threshold ** (rows + 1)) ** wider < 1 - max_recall_loss
+
+
+def test_choose_bands_defaults():
+    assert choose_bands(128, 0.6, 0.05) == (32, 4)
+    lsh = MinHashLSH()
+    assert (lsh.bands, lsh.rows) == (32, 4)
+    assert choose_bands(16, 1.0, 0.05) == (1, 16)
+
+
+def word_sets(rng, count, size=8, vocabulary=5000):
+    return [set(f"w{rng.randrange(vocabulary)}" for _ in range(size)) for _ in range(count)]
+
+
+def test_exact_duplicates_are_always_found():
+    rng = random.Random(0)
+    sets = word_sets(rng, 300, size=rng.randint(1, 12))
+    bulk, incremental = MinHashLSH(), MinHashLSH()
+    bulk.add_many(list(range(len(sets))), sets)
+    for item_id, tokens in enumerate(sets):
+        incremental.add(item_id, tokens)
+    for item_id, tokens in enumerate(sets):
+        assert item_id in bulk.query(set(tokens))
+        assert item_id in incremental.query(set(tokens))
+    assert bulk.query(set()) == set()
+
+
+def test_bulk_and_single_signatures_agree():
+    rng = random.Random(1)
+    sets = word_sets(rng, 50) + [set()]
+    lsh = MinHashLSH()
+    batch = lsh.signatures(sets)
+    for row, tokens in zip(batch, sets):
+        assert (row == lsh.signature(tokens)).all()
+
+
+@pytest.mark.parametrize('threshold, max_recall_loss', [(0.6, 0.05), (0.5, 0.1)])
+def test_recall_at_the_threshold_meets_the_floor(threshold, max_recall_loss):
+    rng = random.Random(2)
+    corpus = word_sets(rng, 2000, size=10)
+    lsh = MinHashLSH(threshold=threshold, max_recall_loss=max_recall_loss)
+    lsh.add_many(list(range(len(corpus))), corpus)
+
+    found = 0
+    queries = 500
+    for i in range(queries):
+        item_id = rng.randrange(len(corpus))
+        words = sorted(corpus[item_id])
+        # Swap words out until the Jaccard similarity is just at the threshold
+        kept = len(words)
+        while kept > 1 and (kept - 1) / (2 * len(words) - kept + 1) >= threshold:
+            kept -= 1
+        query = set(rng.sample(words, kept)) | {f"q{i}.{j}" for j in range(len(words) - kept)}
+        assert len(query & corpus[item_id]) / len(query | corpus[item_id]) >= threshold
+        found += item_id in lsh.query(query)
+    assert found / queries >= 1 - max_recall_loss
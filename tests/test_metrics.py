@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from utils.metrics import MetricsRegistry
+
+EXPORT_ROUTE = '/api/models/<int:model_id>/export'
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def sample(metrics_text, name, **labels):
+    """Value of one sample in the scraped text, or 0 if it is not there"""
+    wanted = {f'{key}="{value}"' for key, value in labels.items()}
+    for line in metrics_text.splitlines():
+        if line.startswith('#'):
+            continue
+        series, _, value = line.rpartition(' ')
+        sample_name, _, label_text = series.partition('{')
+        if sample_name == name and wanted <= set(label_text.rstrip('}').split(',')):
+            return float(value)
+    return 0
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', 'Test', ['kind'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, kind='a')
+    histogram.observe_many([0.5, 2.0], kind='a')
+    rendered = registry.render()
+    assert 'test_seconds_bucket{kind="a",le="0.1"} 1' in rendered
+    assert 'test_seconds_bucket{kind="a",le="1"} 2' in rendered
+    assert 'test_seconds_bucket{kind="a",le="+Inf"} 3' in rendered
+    assert 'test_seconds_count{kind="a"} 3' in rendered
+
+
+def test_request_is_recorded(client, make_model):
+    before = scrape(client)
+    model_id, headers = make_model()
+    after = scrape(client)
+    labels = {'method': 'POST', 'route': '/api/models', 'status': '200'}
+    assert (sample(after, 'http_request_duration_seconds_count', **labels)
+            == sample(before, 'http_request_duration_seconds_count', **labels) + 1)
+    assert (sample(after, 'http_request_db_queries_count', route='/api/models')
+            == sample(before, 'http_request_db_queries_count', route='/api/models') + 1)
+    assert sample(after, 'http_request_db_queries_sum', route='/api/models') > \
+        sample(before, 'http_request_db_queries_sum', route='/api/models')
+
+
+def test_failing_query_does_not_leak_its_timer(app_module, client):
+    before = scrape(client)
+    with app_module.app.app_context():
+        with app_module.db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            assert conn.info.get('_metrics_start') == []
+            conn.rollback()
+            assert conn.execute(text('SELECT 1')).scalar() == 1
+            assert conn.info.get('_metrics_start') == []
+    after = scrape(client)
+    assert sample(after, 'db_query_errors_total') == sample(before, 'db_query_errors_total') + 1
+    assert (sample(after, 'db_query_duration_seconds_count')
+            >= sample(before, 'db_query_duration_seconds_count') + 2)
+
+
+def test_streamed_export_is_recorded_when_closed(app_module, client, make_model):
+    model_id, headers = make_model()
+    labels = {'method': 'GET', 'route': EXPORT_ROUTE, 'status': '200'}
+    before = scrape(client)
+
+    response = client.get(f'/api/models/{model_id}/export', headers=headers, buffered=False)
+    assert response.is_streamed
+    # Rendered directly: a scrape would itself be a request on this thread
+    assert sample(app_module.metrics.render(), 'http_request_duration_seconds_count', **labels) == \
+        sample(before, 'http_request_duration_seconds_count', **labels)
+
+    assert response.get_json()['model_info']['id'] == model_id
+    response.close()
+    after = scrape(client)
+    assert (sample(after, 'http_request_duration_seconds_count', **labels)
+            == sample(before, 'http_request_duration_seconds_count', **labels) + 1)
+    # Lazy loads run while the body streams still count for the request
+    assert sample(after, 'http_request_db_queries_sum', route=EXPORT_ROUTE) > \
+        sample(before, 'http_request_db_queries_sum', route=EXPORT_ROUTE)
@@ -0,0 +1,103 @@
+import io
+import json
+import threading
+
+import pytest
+
+
+def model_document(rows):
+    return {
+        'metadata': {'format_version': '1.0'},
+        'model_info': {
+            'name': 'imported', 'version': '1.0', 'configuration': {}, 'state': {},
+            'datasets': [{'name': 'rows', 'version': '1.0', 'description': '',
+                          'data': [{'input': f'in {i}', 'output': f'out {i}'} for i in range(rows)]}]
+        }
+    }
+
+
+@pytest.mark.parametrize('rows', [3, 2500])
+def test_import_job_completes(client, make_model, wait_for_job, rows):
+    _, headers = make_model()
+    body = json.dumps(model_document(rows)).encode()
+    response = client.post('/api/models/import', headers=headers, data={
+        'model_file': (io.BytesIO(body), 'model.json')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+    created = response.get_json()
+
+    job = wait_for_job(created['job_id'], headers)
+    assert job['status'] == 'complete', job['error']
+    assert job['result']['rows'] == rows
+
+    model_id = job['result']['model_id']
+    exported = client.get(f'/api/models/{model_id}/export',
+                          headers={'X-API-Key': created['api_key']}).get_json()
+    assert len(exported['model_info']['datasets'][0]['data']) == rows
+
+
+def import_document(client, headers, wait_for_job, document):
+    response = client.post('/api/models/import', headers=headers, data={
+        'model_file': (io.BytesIO(json.dumps(document).encode()), 'model.json')
+    }, content_type='multipart/form-data')
+    created = response.get_json()
+    job = wait_for_job(created['job_id'], headers)
+    assert job['status'] == 'complete', job['error']
+    return job['result']['model_id'], {'X-API-Key': created['api_key']}
+
+
+def test_import_keeps_only_artifacts_the_importer_owns(app_module, client, make_model, wait_for_job):
+    owner_id, owner_headers = make_model()
+    _, other_headers = make_model('other')
+    with app_module.app.app_context():
+        sha256, size = app_module.blob_store.put_bytes(b'owned weights')
+        owner = app_module.db.session.get(app_module.AIModel, owner_id)
+        owner.add_artifact('weights.pt', {'sha256': sha256, 'size': size})
+        app_module.db.session.commit()
+    document = client.get(f'/api/models/{owner_id}/export', headers=owner_headers).get_json()
+    document['model_info']['state']['artifacts']['ghost.pt'] = {'sha256': 'f' * 64, 'size': 1}
+
+    # Re-importing its own export keeps the owner's blob, not the unknown one
+    copy_id, copy_headers = import_document(client, owner_headers, wait_for_job, document)
+    response = client.get(f'/api/models/{copy_id}/artifacts/weights.pt', headers=copy_headers)
+    assert response.status_code == 200 and response.data == b'owned weights'
+    copy = client.get(f'/api/models/{copy_id}/export', headers=copy_headers).get_json()
+    assert copy['model_info']['state']['artifacts'] == {'weights.pt': {'sha256': sha256, 'size': size}}
+
+    # Another model's key cannot claim the blob by naming its hash
+    stolen_id, stolen_headers = import_document(client, other_headers, wait_for_job, document)
+    stolen = client.get(f'/api/models/{stolen_id}/export', headers=stolen_headers).get_json()
+    assert stolen['model_info']['state']['artifacts'] == {}
+    assert client.get(f'/api/models/{stolen_id}/artifacts/weights.pt',
+                      headers=stolen_headers).status_code == 404
+
+    with app_module.app.app_context():
+        assert app_module.db.session.get(app_module.Blob, sha256).ref_count == 2
+        assert app_module.db.session.get(app_module.Blob, 'f' * 64) is None
+
+
+def test_concurrent_first_references_to_a_blob_are_all_counted(app_module):
+    sha256 = 'e' * 64
+    start = threading.Barrier(4)
+    errors = []
+
+    def acquire():
+        with app_module.app.app_context():
+            try:
+                start.wait(5)
+                app_module.Blob.acquire(sha256, 10)
+                app_module.db.session.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with app_module.app.app_context():
+        assert app_module.db.session.get(app_module.Blob, sha256).ref_count == 4
+        app_module.Blob.release(sha256)
+        app_module.db.session.commit()
+        assert app_module.db.session.get(app_module.Blob, sha256).ref_count == 3
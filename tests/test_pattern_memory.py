@@ -0,0 +1,86 @@
+import json
+
+from utils.ai_engine import AIEngine
+from utils.pattern_memory import PatternMemory
+
+
+def filled_memory():
+    memory = PatternMemory()
+    memory.add('hello there', 'hi', 0.4)
+    memory.add('how are you', 'fine', 0.7)
+    memory.add('hello there', 'hey', 0.2)
+    memory.add('hello there', 'hi', 0.9)
+    memory.add_pattern('no answer yet', 0.1)
+    return memory
+
+
+def test_appending_to_a_pattern_keeps_its_id_and_repeats():
+    memory = PatternMemory()
+    first_id, created = memory.add('hello there', 'hi', 0.4)
+    assert created
+    assert memory.add('hello there', 'hey', 0.2) == (first_id, False)
+    assert memory.add('hello there', 'hi', 0.3) == (first_id, False)
+    assert memory.responses(first_id) == ['hi', 'hey', 'hi']
+    assert memory.strings == ['hi', 'hey']
+    # Confidence only ever rises
+    assert memory.confidence('hello there') == 0.4
+    assert memory.add('hello there', 'hello', 0.8)[0] == first_id
+    assert memory.confidence('hello there') == 0.8
+    assert len(memory) == 1
+    assert memory.entry_count == 4
+
+
+def test_dicts_round_trip():
+    memory = filled_memory()
+    patterns, confidences = memory.to_dicts()
+    assert patterns == {'hello there': ['hi', 'hey', 'hi'], 'how are you': ['fine'], 'no answer yet': []}
+    assert confidences == {'hello there': 0.9, 'how are you': 0.7, 'no answer yet': 0.1}
+
+    restored = PatternMemory.from_dicts(*json.loads(json.dumps([patterns, confidences])))
+    assert restored.to_dicts() == (patterns, confidences)
+    assert restored.keys == memory.keys
+    assert restored.ids == memory.ids
+    assert list(restored.confidences) == list(memory.confidences)
+    assert restored.entry_count == memory.entry_count
+
+
+def test_snapshot_is_not_affected_by_later_training():
+    memory = filled_memory()
+    snapshot = memory.snapshot()
+    expected = memory.to_dicts()
+    memory.add('hello there', 'later', 1.0)
+    memory.add('new pattern', 'later', 0.5)
+    assert snapshot.to_dicts() == expected
+
+
+def test_confidences_stay_aligned_with_pattern_keys():
+    memory = PatternMemory()
+    for i in range(50):
+        key = f'pattern {i % 17}'
+        memory.add(key, f'response {i}', (i * 7 % 10) / 10)
+    assert len(memory.confidences) == len(memory.keys) == len(memory.first_response) == 17
+    _, confidences = memory.to_dicts()
+    for pattern_id, key in enumerate(memory.keys):
+        assert memory.ids[key] == pattern_id
+        assert memory.confidences[pattern_id] == memory.confidence(key) == confidences[key]
+
+
+def test_engine_state_round_trip_keeps_confidences_aligned():
+    engine = AIEngine()
+    engine.train_batch([('hello there', 'hello there friend'), ('how are you', 'fine thanks'),
+                        ('hello there', 'hello again')])
+    engine.train('what time is it', 'time to test')
+
+    restored = AIEngine.from_state(json.loads(json.dumps(engine.to_state())))
+    assert restored.to_state() == engine.to_state()
+    assert restored.pattern_keys == engine.pattern_keys
+    _, scoring_confidences = restored._scoring_arrays()
+    assert list(scoring_confidences) == [engine.patterns.confidence(key) for key in engine.pattern_keys]
+
+    # Training after the restore appends to the same ids
+    restored.train('hello there', 'hello once more')
+    pattern_id = restored.pattern_ids['hello there']
+    assert restored.patterns.responses(pattern_id)[-1] == 'hello once more'
+    _, scoring_confidences = restored._scoring_arrays()
+    assert len(scoring_confidences) == len(restored.pattern_keys)
+    assert scoring_confidences[pattern_id] == restored.patterns.confidence('hello there')
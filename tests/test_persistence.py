@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from utils.persistence import EngineStore
+
+PAIRS = [(f"question {i} about topic {i % 7}", f"answer {i} on topic {i % 7}") for i in range(300)]
+
+
+def test_snapshots_are_written_in_the_background(tmp_path):
+    store = EngineStore(str(tmp_path), snapshot_every=100, sync_every=10)
+    engine = store.load()
+    release = threading.Event()
+    capture = engine.state_snapshot
+
+    def slow_capture():
+        build_state = capture()
+        return lambda: release.wait(10) and build_state()
+
+    engine.state_snapshot = slow_capture
+    start = time.perf_counter()
+    for input_text, output_text in PAIRS[:150]:
+        engine.train(input_text, output_text)
+    # The snapshot is stuck behind `release`, but training went on
+    assert time.perf_counter() - start < 5
+    assert store.stats()['snapshot_running']
+    release.set()
+    store._wait_for_snapshot()
+    for input_text, output_text in PAIRS[150:]:
+        engine.train(input_text, output_text)
+    store.close()
+    assert store.stats()['snapshots_written'] >= 2
+    assert store.stats()['last_snapshot_error'] is None
+
+    restored = EngineStore(str(tmp_path)).load()
+    assert restored.to_state() == engine.to_state()
+
+
+def test_restore_before_the_snapshot_is_on_disk(tmp_path):
+    store = EngineStore(str(tmp_path), snapshot_every=10 ** 9)
+    engine = store.load()
+    engine.train_batch(PAIRS[:100])
+    store.snapshot()
+    engine.train_batch(PAIRS[100:200])
+    with store._lock:
+        # As if the process died right after rotating to the next WAL
+        store._rotate()
+    engine.train_batch(PAIRS[200:])
+    store.close()
+
+    restored = EngineStore(str(tmp_path)).load()
+    assert restored.to_state() == engine.to_state()
+
+
+def test_logged_steps_survive_without_close(tmp_path):
+    store = EngineStore(str(tmp_path), snapshot_every=10 ** 9, sync_every=1000)
+    engine = store.load()
+    for input_text, output_text in PAIRS[:5]:
+        engine.train(input_text, output_text)
+    engine.train_batch(PAIRS[5:20])
+
+    # No close() or sync, as if the process had been killed here
+    restored = EngineStore(str(tmp_path)).load()
+    assert restored.to_state() == engine.to_state()
+
+
+def test_failed_log_write_trains_nothing(tmp_path):
+    engine = EngineStore(str(tmp_path)).load()
+    engine.train_batch(PAIRS[:10])
+    before = engine.to_state()
+
+    def failing_log(pairs):
+        raise OSError("disk full")
+
+    engine.training_log = failing_log
+    score, message, _ = engine.train(*PAIRS[10])
+    assert message.startswith("Training error")
+    assert engine.to_state() == before
+    with pytest.raises(OSError):
+        engine.train_batch(PAIRS[10:20])
+    assert engine.to_state() == before
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from utils.profiler import SamplingProfiler
+
+
+def hot_function(stop):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(1000))
+    return total
+
+
+def test_collapsed_stacks_name_the_hot_function():
+    stop = threading.Event()
+    busy = threading.Thread(target=hot_function, args=(stop,), name='busy-worker-3')
+    busy.start()
+    profiler = SamplingProfiler()
+    try:
+        assert profiler.start(interval=0.002)
+        assert not profiler.start()
+        deadline = time.monotonic() + 10
+        while profiler.stats()['samples'] < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        profiler.stop()
+        stop.set()
+        busy.join()
+
+    hot = {}
+    for line in profiler.folded().splitlines():
+        stack, _, count = line.rpartition(' ')
+        frames = stack.split(';')
+        if frames[-1].startswith('hot_function (test_profiler.py:'):
+            hot[stack] = int(count)
+    assert hot, profiler.folded()
+    # Numbered thread names fold into one root
+    assert all(stack.startswith('busy-worker;') for stack in hot)
+    assert sum(hot.values()) >= 10
+
+
+def test_stop_joins_the_sampler_thread():
+    profiler = SamplingProfiler()
+    assert profiler.start(interval=0.001)
+    sampler = profiler._thread
+    assert sampler.is_alive()
+    profiler.stop()
+    assert not sampler.is_alive()
+    stats = profiler.stats()
+    assert not stats['running']
+    assert stats['stopped_at'] is not None
+    # Samples are kept after stopping and cleared by the next start
+    assert profiler.start(interval=0.001)
+    assert profiler._thread is not sampler
+    profiler.stop()
+
+
+def test_duration_stops_sampling_on_its_own():
+    profiler = SamplingProfiler()
+    profiler.start(interval=0.001, duration=0.05)
+    profiler._thread.join(5)
+    assert not profiler.running
+    assert profiler.stats()['stopped_at'] is not None
@@ -0,0 +1,89 @@
+import json
+import threading
+
+from sqlalchemy import create_engine, inspect
+
+from database import db
+from models import Dataset, DatasetRow
+from utils.schema import upgrade_schema
+
+# The tables as the first release created them
+BASELINE_SCHEMA = [
+    """CREATE TABLE ai_model (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        version VARCHAR(20) NOT NULL,
+        created_at DATETIME,
+        api_key_hash VARCHAR(256),
+        configuration JSON,
+        state JSON)""",
+    """CREATE TABLE dataset (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        version VARCHAR(20) NOT NULL,
+        description TEXT,
+        created_at DATETIME,
+        data JSON NOT NULL,
+        model_id INTEGER REFERENCES ai_model (id))""",
+]
+
+
+def test_upgrade_baseline_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO ai_model (id, name, version) VALUES (1, 'm', '1.0')")
+        connection.exec_driver_sql(
+            "INSERT INTO dataset (id, name, version, data, model_id) VALUES (7, 'd', '1.0', ?, 1)",
+            (json.dumps([{'input': 'a', 'output': 'b'}]),))
+
+    db.metadata.create_all(engine)
+    assert upgrade_schema(engine, db.metadata)
+    assert upgrade_schema(engine, db.metadata) == []
+
+    inspector = inspect(engine)
+    dataset_columns = {c['name']: c for c in inspector.get_columns('dataset')}
+    assert dataset_columns['data']['nullable']
+    assert {'row_count', 'byte_size', 'updated_at'} <= set(dataset_columns)
+    assert {'api_key_id', 'updated_at'} <= {c['name'] for c in inspector.get_columns('ai_model')}
+    assert 'ix_ai_model_api_key_id' in {i['name'] for i in inspector.get_indexes('ai_model')}
+    with engine.begin() as connection:
+        row = connection.exec_driver_sql("SELECT id, data, model_id, row_count FROM dataset").one()
+        assert (row[0], json.loads(row[1]), row[2], row[3]) == (7, [{'input': 'a', 'output': 'b'}], 1, None)
+        # Row-stored datasets have no payload
+        connection.exec_driver_sql("INSERT INTO dataset (name, version) VALUES ('rows', '1.0')")
+        foreign_keys = connection.exec_driver_sql("PRAGMA foreign_key_list(dataset_row)").all()
+        assert [fk[2] for fk in foreign_keys] == ['dataset']
+
+
+def test_concurrent_first_reads_migrate_once(client, app_module, monkeypatch):
+    rows = [{'input': f'q{i}', 'output': f'a{i}'} for i in range(5)]
+    with app_module.app.app_context():
+        dataset = Dataset(name='legacy', version='1.0', data=rows)
+        db.session.add(dataset)
+        db.session.commit()
+        dataset_id = dataset.id
+
+    # The other reader migrates the rows after this one has loaded the dataset
+    original = Dataset.ensure_row_storage
+    calls = []
+
+    def racing_ensure_row_storage(self):
+        if not calls:
+            calls.append(True)
+            other = threading.Thread(target=lambda: calls.append(
+                client.get(f'/api/datasets/{dataset_id}/rows').get_json()))
+            other.start()
+            other.join()
+        return original(self)
+
+    monkeypatch.setattr(Dataset, 'ensure_row_storage', racing_ensure_row_storage)
+    response = client.get(f'/api/datasets/{dataset_id}')
+    assert response.status_code == 200
+    assert response.get_json()['data'] == rows
+    assert calls[1]['rows'] == rows
+
+    with app_module.app.app_context():
+        stored = db.session.query(DatasetRow).filter_by(dataset_id=dataset_id).count()
+    assert stored == len(rows)
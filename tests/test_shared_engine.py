@@ -0,0 +1,146 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from utils.ai_engine import AIEngine
+from utils.persistence import EngineStore
+from utils import shared_engine
+from utils.shared_engine import EngineOwner, PatternIndexReader, SharedEngineClient, write_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTHKEY = b'test-authkey'
+
+
+def echo_pairs(start, count):
+    """Pairs answered with their own input, so each pattern is matched with full confidence"""
+    return [(f"topic{i} alpha", f"topic{i} alpha") for i in range(start, start + count)]
+
+
+def wait_until(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def owner_process(tmp_path):
+    """The owner running as its own process; yields (process, client)"""
+    address = str(tmp_path / 'owner.sock')
+    index_path = str(tmp_path / 'patterns.idx')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'utils.shared_engine', '--data-dir', str(tmp_path / 'engine'),
+         '--address', address, '--index', index_path, '--publish-interval', '0.05'],
+        cwd=ROOT, env={**os.environ, 'ENGINE_AUTHKEY': AUTHKEY.decode()})
+    try:
+        wait_until(lambda: os.path.exists(address) and os.path.exists(index_path))
+        yield process, SharedEngineClient(address, index_path, AUTHKEY, refresh_interval=0)
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_reader_in_another_process_sees_published_updates(owner_process):
+    _, client = owner_process
+    assert client.generate_response("topic0 alpha") == ("I haven't learned enough patterns yet.", 0.1)
+
+    scores, _ = client.train_batch(echo_pairs(0, 3))
+    assert scores == [1.0, 1.0, 1.0]
+    wait_until(lambda: client.reader().pattern_count == 3)
+    assert client.generate_response("topic1 alpha") == ("topic1 alpha", 1.0)
+
+    version = client.memory_version
+    client.train("topic9 beta", "topic9 beta")
+    wait_until(lambda: client.memory_version > version)
+    assert client.reader().pattern_count == 4
+    assert client.generate_response("topic9 beta") == ("topic9 beta", 1.0)
+
+
+def test_reads_fall_back_to_the_last_index_when_the_owner_dies(owner_process):
+    process, client = owner_process
+    client.train_batch(echo_pairs(0, 5))
+    wait_until(lambda: client.reader().pattern_count == 5)
+
+    process.kill()
+    process.wait()
+    assert client.generate_response("topic3 alpha") == ("topic3 alpha", 1.0)
+    with pytest.raises(RuntimeError, match="not reachable"):
+        client.train("topic7 alpha", "topic7 alpha")
+    assert client.reader().pattern_count == 5
+
+
+def test_concurrent_publish_and_read_is_never_torn(tmp_path):
+    path = str(tmp_path / 'patterns.idx')
+    engine = AIEngine()
+    write_index(engine.patterns.snapshot(), path, engine.memory_version)
+    publishing = True
+    errors = []
+
+    def publish():
+        nonlocal publishing
+        try:
+            for start in range(0, 4000, 50):
+                engine.train_batch(echo_pairs(start, 50))
+                write_index(engine.patterns.snapshot(), path, engine.memory_version)
+        finally:
+            publishing = False
+
+    def read():
+        client = SharedEngineClient(str(tmp_path / 'unused.sock'), path, AUTHKEY, refresh_interval=0)
+        last_version = 0
+        try:
+            while publishing:
+                reader = client.reader()
+                assert reader.version >= last_version
+                last_version = reader.version
+                # Every section must describe the same set of patterns
+                count = reader.pattern_count
+                assert reader.version == count
+                assert len(reader.pattern_sizes) == len(reader.confidences) == count
+                for pattern_id in {0, count // 2, count - 1} if count else ():
+                    text = f"topic{pattern_id} alpha"
+                    assert reader.pattern(pattern_id) == text
+                    assert reader.responses(pattern_id) == [text]
+                    assert reader.find_best_match(text) == (pattern_id, 1.0)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    publish()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert PatternIndexReader(path).pattern_count == 4000
+
+
+def test_training_does_not_wait_for_index_writes(tmp_path, monkeypatch):
+    owner = EngineOwner(EngineStore(str(tmp_path / 'engine')), str(tmp_path / 'owner.sock'),
+                        str(tmp_path / 'patterns.idx'), AUTHKEY)
+    owner._handle(('train', echo_pairs(0, 10)))
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_write_index(patterns, path, version):
+        writing.set()
+        release.wait(10)
+
+    monkeypatch.setattr(shared_engine, 'write_index', slow_write_index)
+    publisher = threading.Thread(target=owner.publish)
+    publisher.start()
+    try:
+        assert writing.wait(5)
+        trained = []
+        trainer = threading.Thread(target=lambda: trained.append(owner._handle(('train', echo_pairs(10, 10)))))
+        trainer.start()
+        trainer.join(5)
+        assert trained and trained[0]['scores'] == [1.0] * 10
+    finally:
+        release.set()
+        publisher.join()
+        owner.store.close()
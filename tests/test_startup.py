@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter. flask-socketio's Engine.IO client imports
+# requests itself when it is installed (and copes when it is not), so
+# requests is blocked rather than looked for: any eager import of it in
+# the app fails the import
+IMPORT_APP = """
+import sys
+sys.modules['requests'] = None
+import app
+loaded = [name for name in ('huggingface_hub', 'datasets') if name in sys.modules]
+assert not loaded, f"loaded at import: {loaded}"
+"""
+
+
+def test_import_defers_heavy_clients():
+    """Startup must not load the GitHub or Hugging Face clients; timing budgets
+    are checked by benchmarks/bench_startup.py"""
+    result = subprocess.run([sys.executable, '-c', IMPORT_APP], cwd=ROOT,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+# A WSGI server imports app:app and serves it without calling start_services()
+SERVE_WITHOUT_START = """
+import app
+client = app.app.test_client()
+response = client.post('/api/chat', json={'message': 'hello there'})
+assert response.status_code == 200, response.get_data(as_text=True)
+assert app.ai_engine is not None
+assert app.job_scheduler._threads, "job workers not started"
+assert client.get('/api/engines/stats').status_code == 200
+assert len(app.job_scheduler._threads) == app.job_scheduler.workers
+"""
+
+
+def test_first_request_starts_services(tmp_path):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp_path / 'test.db'}",
+               ENGINE_DATA_DIR=str(tmp_path / 'engine'),
+               BLOB_STORE_DIR=str(tmp_path / 'blobs'),
+               JOB_SPOOL_DIR=str(tmp_path / 'jobs'))
+    result = subprocess.run([sys.executable, '-c', SERVE_WITHOUT_START], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
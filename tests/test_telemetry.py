@@ -0,0 +1,64 @@
+from utils.ai_engine import AIEngine
+from utils.telemetry import TrainingTelemetry
+
+
+def make_telemetry(max_patterns=1000):
+    sent = []
+    telemetry = TrainingTelemetry(lambda sid, frame, on_ack: sent.append((frame, on_ack)),
+                                  max_rate=1e9, max_in_flight=100, max_patterns=max_patterns)
+    engine = AIEngine()
+    engine.training_observer = telemetry.observer('shared', engine)
+    return telemetry, engine, sent
+
+
+def train(engine, count, offset=0):
+    engine.train_batch([(f"question {i} about item {i}", f"answer {i} about item {i}")
+                        for i in range(offset, offset + count)])
+
+
+def test_subscribe_sends_reset_then_snapshot():
+    telemetry, engine, sent = make_telemetry()
+    train(engine, 20)
+    telemetry.flush()
+
+    telemetry.subscribe('sid', 'shared')
+    telemetry.flush()
+
+    (reset, _), (snapshot, _) = sent
+    assert reset['reset'] and not reset['snapshot']
+    assert snapshot['snapshot'] and not snapshot['reset']
+    assert snapshot['patterns'] == engine._get_current_patterns()
+    assert snapshot['pattern_count'] == len(engine.pattern_keys)
+
+
+def test_overflow_reset_is_followed_by_most_confident_patterns():
+    telemetry, engine, sent = make_telemetry(max_patterns=10)
+    telemetry.subscribe('sid', 'shared')
+    telemetry.flush()
+    for frame, on_ack in sent:
+        on_ack()
+    sent.clear()
+
+    train(engine, 50)
+    telemetry.flush()
+
+    (reset, _), (snapshot, _) = sent
+    assert reset['reset'] and reset['patterns'] == {}
+    assert snapshot['snapshot'] and len(snapshot['patterns']) == 10
+    threshold = min(snapshot['patterns'].values())
+    assert all(confidence <= threshold for key, confidence in engine._get_current_patterns().items()
+               if key not in snapshot['patterns'])
+
+
+def test_no_snapshot_without_reset():
+    telemetry, engine, sent = make_telemetry()
+    telemetry.subscribe('sid', 'shared')
+    telemetry.flush()
+    sent.clear()
+
+    train(engine, 5)
+    telemetry.flush()
+
+    (frame, _), = sent
+    assert not frame['reset'] and not frame['snapshot']
+    assert len(frame['patterns']) > 0
@@ -1,13 +1,20 @@
+import copy
+import itertools
 import random
-from typing import List, Dict, Tuple, Optional
-import math
+import time
+import numpy as np
+from typing import Callable, List, Dict, Set, Tuple, Optional
+from array import array
+from utils.lsh_index import MinHashLSH
+from utils.pattern_memory import PatternMemory
+
+_instance_ids = itertools.count(1)
 
 class AIEngine:
-    def __init__(self):
+    def __init__(self, approximate_matching: bool = False, max_recall_loss: float = 0.05,
+                 num_perm: int = 128):
         self.memory = {
-            'patterns': {},
             'responses': {},
-            'confidence_scores': {},
             'level_stats': {
                 'training_count': 0,
                 'success_rate': 0.0,
@@ -18,13 +25,55 @@ class AIEngine:
         self.max_level = 10
         self.min_confidence_threshold = 0.6
         
+        # Learned patterns, their responses and confidences, by pattern id
+        self.patterns = PatternMemory()
+        
+        # Inverted index: token -> ids of patterns containing it. Pattern ids
+        # follow insertion order so lookups break ties like a full scan does.
+        self.token_index: Dict[str, Set[int]] = {}
+        self.pattern_sizes = array('I')
+        
+        # Bumped on every memory change so callers can tell when cached
+        # answers or saved copies of this engine are stale. Versions restart
+        # with every instance, so caches outliving one compare version_token
+        self.memory_version = 0
+        self.instance_id = next(_instance_ids)
+        
+        # Optional callback receiving every trained (input, output) pair,
+        # e.g. EngineStore.append for write-ahead logging
+        self.training_log: Optional[Callable[[List[Tuple[str, str]]], None]] = None
+        
+        # Optional callback receiving each training step's scores and the
+        # new confidences of the patterns it touched, e.g. for telemetry
+        self.training_observer: Optional[Callable[[List[float], Dict[str, float]], None]] = None
+        
+        # Optional recorder for timings and candidate counts, e.g. an
+        # EngineRecorder from utils.metrics
+        self.metrics = None
+        
+        # Opt-in MinHash/LSH candidate search for very large memories. Only
+        # patterns with Jaccard above the confidence threshold can produce a
+        # confident answer, so that is the similarity LSH is tuned for.
+        self.lsh: Optional[MinHashLSH] = None
+        if approximate_matching:
+            self.lsh = MinHashLSH(
+                threshold=self.min_confidence_threshold,
+                max_recall_loss=max_recall_loss,
+                num_perm=num_perm
+            )
+        
     def train(self, input_text: str, expected_output: str) -> Tuple[float, str, Dict]:
-        """Train the AI with input-output pairs and return score, message, and patterns"""
+        """Train the AI with input-output pairs and return score, message, and changed patterns"""
+        start = time.perf_counter()
         try:
             # Validate input
             if not self._validate_input(input_text, expected_output):
                 return 0.1, "Invalid input or output format", {}
             
+            # Logged before memory changes, so a failed write trains nothing
+            if self.training_log is not None:
+                self.training_log([(input_text, expected_output)])
+            
             # Training logic for different levels
             if self.current_level <= 3:
                 score = self._train_basic_patterns(input_text, expected_output)
@@ -36,8 +85,13 @@ class AIEngine:
             # Update level statistics
             self._update_level_stats(score)
             
-            # Get current patterns for visualization
-            patterns = self._get_current_patterns()
+            # Only the pattern this step touched, not the whole memory
+            pattern_key = ' '.join(input_text.lower().split())
+            patterns = {pattern_key: self.patterns.confidence(pattern_key)}
+            if self.training_observer is not None:
+                self.training_observer([score], patterns)
+            if self.metrics is not None:
+                self.metrics.observe_train(1, time.perf_counter() - start)
             
             return score, f"Training completed for level {self.current_level}", patterns
             
@@ -45,6 +99,130 @@ class AIEngine:
             print(f"Training error: {str(e)}")
             return 0.0, f"Training error: {str(e)}", {}
     
+    def train_batch(self, pairs: List[Tuple[str, str]]) -> Tuple[List[float], str]:
+        """Train on many input-output pairs and return per-sample scores and a message.
+        
+        Equivalent to calling train() on each pair in order: every string is
+        tokenized once, the Jaccard, context and semantic scores for the whole
+        batch are computed with NumPy, and level stats are updated per sample
+        so level transitions happen at the same points.
+        """
+        start = time.perf_counter()
+        scores = [0.1] * len(pairs)
+        valid = [i for i, (input_text, expected_output) in enumerate(pairs)
+                 if self._validate_input(input_text, expected_output)]
+        if not valid:
+            return scores, f"Training completed for level {self.current_level}"
+        
+        # Tokenize each sample once
+        pattern_keys = []
+        shared = np.empty(len(valid), dtype=np.int64)
+        union = np.empty(len(valid), dtype=np.int64)
+        length_gap = np.empty(len(valid), dtype=np.int64)
+        for k, i in enumerate(valid):
+            input_text, expected_output = pairs[i]
+            input_words = input_text.lower().split()
+            output_words = expected_output.lower().split()
+            input_set = set(input_words)
+            output_set = set(output_words)
+            pattern_keys.append(' '.join(input_words))
+            shared[k] = len(input_set & output_set)
+            union[k] = len(input_set | output_set)
+            length_gap[k] = abs(len(input_words) - len(output_words))
+        
+        # Same arithmetic as the per-level training chain, for the whole batch
+        basic = np.divide(shared, union, out=np.zeros(len(valid)), where=union > 0)
+        intermediate = (basic + basic) / 2
+        semantic = np.minimum(1.0, basic + np.where(length_gap <= 2, 0.1, 0.0))
+        advanced = (intermediate + semantic) / 2
+        basic, intermediate, advanced = basic.tolist(), intermediate.tolist(), advanced.tolist()
+        
+        if self.training_log is not None:
+            self.training_log([pairs[i] for i in valid])
+        for k, i in enumerate(valid):
+            if self.current_level <= 3:
+                score = basic[k]
+            elif self.current_level <= 6:
+                score = intermediate[k]
+            else:
+                score = advanced[k]
+            
+            self._record_pattern(pattern_keys[k], pairs[i][1], basic[k])
+            self._update_level_stats(score)
+            scores[i] = score
+        
+        if self.training_observer is not None:
+            self.training_observer([scores[i] for i in valid],
+                                   {key: self.patterns.confidence(key) for key in pattern_keys})
+        if self.metrics is not None:
+            self.metrics.observe_train(len(valid), time.perf_counter() - start)
+        
+        return scores, f"Training completed for level {self.current_level}"
+    
+    @property
+    def pattern_keys(self) -> List[str]:
+        return self.patterns.keys
+    
+    @property
+    def pattern_ids(self) -> Dict[str, int]:
+        return self.patterns.ids
+    
+    @property
+    def pattern_entry_count(self) -> int:
+        return self.patterns.entry_count
+    
+    @property
+    def version_token(self) -> Tuple[int, int]:
+        """(instance, memory_version): differs between any two states of any two engines"""
+        return self.instance_id, self.memory_version
+    
+    def to_state(self) -> Dict:
+        """Serialize learned memory and level into a JSON-compatible dict"""
+        return self._build_state(self.patterns, self.memory, self.current_level)
+    
+    def state_snapshot(self) -> Callable[[], Dict]:
+        """Capture memory now; returns a function building its to_state() later.
+        
+        Only flat copies are taken here, so a caller can capture inside a
+        training step and serialize on another thread while training goes on.
+        """
+        patterns = self.patterns.snapshot()
+        memory = copy.deepcopy(self.memory)
+        level = self.current_level
+        return lambda: self._build_state(patterns, memory, level)
+    
+    @staticmethod
+    def _build_state(patterns: PatternMemory, memory: Dict, level: int) -> Dict:
+        pattern_dicts, confidence_scores = patterns.to_dicts()
+        return {
+            'memory': {
+                **memory,
+                'patterns': pattern_dicts,
+                'confidence_scores': confidence_scores
+            },
+            'current_level': level
+        }
+    
+    @classmethod
+    def from_state(cls, state: Optional[Dict], **kwargs) -> 'AIEngine':
+        """Create an engine from a dict produced by to_state()"""
+        engine = cls(**kwargs)
+        if state:
+            memory = dict(state.get('memory', {}))
+            engine.patterns = PatternMemory.from_dicts(
+                memory.pop('patterns', {}), memory.pop('confidence_scores', {}))
+            engine.memory.update(memory)
+            engine.current_level = state.get('current_level', 1)
+            engine.rebuild_index()
+        return engine
+    
+    def estimate_memory_bytes(self) -> int:
+        """Rough in-process size of the learned memory, in O(1)"""
+        # Per-pattern: key string, id entry, array slots and index entries;
+        # per distinct response: the string and its intern entry
+        return (1024 + len(self.patterns) * 400 + len(self.patterns.strings) * 150
+                + self.pattern_entry_count * 4)
+    
     def _validate_input(self, input_text: str, expected_output: str) -> bool:
         """Validate input and output text"""
         if not input_text or not expected_output:
@@ -58,20 +236,19 @@ class AIEngine:
         words = input_text.lower().split()
         pattern_key = ' '.join(words)
         
-        if pattern_key not in self.memory['patterns']:
-            self.memory['patterns'][pattern_key] = []
-        
-        self.memory['patterns'][pattern_key].append(expected_output)
-        
         # Calculate pattern similarity score
         similarity = self._calculate_similarity(input_text, expected_output)
-        self.memory['confidence_scores'][pattern_key] = max(
-            similarity,
-            self.memory['confidence_scores'].get(pattern_key, 0)
-        )
+        self._record_pattern(pattern_key, expected_output, similarity)
         
         return similarity
     
+    def _record_pattern(self, pattern_key: str, expected_output: str, similarity: float):
+        """Store a pattern-response entry and raise the pattern's confidence"""
+        pattern_id, created = self.patterns.add(pattern_key, expected_output, similarity)
+        if created:
+            self._index_pattern(pattern_id)
+        self.memory_version += 1
+    
     def _train_intermediate_patterns(self, input_text: str, expected_output: str) -> float:
         """Train intermediate pattern recognition with context awareness"""
         basic_score = self._train_basic_patterns(input_text, expected_output)
@@ -118,8 +295,8 @@ class AIEngine:
         )
         
         # Update pattern diversity
-        unique_patterns = len(self.memory['patterns'])
-        total_patterns = sum(len(patterns) for patterns in self.memory['patterns'].values())
+        unique_patterns = len(self.patterns)
+        total_patterns = self.pattern_entry_count
         stats['pattern_diversity'] = unique_patterns / max(1, total_patterns)
         
         # Check for level progression
@@ -140,34 +317,203 @@ class AIEngine:
     
     def _get_current_patterns(self) -> Dict[str, float]:
         """Get current patterns and their confidence scores for visualization"""
-        return {
-            pattern: self.memory['confidence_scores'].get(pattern, 0.0)
-            for pattern in self.memory['patterns']
-        }
+        return dict(zip(self.patterns.keys, self.patterns.confidences))
     
     def generate_response(self, input_text: str) -> Tuple[str, float]:
         """Generate response based on trained patterns"""
-        if not self.memory['patterns']:
+        if not self.patterns:
             return "I haven't learned enough patterns yet.", 0.1
             
+        best_match, best_score = self._find_best_match(input_text)
+        return self.choose_response(best_match, best_score)
+    
+    def choose_response(self, best_match: Optional[str], best_score: float) -> Tuple[str, float]:
+        """Pick a response for a match found by _find_best_match or find_best_matches"""
+        if not self.patterns:
+            return "I haven't learned enough patterns yet.", 0.1
+        
+        if best_match and best_score > self.min_confidence_threshold:
+            responses = self.patterns.responses(self.patterns.ids[best_match])
+            return random.choice(responses), best_score
+            
+        return "I'm not sure how to respond to that.", max(0.3, best_score)
+    
+    def find_best_matches(self, inputs: List[str], top_k: int = 0
+                          ) -> List[Tuple[Optional[str], float, List[Tuple[str, float]]]]:
+        """Score many inputs in one pass; returns (best_match, best_score, top_k candidates) each.
+        
+        Every distinct token's posting list is fetched once for the whole
+        batch and all (input, pattern) scores are computed together with
+        NumPy, using the same arithmetic and first-wins tie breaking as
+        _find_best_match, so best matches are identical.
+        """
+        start_time = time.perf_counter()
+        queries = [set(text.lower().split()) for text in inputs]
+        results = [(None, 0, []) for _ in queries]
+        if not self.pattern_keys:
+            return results
+        
+        count = len(self.pattern_keys)
+        if self.lsh is not None:
+            q_list, pattern_list, shared_list = [], [], []
+            for i, words in enumerate(queries):
+                overlap = self._approximate_overlap(words)
+                q_list.extend([i] * len(overlap))
+                pattern_list.extend(overlap.keys())
+                shared_list.extend(overlap.values())
+            if not q_list:
+                self._observe_match(start_time, np.zeros(len(queries)))
+                return results
+            q = np.array(q_list, dtype=np.int64)
+            pattern = np.array(pattern_list, dtype=np.int64)
+            shared = np.array(shared_list, dtype=np.int64)
+        else:
+            by_token: Dict[str, List[int]] = {}
+            for i, words in enumerate(queries):
+                for word in words:
+                    by_token.setdefault(word, []).append(i)
+            query_ids, pattern_ids = [], []
+            for word, query_list in by_token.items():
+                postings = self.token_index.get(word)
+                if not postings:
+                    continue
+                postings = np.fromiter(postings, dtype=np.int64, count=len(postings))
+                for i in query_list:
+                    query_ids.append(np.full(len(postings), i))
+                    pattern_ids.append(postings)
+            if not query_ids:
+                self._observe_match(start_time, np.zeros(len(queries)))
+                return results
+            # Shared-token counts per (query, pattern) pair
+            keys, shared = np.unique(np.concatenate(query_ids) * count + np.concatenate(pattern_ids),
+                                     return_counts=True)
+            q, pattern = np.divmod(keys, count)
+        
+        sizes, confidences = self._scoring_arrays()
+        query_sizes = np.array([len(words) for words in queries], dtype=np.int64)
+        scores = shared / (query_sizes[q] + sizes[pattern] - shared) * confidences[pattern]
+        
+        # Highest score first; equal scores keep the earlier pattern
+        order = np.lexsort((pattern, -scores, q))
+        q, pattern, scores = q[order], pattern[order], scores[order]
+        starts = np.searchsorted(q, np.arange(len(queries)))
+        ends = np.append(starts[1:], len(q))
+        for i in range(len(queries)):
+            start, end = int(starts[i]), int(ends[i])
+            if start == end or scores[start] <= 0:
+                continue
+            best = self.pattern_keys[pattern[start]]
+            candidates = [
+                (self.pattern_keys[pattern[j]], float(scores[j]))
+                for j in range(start, min(end, start + top_k)) if scores[j] > 0
+            ]
+            results[i] = (best, float(scores[start]), candidates)
+        self._observe_match(start_time, ends - starts)
+        return results
+    
+    def _observe_match(self, start_time: float, candidate_counts):
+        if self.metrics is not None:
+            self.metrics.observe_match(candidate_counts, time.perf_counter() - start_time)
+    
+    def _scoring_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Pattern sizes and confidences by pattern id, rebuilt after training"""
+        if getattr(self, '_scoring_version', None) != self.memory_version:
+            # Copies, so the arrays stay free to grow while these are in use
+            self._scoring_sizes = np.array(self.pattern_sizes, dtype=np.int64)
+            self._scoring_confidences = np.array(self.patterns.confidences, dtype=np.float64)
+            self._scoring_version = self.memory_version
+        return self._scoring_sizes, self._scoring_confidences
+        
+    def _index_pattern(self, pattern_id: int):
+        """Register a new pattern in the inverted token index"""
+        words = set(self.pattern_keys[pattern_id].lower().split())
+        self.pattern_sizes.append(len(words))
+        for word in words:
+            self.token_index.setdefault(word, set()).add(pattern_id)
+        if self.lsh is not None:
+            self.lsh.add(pattern_id, words)
+    
+    def rebuild_index(self):
+        """Rebuild the token index from memory, e.g. after loading saved state"""
+        # Same bookkeeping as _index_pattern, inlined for bulk loads
+        token_index: Dict[str, Set[int]] = {}
+        pattern_sizes = array('I')
+        for pattern_id, pattern_key in enumerate(self.pattern_keys):
+            words = set(pattern_key.lower().split())
+            pattern_sizes.append(len(words))
+            for word in words:
+                ids = token_index.get(word)
+                if ids is None:
+                    token_index[word] = {pattern_id}
+                else:
+                    ids.add(pattern_id)
+        self.token_index = token_index
+        self.pattern_sizes = pattern_sizes
+        
+        # Compute LSH signatures in one vectorized pass
+        lsh = self.lsh
+        if lsh is not None:
+            self.lsh = MinHashLSH(
+                threshold=lsh.threshold,
+                max_recall_loss=lsh.max_recall_loss,
+                num_perm=lsh.num_perm
+            )
+            self.lsh.add_many(
+                list(range(len(self.pattern_keys))),
+                [set(key.lower().split()) for key in self.pattern_keys]
+            )
+    
+    def _find_best_match(self, input_text: str) -> Tuple[Optional[str], float]:
+        """Find the pattern with the highest similarity x confidence score.
+        
+        Only patterns sharing at least one token with the input are scored;
+        all others have zero similarity and can never win. The Jaccard score
+        is computed from the same integer counts as _calculate_similarity, so
+        results match a full scan exactly. In approximate mode the candidates
+        come from LSH buckets instead and near matches may be missed.
+        """
+        start_time = time.perf_counter()
+        words = set(input_text.lower().split())
+        
+        if self.lsh is not None:
+            overlap = self._approximate_overlap(words)
+        else:
+            overlap = self._exact_overlap(words)
+        
         best_match = None
         best_score = 0
+        confidences = self.patterns.confidences
         
-        # Find best matching pattern
-        for pattern in self.memory['patterns']:
-            similarity = self._calculate_similarity(input_text, pattern)
-            confidence = self.memory['confidence_scores'].get(pattern, 0)
-            combined_score = similarity * confidence
+        # Visit candidates in insertion order to keep first-wins tie breaking
+        for pattern_id in sorted(overlap):
+            shared = overlap[pattern_id]
+            union = len(words) + self.pattern_sizes[pattern_id] - shared
+            similarity = shared / union
+            combined_score = similarity * confidences[pattern_id]
             
             if combined_score > best_score:
                 best_score = combined_score
-                best_match = pattern
-                
-        if best_match and best_score > self.min_confidence_threshold:
-            responses = self.memory['patterns'][best_match]
-            return random.choice(responses), best_score
-            
-        return "I'm not sure how to respond to that.", max(0.3, best_score)
+                best_match = self.pattern_keys[pattern_id]
+        
+        self._observe_match(start_time, (len(overlap),))
+        return best_match, best_score
+    
+    def _exact_overlap(self, words: Set[str]) -> Dict[int, int]:
+        """Count shared tokens for every pattern sharing a token with the input"""
+        overlap: Dict[int, int] = {}
+        for word in words:
+            for pattern_id in self.token_index.get(word, ()):
+                overlap[pattern_id] = overlap.get(pattern_id, 0) + 1
+        return overlap
+    
+    def _approximate_overlap(self, words: Set[str]) -> Dict[int, int]:
+        """Count shared tokens only for patterns colliding in an LSH band"""
+        overlap: Dict[int, int] = {}
+        for pattern_id in self.lsh.query(words):
+            shared = len(words.intersection(self.pattern_keys[pattern_id].lower().split()))
+            if shared:
+                overlap[pattern_id] = shared
+        return overlap
         
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two texts"""
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+class VerifiedKeyCache:
+    """Bounded TTL cache of API keys that recently passed the slow KDF check.
+
+    Entries are keyed by a SHA-256 digest of the key, so raw keys are never
+    held in memory, and map to the owning model's id.
+
+    A request may verify a key just before it is revoked and cache it just
+    after. To prevent that, callers take generation() before reading the
+    key's row and pass it to put(), which drops the entry if the model was
+    invalidated in between.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[bytes, Tuple[int, float]]' = OrderedDict()
+        self._by_model: Dict[int, Set[bytes]] = {}
+        self._generation = 0
+        # model id -> generation of its latest invalidation
+        self._invalidated: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(api_key: str) -> bytes:
+        return hashlib.sha256(api_key.encode('utf-8')).digest()
+
+    def get(self, api_key: str) -> Optional[int]:
+        """Return the model id for a recently verified key, or None"""
+        digest = self._digest(api_key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self) -> int:
+        """Token for put(), taken before the key is looked up and verified"""
+        with self._lock:
+            return self._generation
+
+    def put(self, api_key: str, model_id: int, generation: Optional[int] = None):
+        if self.max_entries <= 0:
+            return
+        digest = self._digest(api_key)
+        with self._lock:
+            if generation is not None and self._invalidated.get(model_id, -1) > generation:
+                # Verified against a row that has since been rotated or deleted
+                return
+            self._remove(digest)
+            self._entries[digest] = (model_id, time.monotonic() + self.ttl)
+            self._by_model.setdefault(model_id, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_model(self, model_id: int):
+        """Forget every cached key of a model, e.g. after rotation or deletion"""
+        with self._lock:
+            self._generation += 1
+            self._invalidated[model_id] = self._generation
+            for digest in list(self._by_model.get(model_id, ())):
+                self._remove(digest)
+
+    def discard(self, api_key: str):
+        """Forget one cached key"""
+        with self._lock:
+            self._remove(self._digest(api_key))
+
+    def _remove(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            digests = self._by_model.get(entry[0])
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_model[entry[0]]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
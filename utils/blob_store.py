@@ -0,0 +1,109 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import time
+from typing import IO, Callable, Iterator, Optional, Set, Tuple
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """Content-addressed files named by SHA-256, stored as root/ab/abcdef...
+
+    Identical content is stored once. Reference counts live with the
+    manifests that point at blobs (see models.Blob); this class only deals
+    with the files.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        if len(sha256) != 64 or not all(c in '0123456789abcdef' for c in sha256):
+            raise ValueError(f"Invalid blob id: {sha256}")
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put_stream(self, stream: IO[bytes],
+                   verify: Optional[Callable[[str, int], None]] = None) -> Tuple[str, int]:
+        """Copy a stream into the store, hashing as it goes; returns (sha256, size).
+
+        verify(path, size) sees the complete copy before it is stored and
+        raises to reject it.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            if verify is not None:
+                verify(tmp_path, size)
+            sha256 = digest.hexdigest()
+            final_path = self.path(sha256)
+            try:
+                # Restart the GC grace period of an existing copy: the caller
+                # is about to reference it, before its refcount is written
+                os.utime(final_path)
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return sha256, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def put_bytes(self, data: bytes,
+                  verify: Optional[Callable[[str, int], None]] = None) -> Tuple[str, int]:
+        return self.put_stream(io.BytesIO(data), verify)
+
+    def open_mmap(self, sha256: str) -> memoryview:
+        """Read-only, zero-copy view of a blob's bytes"""
+        with open(self.path(sha256), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'')
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def iter_blobs(self) -> Iterator[str]:
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                yield name
+
+    def collect_garbage(self, referenced: Set[str], grace_seconds: float = 3600) -> int:
+        """Delete blobs not in `referenced` that are older than the grace period.
+
+        The grace period protects blobs written by uploads whose manifests
+        have not been committed yet. Returns the number of blobs removed.
+        """
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for sha256 in list(self.iter_blobs()):
+            if sha256 in referenced:
+                continue
+            path = self.path(sha256)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
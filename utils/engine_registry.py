@@ -0,0 +1,219 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.ai_engine import AIEngine
+
+
+class _Entry:
+    __slots__ = ('engine', 'saved_version', 'leases', 'save_lock')
+
+    def __init__(self, engine: AIEngine):
+        self.engine = engine
+        self.saved_version = engine.memory_version
+        self.leases = 0
+        # Serializes write-backs of this engine; held without the registry lock
+        self.save_lock = threading.Lock()
+
+    @property
+    def dirty(self) -> bool:
+        return self.engine.memory_version != self.saved_version
+
+
+class _Loading:
+    """Placeholder for an engine being loaded; other lookups of it wait here"""
+    __slots__ = ('done', 'stale')
+
+    def __init__(self):
+        self.done = threading.Event()
+        # Set when the model is discarded mid-load, so the result is not cached
+        self.stale = False
+
+
+class EngineRegistry:
+    """LRU cache of per-model AIEngines, hydrated lazily on first use.
+
+    `load_engine(model_id)` builds an engine from storage (raising KeyError
+    if the model does not exist) and `save_engine(model_id, engine)` writes
+    one back. Hot engines are kept under both a count and an approximate
+    byte budget; evicting an engine with unsaved changes saves it first.
+    Engines held through lease() are never evicted, so a long-running job
+    keeps training the engine later requests will see.
+
+    Loads and saves run outside the registry lock, so a slow model never
+    holds up lookups of other models: concurrent lookups of a model being
+    loaded wait for that one load, and an evicted engine whose write-back
+    is still running is taken back rather than reloaded from storage.
+    """
+
+    def __init__(self, load_engine: Callable[[int], AIEngine],
+                 save_engine: Callable[[int, AIEngine], None],
+                 max_engines: int = 16, max_bytes: Optional[int] = None):
+        self.load_engine = load_engine
+        self.save_engine = save_engine
+        self.max_engines = max_engines
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[int, _Entry]' = OrderedDict()
+        self._loading: Dict[int, _Loading] = {}
+        # Evicted engines with unsaved changes, until their write-back ends
+        self._evicted: Dict[int, _Entry] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def get(self, model_id: int) -> AIEngine:
+        """Return the engine for model_id, loading it on a cache miss"""
+        return self._acquire(model_id).engine
+
+    def _acquire(self, model_id: int, lease: bool = False) -> _Entry:
+        entry, evicted = self._find_or_load(model_id, lease)
+        self._write_back_evicted(evicted)
+        return entry
+
+    def _find_or_load(self, model_id: int, lease: bool) -> Tuple[_Entry, List[Tuple[int, _Entry]]]:
+        """Return the entry, pinned if lease, and the engines evicted to make room"""
+        while True:
+            with self._lock:
+                entry = self._entries.get(model_id)
+                if entry is None:
+                    entry = self._evicted.get(model_id)
+                    if entry is not None:
+                        self._entries[model_id] = entry
+                if entry is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(model_id)
+                    return self._check_out(model_id, entry, lease)
+                loading = self._loading.get(model_id)
+                if loading is None:
+                    loading = self._loading[model_id] = _Loading()
+                    self.misses += 1
+                    break
+            loading.done.wait()
+
+        try:
+            engine = self.load_engine(model_id)
+        except BaseException:
+            with self._lock:
+                del self._loading[model_id]
+            loading.done.set()
+            raise
+        with self._lock:
+            del self._loading[model_id]
+            loading.done.set()
+            if loading.stale:
+                return _Entry(engine), []
+            self._entries[model_id] = _Entry(engine)
+            return self._check_out(model_id, self._entries[model_id], lease)
+
+    def _check_out(self, model_id: int, entry: _Entry, lease: bool) -> Tuple[_Entry, List[Tuple[int, _Entry]]]:
+        if lease:
+            entry.leases += 1
+        return entry, self._evict(keep=model_id)
+
+    @contextmanager
+    def lease(self, model_id: int):
+        """Pin the engine in the cache for the duration of the block"""
+        entry = self._acquire(model_id, lease=True)
+        try:
+            yield entry.engine
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                # Budget may have been exceeded while the engine was pinned
+                evicted = self._evict(keep=model_id)
+            self._write_back_evicted(evicted)
+
+    def write_back(self, model_id: int):
+        """Save model_id's engine now if it has unsaved changes"""
+        with self._lock:
+            entry = self._entries.get(model_id) or self._evicted.get(model_id)
+        if entry is not None:
+            self._write_back(model_id, entry)
+
+    def discard(self, model_id: int, write_back: bool = False):
+        """Drop a cached engine, e.g. when its model is deleted or replaced"""
+        with self._lock:
+            entry = self._entries.pop(model_id, None)
+            evicted = self._evicted.pop(model_id, None)
+            loading = self._loading.get(model_id)
+            if loading is not None:
+                loading.stale = True
+        entry = entry or evicted
+        if entry is not None and write_back:
+            self._write_back(model_id, entry)
+
+    def flush(self):
+        """Write back every cached engine with unsaved changes"""
+        with self._lock:
+            entries = list(self._entries.items()) + list(self._evicted.items())
+        for model_id, entry in entries:
+            self._write_back(model_id, entry)
+
+    def _write_back(self, model_id: int, entry: _Entry):
+        with entry.save_lock:
+            if not entry.dirty:
+                return
+            version = entry.engine.memory_version
+            self.save_engine(model_id, entry.engine)
+            entry.saved_version = version
+            self.writebacks += 1
+
+    def _write_back_evicted(self, evicted: List[Tuple[int, _Entry]]):
+        error = None
+        for model_id, entry in evicted:
+            try:
+                self._write_back(model_id, entry)
+            except Exception as e:
+                error = error or e
+            with self._lock:
+                if self._evicted.get(model_id) is entry:
+                    del self._evicted[model_id]
+                    if entry.dirty and model_id not in self._entries:
+                        # Keep unsaved changes cached; the next eviction retries
+                        self._entries[model_id] = entry
+                        self._entries.move_to_end(model_id, last=False)
+        if error is not None:
+            raise error
+
+    def _total_bytes(self) -> int:
+        return sum(entry.engine.estimate_memory_bytes() for entry in self._entries.values())
+
+    def _over_budget(self) -> bool:
+        if len(self._entries) > self.max_engines:
+            return True
+        return self.max_bytes is not None and self._total_bytes() > self.max_bytes
+
+    def _evict(self, keep: Optional[int]) -> List[Tuple[int, _Entry]]:
+        """Drop least recently used engines, never the one just requested or a
+        leased one; returns the dropped engines that still need saving"""
+        evicted = []
+        while self._over_budget():
+            victim = next((model_id for model_id, entry in self._entries.items()
+                           if model_id != keep and not entry.leases), None)
+            if victim is None:
+                break
+            entry = self._entries.pop(victim)
+            if entry.dirty:
+                self._evicted[victim] = entry
+                evicted.append((victim, entry))
+            self.evictions += 1
+        return evicted
+
+    def stats(self) -> Dict:
+        """Cache counters for sizing the budget"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'engines': len(self._entries),
+                'approximate_bytes': self._total_bytes(),
+                'max_engines': self.max_engines,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'writebacks': self.writebacks,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
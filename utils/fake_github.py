@@ -0,0 +1,257 @@
+"""A local stand-in for the parts of the GitHub REST API the app uses.
+
+Serves repositories from an in-memory object database, so GitHub imports
+and exports can be exercised without network access:
+
+    python -m utils.fake_github path/to/files --repo owner/name --port 8765
+    GITHUB_API_URL=http://127.0.0.1:8765 GITHUB_TOKEN=test flask run
+
+Blob SHAs follow git's own scheme; tree and commit SHAs are hashes of
+their JSON form, which is enough for clients that only compare them.
+GET /_requests reports how many API calls each route received.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict
+
+from flask import Flask, Response, jsonify, request
+
+from utils.github_sync import git_blob_sha
+
+
+def _object_sha(kind: str, value) -> str:
+    return hashlib.sha1(kind.encode() + json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class FakeRepository:
+    def __init__(self, full_name: str, default_branch: str = 'main'):
+        self.full_name = full_name
+        self.default_branch = default_branch
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, list] = {}
+        self.commits: Dict[str, dict] = {}
+        self.refs: Dict[str, str] = {}
+
+    def add_blob(self, content: bytes) -> str:
+        sha = git_blob_sha(content)
+        self.blobs[sha] = content
+        return sha
+
+    def add_tree(self, entries: list) -> str:
+        entries = sorted(entries, key=lambda entry: entry['path'])
+        sha = _object_sha('tree', entries)
+        self.trees[sha] = entries
+        return sha
+
+    def build_tree(self, files: Dict[str, str]) -> str:
+        """Nested trees for a {path: blob_sha} mapping; returns the root SHA"""
+        children: Dict[str, Dict[str, str]] = {}
+        entries = []
+        for path, sha in files.items():
+            head, sep, rest = path.partition('/')
+            if sep:
+                children.setdefault(head, {})[rest] = sha
+            else:
+                entries.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': sha,
+                                'size': len(self.blobs[sha])})
+        for name, subtree in children.items():
+            entries.append({'path': name, 'mode': '040000', 'type': 'tree',
+                            'sha': self.build_tree(subtree)})
+        return self.add_tree(entries)
+
+    def flatten(self, tree_sha: str, prefix: str = '') -> Dict[str, str]:
+        files = {}
+        for entry in self.trees[tree_sha]:
+            if entry['type'] == 'tree':
+                files.update(self.flatten(entry['sha'], prefix + entry['path'] + '/'))
+            else:
+                files[prefix + entry['path']] = entry['sha']
+        return files
+
+    def add_commit(self, tree_sha: str, parents: list, message: str) -> str:
+        commit = {'tree': {'sha': tree_sha}, 'parents': [{'sha': p} for p in parents],
+                  'message': message}
+        sha = _object_sha('commit', commit)
+        self.commits[sha] = {**commit, 'sha': sha}
+        return sha
+
+    def commit_files(self, files: Dict[str, bytes], message: str = 'Initial commit') -> str:
+        """Commit file contents on top of the default branch and advance it"""
+        branch = 'heads/' + self.default_branch
+        parents = [self.refs[branch]] if branch in self.refs else []
+        tree = self.build_tree({path: self.add_blob(content) for path, content in files.items()})
+        self.refs[branch] = self.add_commit(tree, parents, message)
+        return self.refs[branch]
+
+
+def create_fake_github(repositories: Dict[str, FakeRepository], max_tree_entries: int = 100000) -> Flask:
+    """Flask app serving the given repositories under /repos/<owner>/<name>.
+
+    Recursive tree listings longer than max_tree_entries are truncated like
+    GitHub's, to exercise clients' fallback paths.
+    """
+    app = Flask(__name__)
+    request_counts = Counter()
+    lock = threading.Lock()
+
+    def error(status, message):
+        return jsonify({'message': message}), status
+
+    @app.before_request
+    def check_auth():
+        if request.path.startswith('/repos/') and not request.headers.get('Authorization'):
+            return error(401, 'Requires authentication')
+        if request.url_rule is not None and request.path.startswith('/repos/'):
+            with lock:
+                request_counts[f'{request.method} {request.url_rule.rule}'] += 1
+
+    def get_repository(owner, name):
+        return repositories.get(f'{owner}/{name}')
+
+    @app.route('/_requests')
+    def requests_made():
+        return jsonify(dict(request_counts))
+
+    @app.route('/repos/<owner>/<name>')
+    def repository(owner, name):
+        repo = get_repository(owner, name)
+        if repo is None:
+            return error(404, 'Not Found')
+        return jsonify({'name': name, 'full_name': repo.full_name,
+                        'default_branch': repo.default_branch})
+
+    @app.route('/repos/<owner>/<name>/git/ref/<path:ref>')
+    def get_ref(owner, name, ref):
+        repo = get_repository(owner, name)
+        if repo is None or ref not in repo.refs:
+            return error(404, 'Not Found')
+        return jsonify({'ref': 'refs/' + ref, 'object': {'type': 'commit', 'sha': repo.refs[ref]}})
+
+    @app.route('/repos/<owner>/<name>/git/commits/<sha>')
+    def get_commit(owner, name, sha):
+        repo = get_repository(owner, name)
+        if repo is None or sha not in repo.commits:
+            return error(404, 'Not Found')
+        return jsonify(repo.commits[sha])
+
+    @app.route('/repos/<owner>/<name>/git/trees/<sha>')
+    def get_tree(owner, name, sha):
+        repo = get_repository(owner, name)
+        if repo is None or sha not in repo.trees:
+            return error(404, 'Not Found')
+        if not request.args.get('recursive'):
+            return jsonify({'sha': sha, 'tree': repo.trees[sha], 'truncated': False})
+
+        entries = []
+        pending = [('', sha)]
+        while pending:
+            prefix, tree_sha = pending.pop()
+            for entry in repo.trees[tree_sha]:
+                entries.append({**entry, 'path': prefix + entry['path']})
+                if entry['type'] == 'tree':
+                    pending.append((prefix + entry['path'] + '/', entry['sha']))
+        truncated = len(entries) > max_tree_entries
+        return jsonify({'sha': sha, 'tree': entries[:max_tree_entries], 'truncated': truncated})
+
+    @app.route('/repos/<owner>/<name>/git/blobs/<sha>')
+    def get_blob(owner, name, sha):
+        repo = get_repository(owner, name)
+        if repo is None or sha not in repo.blobs:
+            return error(404, 'Not Found')
+        content = repo.blobs[sha]
+        if 'raw' in request.headers.get('Accept', ''):
+            return Response(content, mimetype='application/octet-stream')
+        return jsonify({'sha': sha, 'size': len(content), 'encoding': 'base64',
+                        'content': base64.b64encode(content).decode()})
+
+    @app.route('/repos/<owner>/<name>/git/blobs', methods=['POST'])
+    def create_blob(owner, name):
+        repo = get_repository(owner, name)
+        if repo is None:
+            return error(404, 'Not Found')
+        payload = request.get_json()
+        content = payload['content']
+        content = base64.b64decode(content) if payload.get('encoding') == 'base64' else content.encode()
+        with lock:
+            sha = repo.add_blob(content)
+        return jsonify({'sha': sha}), 201
+
+    @app.route('/repos/<owner>/<name>/git/trees', methods=['POST'])
+    def create_tree(owner, name):
+        repo = get_repository(owner, name)
+        if repo is None:
+            return error(404, 'Not Found')
+        payload = request.get_json()
+        with lock:
+            files = repo.flatten(payload['base_tree']) if payload.get('base_tree') else {}
+            for entry in payload['tree']:
+                if entry.get('sha') is None:
+                    files.pop(entry['path'], None)
+                elif entry['sha'] not in repo.blobs:
+                    return error(422, f"Unknown blob {entry['sha']}")
+                else:
+                    files[entry['path']] = entry['sha']
+            sha = repo.build_tree(files)
+        return jsonify({'sha': sha, 'tree': repo.trees[sha]}), 201
+
+    @app.route('/repos/<owner>/<name>/git/commits', methods=['POST'])
+    def create_commit(owner, name):
+        repo = get_repository(owner, name)
+        if repo is None:
+            return error(404, 'Not Found')
+        payload = request.get_json()
+        if payload['tree'] not in repo.trees:
+            return error(422, 'Tree not found')
+        with lock:
+            sha = repo.add_commit(payload['tree'], payload.get('parents', []), payload['message'])
+        return jsonify(repo.commits[sha]), 201
+
+    @app.route('/repos/<owner>/<name>/git/refs/<path:ref>', methods=['PATCH'])
+    def update_ref(owner, name, ref):
+        repo = get_repository(owner, name)
+        if repo is None or ref not in repo.refs:
+            return error(404, 'Not Found')
+        payload = request.get_json()
+        with lock:
+            commit = repo.commits.get(payload['sha'])
+            if commit is None:
+                return error(422, 'Object does not exist')
+            parents = [parent['sha'] for parent in commit['parents']]
+            if not payload.get('force') and repo.refs[ref] not in parents:
+                return error(422, 'Update is not a fast forward')
+            repo.refs[ref] = payload['sha']
+        return jsonify({'ref': 'refs/' + ref, 'object': {'type': 'commit', 'sha': payload['sha']}})
+
+    return app
+
+
+def load_directory(directory: str) -> Dict[str, bytes]:
+    files = {}
+    for root, _, names in os.walk(directory):
+        for file_name in names:
+            path = os.path.join(root, file_name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, directory).replace(os.sep, '/')] = f.read()
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a directory as a fake GitHub repository")
+    parser.add_argument('directory')
+    parser.add_argument('--repo', default='local/model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    repo = FakeRepository(args.repo)
+    repo.commit_files(load_directory(args.directory))
+    create_fake_github({args.repo: repo}).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
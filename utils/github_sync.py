@@ -0,0 +1,220 @@
+"""Git Data API client for moving model artifacts to and from GitHub.
+
+Talks to the REST API with plain requests so blob downloads can be streamed
+straight into the blob store and several transfers can share one pooled
+session. requests is imported when the first client is created, not at
+startup. Set GITHUB_API_URL to point it at a stand-in such as
+utils.fake_github.
+"""
+import base64
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from utils.blob_store import COPY_CHUNK_SIZE
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_API_URL = 'https://api.github.com'
+MODEL_FILE_EXTENSIONS = ('.json', '.h5', '.pt', '.ckpt')
+
+
+class GitHubError(Exception):
+    pass
+
+
+def git_blob_sha(content) -> str:
+    """The SHA git gives a blob with this content"""
+    digest = hashlib.sha1(b'blob %d\0' % len(content))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def _check_git_blob(path: str, size: int, sha: str):
+    """Reject a downloaded file whose content does not hash to the blob requested"""
+    digest = hashlib.sha1(b'blob %d\0' % size)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != sha:
+        raise GitHubError(f"Blob {sha} downloaded with content hashing to {digest.hexdigest()}")
+
+
+def parse_repo_url(repo_url: str) -> str:
+    """'https://github.com/owner/name(.git)' -> 'owner/name'"""
+    full_name = repo_url.split('github.com/')[-1].strip('/')
+    if full_name.endswith('.git'):
+        full_name = full_name[:-4]
+    if full_name.count('/') != 1:
+        raise ValueError(f"Invalid repository URL: {repo_url}")
+    return full_name
+
+
+class GitHubClient:
+    def __init__(self, token: str, full_name: str, api_url: str = None,
+                 pool_size: int = 8, timeout: float = 30, retries: int = 3):
+        self.full_name = full_name
+        self.base_url = f"{(api_url or os.environ.get('GITHUB_API_URL', DEFAULT_API_URL)).rstrip('/')}/repos/{full_name}"
+        self.timeout = timeout
+        self.retries = retries
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/vnd.github+json',
+            'X-GitHub-Api-Version': '2022-11-28'
+        })
+
+    def _request(self, method: str, path: str, **kwargs) -> 'requests.Response':
+        """Send a request, retrying connection errors and 5xx responses"""
+        import requests
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.request(method, self.base_url + path, **kwargs)
+            except requests.ConnectionError:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code < 500 or attempt == self.retries:
+                    break
+                response.close()
+            time.sleep(0.5 * 2 ** attempt)
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.reason)
+            except ValueError:
+                message = response.reason
+            raise GitHubError(f"GitHub API error {response.status_code} for {path}: {message}")
+        return response
+
+    def default_branch(self) -> str:
+        return self._request('GET', '').json()['default_branch']
+
+    def resolve_branch(self, branch: str) -> str:
+        """Commit SHA a branch currently points at"""
+        return self._request('GET', f'/git/ref/heads/{branch}').json()['object']['sha']
+
+    def get_commit(self, sha: str) -> Dict:
+        return self._request('GET', f'/git/commits/{sha}').json()
+
+    def list_tree(self, tree_sha: str) -> List[Dict]:
+        """Every blob under a tree, with paths relative to its root.
+
+        Uses one recursive listing; GitHub truncates those for very large
+        trees, in which case subtrees are walked one level at a time.
+        """
+        tree = self._request('GET', f'/git/trees/{tree_sha}', params={'recursive': 1}).json()
+        if not tree.get('truncated'):
+            return [entry for entry in tree['tree'] if entry['type'] == 'blob']
+
+        blobs = []
+        pending = [('', tree_sha)]
+        while pending:
+            prefix, sha = pending.pop()
+            for entry in self._request('GET', f'/git/trees/{sha}').json()['tree']:
+                entry = {**entry, 'path': prefix + entry['path']}
+                if entry['type'] == 'tree':
+                    pending.append((entry['path'] + '/', entry['sha']))
+                elif entry['type'] == 'blob':
+                    blobs.append(entry)
+        return blobs
+
+    def create_blob(self, content) -> str:
+        payload = {'content': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+        return self._request('POST', '/git/blobs', json=payload).json()['sha']
+
+    def create_tree(self, base_tree: str, entries: List[Dict]) -> str:
+        payload = {'tree': entries}
+        if base_tree:
+            payload['base_tree'] = base_tree
+        return self._request('POST', '/git/trees', json=payload).json()['sha']
+
+    def create_commit(self, message: str, tree_sha: str, parents: List[str]) -> str:
+        payload = {'message': message, 'tree': tree_sha, 'parents': parents}
+        return self._request('POST', '/git/commits', json=payload).json()['sha']
+
+    def update_branch(self, branch: str, commit_sha: str):
+        """Fast-forward a branch; fails if it moved since it was read"""
+        self._request('PATCH', f'/git/refs/heads/{branch}', json={'sha': commit_sha, 'force': False})
+
+    def download_blob(self, sha: str, blob_store):
+        """Stream a blob's raw bytes into the blob store; returns (sha256, size)"""
+        response = self._request('GET', f'/git/blobs/{sha}', stream=True,
+                                 headers={'Accept': 'application/vnd.github.raw+json'})
+        with response:
+            response.raw.decode_content = True
+            return blob_store.put_stream(response.raw, verify=lambda path, size: _check_git_blob(path, size, sha))
+
+
+def download_files(client: GitHubClient, entries: List[Dict], blob_store,
+                   on_file: Callable[[Dict, str, int], None], workers: int = 8):
+    """Download tree entries concurrently into the blob store.
+
+    on_file(entry, sha256, size) runs in the calling thread as each file
+    completes, so callers can record progress without sharing a database
+    session between threads. The first failure cancels queued downloads;
+    those already in flight are still reported before it is re-raised.
+    """
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(client.download_blob, entry['sha'], blob_store): entry
+                   for entry in entries}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                if not errors:
+                    for pending in futures:
+                        pending.cancel()
+                errors.append(future.exception())
+                continue
+            try:
+                on_file(futures[future], *future.result())
+            except Exception:
+                for pending in futures:
+                    pending.cancel()
+                raise
+    if errors:
+        raise errors[0]
+
+
+def push_files(client: GitHubClient, branch: str, files: Dict[str, str],
+               read_file: Callable[[str], bytes], message: str, workers: int = 8) -> Dict:
+    """Publish files to a branch as a single commit, uploading only changes.
+
+    `files` maps paths to their local git blob SHAs; read_file(path) is only
+    called for paths whose SHA differs from the branch's tree. Paths not in
+    `files` are left as they are. Costs four requests to read the branch and
+    write the commit, plus one per changed file.
+    """
+    head = client.resolve_branch(branch)
+    base_tree = client.get_commit(head)['tree']['sha']
+    remote = {entry['path']: entry['sha'] for entry in client.list_tree(base_tree)}
+    changed = sorted(path for path, sha in files.items() if remote.get(path) != sha)
+    if not changed:
+        return {'commit_sha': head, 'changed_files': []}
+
+    def upload(path):
+        sha = client.create_blob(read_file(path))
+        if sha != files[path]:
+            raise GitHubError(f"GitHub stored {path} as {sha}, expected {files[path]}")
+        return sha
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        shas = list(executor.map(upload, changed))
+    tree = client.create_tree(base_tree, [
+        {'path': path, 'mode': '100644', 'type': 'blob', 'sha': sha}
+        for path, sha in zip(changed, shas)
+    ])
+    commit = client.create_commit(message, tree, [head])
+    client.update_branch(branch, commit)
+    return {'commit_sha': commit, 'changed_files': changed}
@@ -0,0 +1,231 @@
+"""Hugging Face dataset search, preview and streaming import.
+
+Sources are opened with load_dataset(streaming=True), so records arrive
+one at a time from the remote shards and nothing is materialized: a
+preview reads the first N records, an import maps records to
+input/output pairs and hands them on in fixed-size batches.
+
+Dataset ids naming a directory under `local_root` are loaded from the
+files in it (JSON Lines, CSV, Parquet, ...) instead of the Hub, which is
+how the pipeline runs offline:
+
+    source = DatasetSource(load_dataset, local_root='data/hf_datasets')
+    records = source.open('squad-sample')
+    first, records = peek(records)
+    columns = infer_columns(first, None, None)
+    for batch in batched(iter_pairs(records, *columns), 1000):
+        ...
+"""
+import itertools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+DATASET_ID_PATTERN = re.compile(r'^[A-Za-z0-9][\w.-]*(/[A-Za-z0-9][\w.-]*)?$')
+
+# Column names tried, in order, when the caller does not name them
+INPUT_COLUMNS = ('input', 'question', 'prompt', 'instruction', 'query', 'text', 'source',
+                 'sentence', 'context')
+OUTPUT_COLUMNS = ('output', 'answer', 'answers', 'response', 'completion', 'target',
+                  'summary', 'label')
+
+MAX_PREVIEW_CHARS = 1000
+
+
+class TTLCache:
+    """Bounded cache whose entries expire `ttl` seconds after they were stored"""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def check_dataset_id(dataset_id: str) -> str:
+    """Accept "name" or "owner/name" only, never a filesystem path"""
+    if not isinstance(dataset_id, str) or not DATASET_ID_PATTERN.match(dataset_id) \
+            or '..' in dataset_id:
+        raise ValueError("dataset_id must look like 'name' or 'owner/name'")
+    return dataset_id
+
+
+class DatasetSource:
+    """Opens Hub datasets, or local ones under local_root, as record streams"""
+
+    def __init__(self, load_dataset: Callable, local_root: Optional[str] = None):
+        self._load_dataset = load_dataset
+        self.local_root = local_root
+
+    def local_path(self, dataset_id: str) -> Optional[str]:
+        if not self.local_root:
+            return None
+        path = os.path.join(self.local_root, dataset_id)
+        return path if os.path.isdir(path) else None
+
+    def local_datasets(self) -> List[str]:
+        if not self.local_root or not os.path.isdir(self.local_root):
+            return []
+        return sorted(name for name in os.listdir(self.local_root)
+                      if os.path.isdir(os.path.join(self.local_root, name)))
+
+    def local_version(self, dataset_id: str) -> Optional[Tuple]:
+        """Changes whenever a local dataset's files are written; None for Hub datasets"""
+        path = self.local_path(dataset_id)
+        if path is None:
+            return None
+        files = []
+        for directory, _, names in os.walk(path):
+            for name in names:
+                stat = os.stat(os.path.join(directory, name))
+                files.append((os.path.relpath(os.path.join(directory, name), path),
+                              stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(files))
+
+    def open(self, dataset_id: str, config: Optional[str] = None, split: str = 'train'):
+        """A streaming IterableDataset over one split"""
+        check_dataset_id(dataset_id)
+        path = self.local_path(dataset_id)
+        if path is None and os.path.exists(dataset_id):
+            # load_dataset would read a relative path from the working directory
+            raise ValueError(f"Unknown dataset: {dataset_id}")
+        return self._load_dataset(path or dataset_id, config, split=split, streaming=True)
+
+    def preview(self, dataset_id: str, rows: int = 5, config: Optional[str] = None,
+                split: str = 'train') -> Dict:
+        """Column types, the first `rows` records and the guessed input/output columns"""
+        records = self.open(dataset_id, config, split)
+        samples = [json_safe(record) for record in itertools.islice(records, rows)]
+        features = getattr(records, 'features', None)
+        if features:
+            features = {name: getattr(feature, 'dtype', type(feature).__name__)
+                        for name, feature in features.items()}
+        else:
+            # JSON and CSV streams only know their columns once read
+            features = {}
+            for sample in samples:
+                for name, value in sample.items():
+                    features.setdefault(name, type(value).__name__)
+        try:
+            columns = dict(zip(('input', 'output'), infer_columns(features)))
+        except ValueError:
+            columns = None
+        return {'dataset_id': dataset_id, 'split': split, 'features': features,
+                'samples': samples, 'columns': columns}
+
+
+def search_datasets(api, query: str, limit: int = 20) -> List[Dict]:
+    """Hub search results in the shape the dashboard lists"""
+    results = []
+    for info in api.list_datasets(search=query or None, limit=limit, sort='downloads',
+                                  expand=['description', 'downloads', 'likes']):
+        results.append({
+            'id': info.id,
+            'name': info.id,
+            'description': getattr(info, 'description', None),
+            'downloads': info.downloads or 0,
+            'likes': info.likes or 0
+        })
+    return results
+
+
+def json_safe(value, max_chars: int = MAX_PREVIEW_CHARS):
+    """Shorten long text and stringify values JSON cannot hold, e.g. images"""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + '...'
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): json_safe(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item, max_chars) for item in value[:100]]
+    return json_safe(str(value), max_chars)
+
+
+def infer_columns(columns: Iterable[str], input_column: Optional[str] = None,
+                  output_column: Optional[str] = None) -> Tuple[str, str]:
+    """Resolve the input and output columns, guessing the ones not given"""
+    columns = list(columns)
+    for name in (input_column, output_column):
+        if name is not None and name not in columns:
+            raise ValueError(f"Unknown column: {name}")
+    if input_column is None:
+        input_column = next((c for c in INPUT_COLUMNS if c in columns and c != output_column), None)
+    if output_column is None:
+        output_column = next((c for c in OUTPUT_COLUMNS if c in columns and c != input_column), None)
+    if input_column is None or output_column is None:
+        raise ValueError(f"Cannot tell input and output columns apart in {', '.join(columns)}; "
+                         "pass input_column and output_column")
+    return input_column, output_column
+
+
+def field_text(value) -> Optional[str]:
+    """Text of a field: strings as they are, the first answer of lists and
+    SQuAD-style {"text": [...]} dicts, numbers and labels as strings"""
+    if isinstance(value, dict) and 'text' in value:
+        value = value['text']
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None or isinstance(value, (dict, list, tuple)):
+        return None
+    text = value if isinstance(value, str) else str(value)
+    return text if text.strip() else None
+
+
+def peek(records: Iterable[Dict]) -> Tuple[Optional[Dict], Iterator[Dict]]:
+    """The first record, and an iterator that still starts with it"""
+    records = iter(records)
+    first = next(records, None)
+    return first, records if first is None else itertools.chain([first], records)
+
+
+def iter_pairs(records: Iterable[Dict], input_column: str, output_column: str,
+               skipped: Optional[List[int]] = None) -> Iterator[Tuple[str, str]]:
+    """(input, output) per record; records missing either are counted in skipped[0]"""
+    for record in records:
+        input_text = field_text(record.get(input_column))
+        output_text = field_text(record.get(output_column))
+        if input_text is None or output_text is None:
+            if skipped is not None:
+                skipped[0] += 1
+            continue
+        yield input_text, output_text
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,77 @@
+"""Third-party clients that are loaded on first use instead of at import.
+
+`datasets` alone pulls in pyarrow and pandas and costs most of a second
+to import; most processes (job workers, the shared engine owner, short
+CLI runs) never touch it. Each client is wrapped in a LazyService whose
+factory runs once, on the first get(), under a lock so concurrent first
+callers share one load:
+
+    hub = LazyService('huggingface_hub', huggingface_api)
+    hub.get().list_datasets(search='imdb')
+
+prewarm() loads a list of services ahead of time, e.g. from a background
+task once the server is accepting traffic.
+"""
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class LazyService:
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        """The client, created on the first call; a failed load is retried next time"""
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+        return self._value
+
+    def stats(self) -> Dict:
+        return {'loaded': self._loaded, 'load_seconds': self.load_seconds, 'error': self.error}
+
+
+def module(name: str) -> Callable[[], Any]:
+    """Factory importing a module by name"""
+    return lambda: importlib.import_module(name)
+
+
+def huggingface_api():
+    from huggingface_hub import HfApi
+    return HfApi()
+
+
+def prewarm(services: Iterable[LazyService], sleep: Callable[[float], None] = time.sleep,
+            delay: float = 0.0):
+    """Load services one after another after `delay` seconds; failures are left for get()"""
+    if delay:
+        sleep(delay)
+    for service in services:
+        try:
+            service.get()
+        except Exception:
+            pass
+        # Let request handlers run between loads
+        sleep(0)
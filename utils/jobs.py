@@ -0,0 +1,317 @@
+"""In-process background jobs with a bounded worker pool.
+
+Jobs are rows of a job table, so status outlives requests and restarts;
+the queue itself is an in-memory priority heap feeding a fixed number of
+worker threads. Handlers are registered per job kind and receive a
+JobContext for their parameters, progress reports and cancellation:
+
+    def handle_export(ctx):
+        for i, item in enumerate(items):
+            ctx.report(progress=i / len(items))  # raises JobCancelled
+        return {"exported": len(items)}
+
+    scheduler.register('export', handle_export)
+    job = scheduler.submit('export', {"model_id": 1}, model_id=1)
+"""
+import heapq
+import itertools
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from database import db
+
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobContext:
+    def __init__(self, scheduler: 'JobScheduler', job_id: str, params: Dict,
+                 owners: Set[int] = frozenset()):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.params = params
+        self.owners = owners
+        self._last_report = 0.0
+        self._deferred: Dict = {}
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job_id in self.scheduler._cancel_requested
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, progress: Optional[float] = None, message: Optional[str] = None,
+               force: bool = False, defer: bool = False):
+        """Record progress (0..1) and a status message, then check for cancellation.
+
+        Reports are written at most every min_report_interval seconds unless
+        forced, so handlers can call this once per item. Handlers that hold a
+        write transaction open pass defer: the values then only go to
+        on_update, and reach the job row with the next report without defer
+        or when the job ends. On SQLite the job row commit would otherwise
+        wait for the handler's transaction and fail as "database is locked".
+        """
+        self.check_cancelled()
+        now = time.monotonic()
+        if not force and now - self._last_report < self.scheduler.min_report_interval:
+            return
+        self._last_report = now
+        values = {}
+        if progress is not None:
+            values['progress'] = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            values['message'] = message[:500]
+        if defer:
+            self._deferred.update(values)
+            self.scheduler._emit_progress(self.job_id, values, self.owners)
+            return
+        values, self._deferred = {**self._deferred, **values}, {}
+        self.scheduler._update(self.job_id, **values)
+        self.check_cancelled()
+
+
+class JobScheduler:
+    """Runs registered handlers on worker threads.
+
+    on_update(job, owners) is called with the job's public fields on every
+    status change and progress report. owners are the model IDs whose API
+    keys may see the job: the model it works on and the one that submitted
+    it.
+    """
+
+    def __init__(self, app, job_model, on_update: Callable[[Dict, Set[int]], None] = None,
+                 workers: int = 4, max_queued: int = 1000, min_report_interval: float = 0.5):
+        self.app = app
+        self.job_model = job_model
+        self.on_update = on_update
+        self.workers = workers
+        self.max_queued = max_queued
+        self.min_report_interval = min_report_interval
+        # Identifies this process in the job table, for crash recovery; the
+        # random part tells a restarted process apart from one reusing its PID
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{os.urandom(4).hex()}"
+        self._handlers: Dict[str, Dict] = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._cancel_requested = set()
+        self._threads = []
+        self._running = 0
+
+    def register(self, kind: str, handler: Callable[[JobContext], Optional[Dict]],
+                 priority: int = 0, resumable: bool = False,
+                 cleanup: Optional[Callable[[Dict], None]] = None):
+        """Add a handler; resumable handlers are re-run if their process died.
+
+        Queued jobs run highest priority first. cleanup(params) runs once the
+        job has ended, however it ends: complete, failed, or cancelled
+        before or while it ran. Use it to release what submit() was given,
+        such as spooled uploads.
+        """
+        self._handlers[kind] = {'handler': handler, 'priority': priority, 'resumable': resumable,
+                                'cleanup': cleanup}
+
+    def start(self):
+        with self.app.app_context():
+            try:
+                self._recover()
+            except (OperationalError, ProgrammingError) as e:
+                # Typically the job table has not been created yet
+                db.session.rollback()
+                self.app.logger.warning("Skipping job recovery: %s", e)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind: str, params: Dict, model_id: int = None, requested_by: int = None,
+               priority: int = None):
+        """Persist a queued job and schedule it; returns the job row"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                raise QueueFull("Too many queued jobs, try again later")
+        if priority is None:
+            priority = self._handlers[kind]['priority']
+
+        job = self.job_model(
+            id=os.urandom(16).hex(),
+            kind=kind,
+            status='queued',
+            priority=priority,
+            params=params,
+            model_id=model_id,
+            requested_by=requested_by
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._emit(job)
+        self._enqueue(job.id, priority)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job now, or ask a running one to stop at its next report"""
+        Job = self.job_model
+        cancelled = Job.query.filter(Job.id == job_id, Job.status == 'queued').update(
+            {'status': 'cancelled', 'finished_at': datetime.utcnow()}, synchronize_session=False)
+        if not cancelled:
+            cancelled = Job.query.filter(Job.id == job_id, Job.status == 'running').update(
+                {'status': 'cancelling'}, synchronize_session=False)
+            if cancelled:
+                self._cancel_requested.add(job_id)
+        db.session.commit()
+        job = db.session.get(Job, job_id)
+        db.session.refresh(job)
+        if job.status == 'cancelled':
+            # Cancelled before a worker claimed it, so no handler will run
+            self._cleanup(job.kind, job.params)
+        self._emit(job)
+        return bool(cancelled)
+
+    def stats(self) -> Dict:
+        with self._condition:
+            queued = len(self._queue)
+        return {'workers': self.workers, 'running': self._running, 'queued': queued}
+
+    def _enqueue(self, job_id: str, priority: int):
+        with self._condition:
+            heapq.heappush(self._queue, (-priority, next(self._sequence), job_id))
+            self._condition.notify()
+
+    @staticmethod
+    def _owners(job) -> Set[int]:
+        return {job.model_id, job.requested_by} - {None}
+
+    def _emit(self, job):
+        if self.on_update is not None:
+            self.on_update(job.to_dict(), self._owners(job))
+
+    def _emit_progress(self, job_id: str, values: Dict, owners: Set[int]):
+        if self.on_update is not None:
+            self.on_update({'job_id': job_id, 'status': 'running', **values}, owners)
+
+    def _recover(self):
+        """Re-queue waiting jobs; settle jobs whose worker process has died"""
+        Job = self.job_model
+        settled = []
+        for job in Job.query.filter(Job.status.in_(ACTIVE_STATUSES)).all():
+            if job.status == 'queued':
+                self._enqueue(job.id, job.priority)
+                continue
+            if not self._owner_dead(job.owner):
+                continue
+            handler = self._handlers.get(job.kind)
+            if job.status == 'running' and handler and handler['resumable']:
+                job.status = 'queued'
+                job.owner = None
+                self._enqueue(job.id, job.priority)
+            else:
+                job.status = 'cancelled' if job.status == 'cancelling' else 'failed'
+                job.error = job.error or 'Interrupted by a server restart'
+                job.finished_at = datetime.utcnow()
+                settled.append((job.kind, job.params))
+        db.session.commit()
+        for kind, params in settled:
+            self._cleanup(kind, params)
+
+    def _owner_dead(self, owner: Optional[str]) -> bool:
+        if not owner:
+            return True
+        host, pid, _ = owner.rsplit(':', 2)
+        if host != socket.gethostname():
+            return False
+        if int(pid) == os.getpid():
+            return owner != self.owner
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except (PermissionError, ValueError):
+            return False
+        return False
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _, _, job_id = heapq.heappop(self._queue)
+                self._running += 1
+            try:
+                with self.app.app_context():
+                    self._run(job_id)
+            finally:
+                with self._condition:
+                    self._running -= 1
+
+    def _run(self, job_id: str):
+        Job = self.job_model
+        # Claiming is a conditional update, so a job runs once even if
+        # several processes have it queued
+        claimed = Job.query.filter(Job.id == job_id, Job.status == 'queued').update(
+            {'status': 'running', 'owner': self.owner, 'started_at': datetime.utcnow()},
+            synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+        job = db.session.get(Job, job_id)
+        db.session.refresh(job)
+        self._emit(job)
+
+        values = {'finished_at': datetime.utcnow()}
+        kind = job.kind
+        ctx = JobContext(self, job_id, job.params or {}, self._owners(job))
+        try:
+            handler = self._handlers[kind]['handler']
+            result = handler(ctx)
+            values.update(status='complete', progress=1.0, result=result)
+        except JobCancelled:
+            values.update(status='cancelled')
+        except Exception as e:
+            values.update(status='failed', error=str(e))
+        finally:
+            self._cancel_requested.discard(job_id)
+        db.session.rollback()
+        # Before the final status, so whoever sees it also sees the cleanup
+        self._cleanup(kind, ctx.params)
+        values['finished_at'] = datetime.utcnow()
+        self._update(job_id, **{**ctx._deferred, **values})
+
+    def _cleanup(self, kind: str, params: Optional[Dict]):
+        handler = self._handlers.get(kind)
+        if handler is None or handler['cleanup'] is None:
+            return
+        try:
+            handler['cleanup'](params or {})
+        except Exception:
+            self.app.logger.exception("Cleanup of a %s job failed", kind)
+
+    def _update(self, job_id: str, **values):
+        """Write job fields in a session of their own, apart from the handler's"""
+        with self.app.app_context():
+            job = db.session.get(self.job_model, job_id)
+            if job is None:
+                return
+            for key, value in values.items():
+                setattr(job, key, value)
+            db.session.commit()
+            # Another process may have asked for cancellation
+            if job.status == 'cancelling':
+                self._cancel_requested.add(job_id)
+            self._emit(job)
@@ -0,0 +1,137 @@
+import hashlib
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+# Mersenne prime used by the universal hash family h(x) = (a * x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def choose_bands(num_perm: int, threshold: float, max_recall_loss: float) -> Tuple[int, int]:
+    """Pick (bands, rows) so a pair at `threshold` Jaccard is found with
+    probability >= 1 - max_recall_loss, using as many rows per band as
+    possible to keep candidate sets small"""
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        hit_probability = 1 - (1 - threshold ** rows) ** bands
+        if hit_probability >= 1 - max_recall_loss:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHashLSH:
+    """MinHash signatures of word sets bucketed by locality-sensitive hashing.
+
+    Pairs of sets whose Jaccard similarity is at least `threshold` share a
+    bucket in at least one band with probability 1 - max_recall_loss.
+
+    Bulk-loaded items live in one sorted (key, id) array per band; items
+    added one at a time go to per-band dicts until the next bulk load.
+    """
+
+    def __init__(self, threshold: float = 0.6, max_recall_loss: float = 0.05,
+                 num_perm: int = 128, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        if not 0 < max_recall_loss < 1:
+            raise ValueError("max_recall_loss must be in (0, 1)")
+        self.threshold = threshold
+        self.max_recall_loss = max_recall_loss
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold, max_recall_loss)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        # Odd multipliers folding the rows of a band into one 64-bit bucket key
+        self._band_mix = rng.randint(0, 1 << 62, size=self.rows, dtype=np.uint64) * 2 + 1
+
+        self._token_hashes: Dict[str, int] = {}
+        self._sorted_keys = [np.empty(0, dtype=np.uint64) for _ in range(self.bands)]
+        self._sorted_ids = [np.empty(0, dtype=np.uint32) for _ in range(self.bands)]
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+
+    def _hash_tokens(self, tokens: Iterable[str]) -> np.ndarray:
+        """Stable 32-bit token hashes, independent of PYTHONHASHSEED"""
+        cache = self._token_hashes
+        values = []
+        for token in tokens:
+            value = cache.get(token)
+            if value is None:
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest()
+                value = cache[token] = int.from_bytes(digest, 'little')
+            values.append(value)
+        return np.asarray(values, dtype=np.uint64)
+
+    def _permute(self, hashes: np.ndarray) -> np.ndarray:
+        """Apply every hash permutation to every token hash: (num_perm, n)"""
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+
+    def signature(self, tokens: Set[str]) -> np.ndarray:
+        """Compute the MinHash signature of a single word set"""
+        if not tokens:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        return self._permute(self._hash_tokens(tokens)).min(axis=1)
+
+    def signatures(self, token_sets: List[Set[str]]) -> np.ndarray:
+        """Compute signatures for many word sets at once: (len(token_sets), num_perm).
+
+        Token hashes of all sets are concatenated and permuted together, then
+        reduced per set with np.minimum.reduceat.
+        """
+        result = np.full((len(token_sets), self.num_perm), _MAX_HASH, dtype=np.uint64)
+        rows = [i for i, tokens in enumerate(token_sets) if tokens]
+        if rows:
+            hashes = self._hash_tokens(token for i in rows for token in token_sets[i])
+            offsets = np.cumsum([0] + [len(token_sets[i]) for i in rows[:-1]])
+            result[rows] = np.minimum.reduceat(self._permute(hashes), offsets, axis=1).T
+        return result
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Fold each band of each signature into a bucket key: (n, bands)"""
+        banded = signatures[:, :self.bands * self.rows].reshape(-1, self.bands, self.rows)
+        return (banded * self._band_mix).sum(axis=2, dtype=np.uint64)
+
+    def add(self, item_id: int, tokens: Set[str]):
+        """Index a single word set under item_id"""
+        keys = self.band_keys(self.signature(tokens)[None, :])[0]
+        for band, key in enumerate(keys.tolist()):
+            self.buckets[band].setdefault(key, []).append(item_id)
+
+    def add_many(self, item_ids: List[int], token_sets: List[Set[str]],
+                 chunk_size: int = 10000):
+        """Index many word sets, computing signatures and keys in bulk"""
+        key_chunks = []
+        for start in range(0, len(token_sets), chunk_size):
+            signatures = self.signatures(token_sets[start:start + chunk_size])
+            key_chunks.append(self.band_keys(signatures))
+        if not key_chunks:
+            return
+        keys = np.concatenate(key_chunks)
+        ids = np.asarray(item_ids, dtype=np.uint32)
+
+        for band in range(self.bands):
+            band_keys = np.concatenate([self._sorted_keys[band], keys[:, band]])
+            band_ids = np.concatenate([self._sorted_ids[band], ids])
+            order = np.argsort(band_keys, kind='stable')
+            self._sorted_keys[band] = band_keys[order]
+            self._sorted_ids[band] = band_ids[order]
+
+    def query(self, tokens: Set[str]) -> Set[int]:
+        """Return ids of indexed sets that collide with tokens in any band"""
+        if not tokens:
+            return set()
+        keys = self.band_keys(self.signature(tokens)[None, :])[0]
+        candidates: Set[int] = set()
+        for band, key in enumerate(keys):
+            sorted_keys = self._sorted_keys[band]
+            if len(sorted_keys):
+                lo = np.searchsorted(sorted_keys, key, side='left')
+                hi = np.searchsorted(sorted_keys, key, side='right')
+                if hi > lo:
+                    candidates.update(self._sorted_ids[band][lo:hi].tolist())
+            bucket = self.buckets[band].get(int(key))
+            if bucket:
+                candidates.update(bucket)
+        return candidates
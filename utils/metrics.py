@@ -0,0 +1,335 @@
+"""Low-overhead process metrics in the Prometheus text format.
+
+Counters and histograms are plain in-process structures updated under a
+per-metric lock; nothing is sent anywhere until /metrics is scraped.
+Values that other components already count (cache hits, queue sizes) are
+read at scrape time through collectors instead of being mirrored:
+
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests', ['route'])
+    requests.inc(route='/api/chat')
+    registry.collector(lambda: [('app_queue_size', 'gauge', 'Queued jobs', [({}, 3)])])
+    text = registry.render()
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000, 50000)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _labels(self, key: Tuple) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        self._edges = np.array(self.buckets, dtype=np.float64)
+        # label key -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def _series(self, key: Tuple) -> list:
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        return series
+
+    def observe(self, value: float, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = self._key(labels)
+        with self._lock:
+            series = self._series(key)
+            series[0][index] += 1
+            series[1] += value
+
+    def observe_many(self, values, **labels):
+        """Observe an array of values at once, e.g. per-query counts of a batch"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        counts = np.bincount(np.searchsorted(self._edges, values, side='left'),
+                             minlength=len(self.buckets) + 1)
+        key = self._key(labels)
+        with self._lock:
+            series = self._series(key)
+            series[0] = [a + int(b) for a, b in zip(series[0], counts)]
+            series[1] += float(values.sum())
+
+    def time(self, **labels) -> '_Timer':
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', {**labels, 'le': _format_value(float(bound))},
+                                cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Collector):
+        """Add fn() -> [(name, type, help, [(labels, value)])], called on every scrape"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        for metric in self._metrics:
+            family(metric.name, metric.kind, metric.help, metric.samples())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                lines.append(f"# collector error: {str(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                family(name, kind, help_text, [(name, labels, value) for labels, value in samples])
+        return '\n'.join(lines) + '\n'
+
+
+class EngineMetrics:
+    """Engine timers and counters; labelled(name) gives what engine.metrics expects"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.train_seconds = registry.histogram(
+            'engine_train_seconds', 'Time per train or train_batch call', ['engine'])
+        self.trained = registry.counter(
+            'engine_trained_samples_total', 'Samples trained', ['engine'])
+        self.match_seconds = registry.histogram(
+            'engine_match_seconds', 'Time per pattern match call, single or batched', ['engine'])
+        self.queries = registry.counter(
+            'engine_match_queries_total', 'Inputs matched against pattern memory', ['engine'])
+        self.candidates = registry.histogram(
+            'engine_match_candidates', 'Candidate patterns scored per input', ['engine'],
+            buckets=COUNT_BUCKETS)
+
+    def labelled(self, engine: str) -> 'EngineRecorder':
+        return EngineRecorder(self, engine)
+
+
+class EngineRecorder:
+    __slots__ = ('metrics', 'engine')
+
+    def __init__(self, metrics: EngineMetrics, engine: str):
+        self.metrics = metrics
+        self.engine = engine
+
+    def observe_train(self, samples: int, seconds: float):
+        self.metrics.train_seconds.observe(seconds, engine=self.engine)
+        self.metrics.trained.inc(samples, engine=self.engine)
+
+    def observe_match(self, candidates, seconds: float):
+        """candidates: the candidate count of each input matched in this call"""
+        self.metrics.match_seconds.observe(seconds, engine=self.engine)
+        self.metrics.queries.inc(len(candidates), engine=self.engine)
+        self.metrics.candidates.observe_many(candidates, engine=self.engine)
+
+
+class _QueryStats(threading.local):
+    active = False
+    count = 0
+    seconds = 0.0
+
+
+def instrument_flask(app, registry: MetricsRegistry, sql: bool = True):
+    """Per-route latency, plus SQL query count and time per request.
+
+    Routes are labelled by their URL rule, not the concrete path, to keep
+    the number of series bounded. Streamed responses are recorded when the
+    server closes them, so their latency covers sending the whole body.
+    With sql, every cursor execution of any SQLAlchemy engine is timed: in
+    total, and attributed to the request running on the same thread.
+    """
+    latency = registry.histogram('http_request_duration_seconds', 'Request latency',
+                                 ['method', 'route', 'status'])
+    request_queries = registry.histogram('http_request_db_queries', 'SQL queries per request',
+                                         ['route'], buckets=COUNT_BUCKETS)
+    request_query_seconds = registry.histogram('http_request_db_seconds',
+                                               'SQL time per request', ['route'])
+    query_seconds = registry.histogram('db_query_duration_seconds', 'SQL statement time')
+    query_errors = registry.counter('db_query_errors_total', 'SQL statements that raised')
+    query_stats = _QueryStats()
+
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g._metrics_start = time.perf_counter()
+        query_stats.active = True
+        query_stats.count = 0
+        query_stats.seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            query_stats.active = False
+            return response
+        method = request.method
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = response.status_code
+
+        def record():
+            latency.observe(time.perf_counter() - start, method=method, route=route, status=status)
+            if sql:
+                request_queries.observe(query_stats.count, route=route)
+                request_query_seconds.observe(query_stats.seconds, route=route)
+            query_stats.active = False
+
+        if response.is_streamed:
+            # The body (and any queries it runs) is produced after this hook
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+    if sql:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        def finish(conn, context):
+            # Starts are stacked per connection with their execution context,
+            # so a statement that fails is popped and never mis-times the next
+            starts = conn.info.get('_metrics_start')
+            if not starts or starts[-1][0] is not context:
+                return
+            elapsed = time.perf_counter() - starts.pop()[1]
+            query_seconds.observe(elapsed)
+            if query_stats.active:
+                query_stats.count += 1
+                query_stats.seconds += elapsed
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_metrics_start', []).append((context, time.perf_counter()))
+
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            finish(conn, context)
+
+        @event.listens_for(Engine, 'handle_error')
+        def execute_failed(exception_context):
+            if exception_context.connection is None:
+                return
+            starts = exception_context.connection.info.get('_metrics_start')
+            if starts and starts[-1][0] is exception_context.execution_context:
+                query_errors.inc()
+                finish(exception_context.connection, exception_context.execution_context)
+
+
+def instrument_socketio(socketio, registry: MetricsRegistry):
+    """Count emits by event name; covers flask_socketio.emit() in handlers too"""
+    emits = registry.counter('socketio_emits_total', 'Socket.IO events emitted', ['event'])
+    original = socketio.emit
+
+    def emit(event, *args, **kwargs):
+        emits.inc(event=event)
+        return original(event, *args, **kwargs)
+
+    socketio.emit = emit
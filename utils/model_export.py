@@ -0,0 +1,138 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+EXPORT_FORMATS = ('json', 'msgpack')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+CHUNK_SIZE = 64 * 1024
+
+
+def export_etag(model, export_format: str, compression: str) -> str:
+    """Hash of everything an export's content depends on.
+
+    Rows are only written through attribute assignment, which bumps
+    updated_at, so the update times stand in for the content without
+    reading any heavy column.
+    """
+    parts = [export_format, compression, model.id, model.updated_at]
+    parts.extend((ds.id, ds.updated_at, ds.row_count) for ds in model.datasets)
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def _export_metadata(export_format: str):
+    return {
+        'export_date': datetime.utcnow().isoformat(),
+        'format_version': '1.0',
+        'encoding': export_format
+    }
+
+
+def _buffered(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Join small string chunks into CHUNK_SIZE byte blocks"""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_export_json(model) -> Iterator[bytes]:
+    """Stream serialize_state()'s document as compact JSON, dataset rows included"""
+    def chunks():
+        info = model.to_dict(fields=type(model).SUMMARY_FIELDS + ('state',))
+        # Metadata first, so streaming importers can validate before writing
+        yield '{"metadata": ' + json.dumps(_export_metadata('json'))
+        yield ', "model_info": ' + json.dumps(info)[:-1] + ', "datasets": ['
+        for i, dataset in enumerate(model.datasets):
+            header = json.dumps(dataset.to_dict(type(dataset).SUMMARY_FIELDS))
+            yield ('' if i == 0 else ', ') + header[:-1] + ', "data": '
+            if dataset.uses_legacy_data:
+                yield json.dumps(dataset.data)
+            else:
+                yield '['
+                for j, content in enumerate(dataset.iter_raw_rows()):
+                    yield content if j == 0 else ', ' + content
+                yield ']'
+            yield '}'
+        yield ']}}'
+
+    return _buffered(chunks())
+
+
+def iter_export_msgpack(model) -> Iterator[bytes]:
+    """Stream the same document as MessagePack"""
+    import msgpack
+
+    packer = msgpack.Packer()
+    info = model.to_dict(fields=type(model).SUMMARY_FIELDS + ('state',))
+    datasets = list(model.datasets)
+
+    yield packer.pack_map_header(2) + packer.pack('metadata') + packer.pack(_export_metadata('msgpack'))
+    yield packer.pack('model_info') + packer.pack_map_header(len(info) + 1)
+    for key, value in info.items():
+        yield packer.pack(key) + packer.pack(value)
+    yield packer.pack('datasets') + packer.pack_array_header(len(datasets))
+    for dataset in datasets:
+        header = dataset.to_dict(type(dataset).SUMMARY_FIELDS)
+        chunk = [packer.pack_map_header(len(header) + 1)]
+        for key, value in header.items():
+            chunk.append(packer.pack(key) + packer.pack(value))
+        chunk.append(packer.pack('data'))
+        if dataset.uses_legacy_data:
+            yield b''.join(chunk) + packer.pack(dataset.data)
+            continue
+        yield b''.join(chunk) + packer.pack_array_header(dataset.row_count)
+        buffer = []
+        for row in dataset.iter_rows():
+            buffer.append(packer.pack(row))
+            if len(buffer) >= 1000:
+                yield b''.join(buffer)
+                buffer = []
+        if buffer:
+            yield b''.join(buffer)
+
+
+def compress_stream(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    """Compress a byte stream incrementally with gzip or zstd"""
+    if compression == 'none':
+        yield from chunks
+        return
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    else:
+        import zstandard
+        compressor = zstandard.ZstdCompressor().compressobj()
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def check_export_options(export_format: str, compression: str):
+    """Raise ValueError for unknown options or a missing optional package"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {export_format}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    optional = {'msgpack': export_format == 'msgpack', 'zstandard': compression == 'zstd'}
+    for package, needed in optional.items():
+        if needed:
+            try:
+                __import__(package)
+            except ImportError:
+                raise ValueError(f"{package} is not installed on this server")
+
+
+def export_filename(model, export_format: str, compression: str) -> str:
+    name = f"{model.name.lower().replace(' ', '_')}_v{model.version}.{export_format}"
+    return name + {'none': '', 'gzip': '.gz', 'zstd': '.zst'}[compression]
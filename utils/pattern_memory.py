@@ -0,0 +1,121 @@
+"""Compact storage for an AIEngine's learned patterns.
+
+Pattern keys get integer IDs in insertion order, the same IDs the engine's
+token index uses. Confidences live in one array('d') indexed by pattern
+ID. Response strings are interned once in a shared table, and each pattern
+keeps the IDs of its responses. Most patterns have a single response, so
+the first response ID of every pattern is kept in a flat array('I') and
+only patterns with more get an extra array. Repeated responses keep their
+repeats, so random.choice() over responses() weights them as before.
+"""
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+NO_RESPONSE = 0xFFFFFFFF
+
+
+class PatternMemory:
+    def __init__(self):
+        self.keys: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.confidences = array('d')
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        self.first_response = array('I')
+        self.more_responses: Dict[int, array] = {}
+        # Pattern-response entries across all patterns, repeats included
+        self.entry_count = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    def _intern(self, text: str) -> int:
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add_pattern(self, key: str, confidence: float = 0.0) -> int:
+        """Register key without responses; returns its pattern ID"""
+        pattern_id = self.ids.get(key)
+        if pattern_id is None:
+            pattern_id = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.confidences.append(confidence)
+            self.first_response.append(NO_RESPONSE)
+        return pattern_id
+
+    def add(self, key: str, response: str, confidence: float) -> Tuple[int, bool]:
+        """Append a response to key, raising its confidence to at least confidence.
+
+        Returns the pattern ID and whether the pattern is new.
+        """
+        created = key not in self.ids
+        pattern_id = self.add_pattern(key)
+        self.add_response(pattern_id, response)
+        self.confidences[pattern_id] = max(confidence, self.confidences[pattern_id])
+        return pattern_id, created
+
+    def add_response(self, pattern_id: int, response: str):
+        string_id = self._intern(response)
+        if self.first_response[pattern_id] == NO_RESPONSE:
+            self.first_response[pattern_id] = string_id
+        else:
+            more = self.more_responses.get(pattern_id)
+            if more is None:
+                more = self.more_responses[pattern_id] = array('I')
+            more.append(string_id)
+        self.entry_count += 1
+
+    def responses(self, pattern_id: int) -> List[str]:
+        first = self.first_response[pattern_id]
+        if first == NO_RESPONSE:
+            return []
+        strings = self.strings
+        responses = [strings[first]]
+        more = self.more_responses.get(pattern_id)
+        if more is not None:
+            responses.extend(strings[i] for i in more)
+        return responses
+
+    def confidence(self, key: str) -> float:
+        pattern_id = self.ids.get(key)
+        return 0.0 if pattern_id is None else self.confidences[pattern_id]
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:
+        for pattern_id, key in enumerate(self.keys):
+            yield key, self.responses(pattern_id)
+
+    def snapshot(self) -> 'PatternMemory':
+        """Copy of what to_dicts() reads, without the lookup dicts.
+
+        Flat lists and arrays copy at memcpy speed, so this is cheap to take
+        inside a training step; to_dicts() on the copy can then run anywhere.
+        """
+        copy = PatternMemory()
+        copy.keys = self.keys[:]
+        copy.confidences = array('d', self.confidences)
+        copy.strings = self.strings[:]
+        copy.first_response = array('I', self.first_response)
+        copy.more_responses = {pattern_id: array('I', more)
+                               for pattern_id, more in self.more_responses.items()}
+        copy.entry_count = self.entry_count
+        return copy
+
+    def to_dicts(self) -> Tuple[Dict[str, List[str]], Dict[str, float]]:
+        """The {key: responses} and {key: confidence} form saved in engine state"""
+        return dict(self.items()), dict(zip(self.keys, self.confidences))
+
+    @classmethod
+    def from_dicts(cls, patterns: Dict[str, List[str]],
+                   confidence_scores: Dict[str, float]) -> 'PatternMemory':
+        memory = cls()
+        for key, responses in patterns.items():
+            pattern_id = memory.add_pattern(key, confidence_scores.get(key, 0))
+            for response in responses:
+                memory.add_response(pattern_id, response)
+        return memory
@@ -0,0 +1,207 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.ai_engine import AIEngine
+
+_SNAPSHOT_RE = re.compile(r'^snapshot-(\d+)\.json$')
+_WAL_RE = re.compile(r'^wal-(\d+)\.log$')
+REPLAY_BATCH_SIZE = 10000
+
+
+class EngineStore:
+    """Durable AIEngine memory: a write-ahead log of training pairs plus snapshots.
+
+    Generation N consists of snapshot-N.json (engine state before any pair
+    in wal-N.log) and wal-N.log. Training is deterministic, so loading the
+    latest snapshot and replaying its WAL through train_batch restores the
+    exact engine. The engine logs each step before changing its memory, and
+    every append is flushed to the OS, so a killed process loses nothing it
+    has trained on. With fsync=True the WAL is also synced every
+    `sync_every` records, which bounds what a power loss can take.
+
+    Once snapshot_every records have been logged, the next training step
+    first captures a flat copy of the engine and starts the next WAL; the
+    snapshot is serialized and synced on a background thread. Until it is
+    on disk, load() replays both WALs from the previous one.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 100000,
+                 sync_every: int = 1000, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sync_every = sync_every
+        self.fsync = fsync
+        self.engine: Optional[AIEngine] = None
+        self.generation = 0
+        self._wal = None
+        self._unsynced = 0
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self.snapshots_written = 0
+        self.last_snapshot_seconds: Optional[float] = None
+        self.last_snapshot_error: Optional[str] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind: str, generation: int) -> str:
+        suffix = 'json' if kind == 'snapshot' else 'log'
+        return os.path.join(self.directory, f"{kind}-{generation}.{suffix}")
+
+    def _generations(self, pattern) -> List[int]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def load(self, **engine_kwargs) -> AIEngine:
+        """Restore the engine from the latest snapshot plus its WAL tail"""
+        snapshots = self._generations(_SNAPSHOT_RE)
+        state = None
+        if snapshots:
+            self.generation = snapshots[-1]
+            with open(self._path('snapshot', self.generation), encoding='utf-8') as f:
+                state = json.load(f)
+        else:
+            wals = self._generations(_WAL_RE)
+            self.generation = wals[0] if wals else 0
+
+        engine = AIEngine.from_state(state, **engine_kwargs)
+        self._since_snapshot = self._replay(engine)
+
+        self.engine = engine
+        self._wal = open(self._path('wal', self.generation), 'a', encoding='utf-8')
+        engine.training_log = self.append
+        return engine
+
+    def _replay(self, engine: AIEngine) -> int:
+        """Re-train every WAL record from the current generation on"""
+        replayed = 0
+        for generation in self._generations(_WAL_RE):
+            if generation < self.generation:
+                continue
+            batch: List[Tuple[str, str]] = []
+            path = self._path('wal', generation)
+            valid_bytes = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        input_text, expected_output = json.loads(line)
+                    except ValueError:
+                        # Torn final record from a crash mid-write: cut it off
+                        # so later appends start on a clean line
+                        os.truncate(path, valid_bytes)
+                        break
+                    valid_bytes += len(line)
+                    batch.append((input_text, expected_output))
+                    if len(batch) >= REPLAY_BATCH_SIZE:
+                        engine.train_batch(batch)
+                        replayed += len(batch)
+                        batch = []
+            if batch:
+                engine.train_batch(batch)
+                replayed += len(batch)
+            self.generation = generation
+        return replayed
+
+    def append(self, pairs: List[Tuple[str, str]]):
+        """Log pairs; called by the engine before each training step changes memory"""
+        with self._lock:
+            if self._since_snapshot >= self.snapshot_every and not self._snapshot_running():
+                # Every logged pair is in the engine and these are not yet,
+                # so the copy matches the start of the next WAL
+                generation, build_state = self._rotate()
+                self._snapshot_thread = threading.Thread(
+                    target=self._write_snapshot, args=(generation, build_state),
+                    name='engine-snapshot', daemon=True)
+                self._snapshot_thread.start()
+            self._wal.write(''.join(
+                json.dumps([input_text, expected_output], ensure_ascii=False) + '\n'
+                for input_text, expected_output in pairs
+            ))
+            # Hand each record to the OS, which keeps it if the process dies
+            self._wal.flush()
+            self._unsynced += len(pairs)
+            self._since_snapshot += len(pairs)
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def _sync(self):
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+        self._unsynced = 0
+
+    def _snapshot_running(self) -> bool:
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def _wait_for_snapshot(self):
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+
+    def _rotate(self) -> Tuple[int, Callable[[], Dict]]:
+        """Capture the engine and start the next WAL generation; needs the lock"""
+        self._sync()
+        build_state = self.engine.state_snapshot()
+        next_generation = self.generation + 1
+        self._wal.close()
+        self._wal = open(self._path('wal', next_generation), 'a', encoding='utf-8')
+        self.generation = next_generation
+        self._since_snapshot = 0
+        return next_generation, build_state
+
+    def _write_snapshot(self, generation: int, build_state: Callable[[], Dict]):
+        """Write snapshot-<generation> and drop the generations it covers"""
+        start = time.perf_counter()
+        try:
+            path = self._path('snapshot', generation)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(build_state(), f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+
+            # Older generations are fully covered by the new snapshot
+            for kind, pattern in (('snapshot', _SNAPSHOT_RE), ('wal', _WAL_RE)):
+                for older in self._generations(pattern):
+                    if older < generation:
+                        os.remove(self._path(kind, older))
+        except Exception as e:
+            # The previous snapshot and the WALs since still restore the engine
+            self.last_snapshot_error = str(e)
+            return
+        self.last_snapshot_error = None
+        self.last_snapshot_seconds = time.perf_counter() - start
+        self.snapshots_written += 1
+
+    def snapshot(self):
+        """Write the full engine state and start a new WAL generation, waiting for it"""
+        self._wait_for_snapshot()
+        with self._lock:
+            generation, build_state = self._rotate()
+        self._write_snapshot(generation, build_state)
+
+    def close(self):
+        self._wait_for_snapshot()
+        with self._lock:
+            if self._wal is not None:
+                self._sync()
+                self._wal.close()
+                self._wal = None
+
+    def stats(self) -> Dict:
+        return {
+            'generation': self.generation,
+            'records_since_snapshot': self._since_snapshot,
+            'unsynced_records': self._unsynced,
+            'snapshot_running': self._snapshot_running(),
+            'snapshots_written': self.snapshots_written,
+            'last_snapshot_seconds': self.last_snapshot_seconds,
+            'last_snapshot_error': self.last_snapshot_error
+        }
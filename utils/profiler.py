@@ -0,0 +1,105 @@
+"""A sampling profiler that can be switched on in a live process.
+
+A background thread snapshots every other thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks.
+Nothing is traced between samples, so the cost is one stack walk per
+thread per interval and only while the profiler runs. Results use the
+folded format ("outer;inner;leaf count" per line) that flamegraph.pl,
+speedscope and similar tools read.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+class SamplingProfiler:
+    def __init__(self, max_stacks: int = 20000):
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.samples = 0
+        self.dropped = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01, duration: Optional[float] = None) -> bool:
+        """Clear previous samples and start sampling; returns False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.dropped = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,),
+                                            name='sampling-profiler', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self, duration: Optional[float]):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = self._fold(frame, names.get(thread_id, str(thread_id)))
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self.dropped += 1
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _fold(frame, thread_name: str) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        # Per-request threads are numbered; fold them into one root
+        parts.append(re.sub(r'-\d+', '', thread_name))
+        return ';'.join(reversed(parts))
+
+    def folded(self) -> str:
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'samples': self.samples,
+                'stacks': len(self._stacks),
+                'dropped': self.dropped,
+                'started_at': self.started_at,
+                'stopped_at': self.stopped_at
+            }
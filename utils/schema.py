@@ -0,0 +1,117 @@
+"""Bring tables created by an older release up to the current models.
+
+db.create_all() creates missing tables but never alters existing ones.
+upgrade_schema() compares each existing table with its model and adds
+missing columns and indexes, and drops NOT NULL from columns the model
+now allows to be null. SQLite cannot change a column's constraints, so
+there the table is rebuilt from the model and its rows copied over.
+Every step is planned from the live schema, so running it on each start
+does nothing once the database is current.
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.exc import DBAPIError
+
+Step = Tuple[str, Callable]
+
+
+def upgrade_schema(engine, metadata: MetaData) -> List[str]:
+    """Apply the pending steps; returns their descriptions"""
+    applied = []
+    for description, step in _plan(engine, metadata):
+        try:
+            with engine.begin() as connection:
+                step(connection)
+        except DBAPIError:
+            # Another process starting at the same time may have done it first
+            if description in (d for d, _ in _plan(engine, metadata)):
+                raise
+            continue
+        applied.append(description)
+    return applied
+
+
+def _plan(engine, metadata: MetaData) -> List[Step]:
+    inspector = inspect(engine)
+    steps: List[Step] = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name']: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f"{table.name}.{column.name} is NOT NULL without a "
+                                       f"server default and needs a manual migration")
+                steps.append((f"add column {table.name}.{column.name}", _add_column(table, column)))
+        relaxed = [column.name for column in table.columns
+                   if column.name in existing and column.nullable and not column.primary_key
+                   and not existing[column.name]['nullable']]
+        if relaxed:
+            steps.append((f"drop NOT NULL on {table.name}.{', '.join(relaxed)}",
+                          _drop_not_null(table, relaxed, list(existing))))
+            if engine.dialect.name == 'sqlite':
+                # The rebuild creates every index of the table
+                continue
+        index_names = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in index_names:
+                steps.append((f"create index {index.name}", index.create))
+    return steps
+
+
+def _add_column(table, column) -> Callable:
+    def step(connection):
+        preparer = connection.dialect.identifier_preparer
+        column_type = column.type.compile(dialect=connection.dialect)
+        sql = (f"ALTER TABLE {preparer.format_table(table)} "
+               f"ADD COLUMN {preparer.format_column(column)} {column_type}")
+        if column.server_default is not None:
+            sql += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            sql += " NOT NULL"
+        connection.exec_driver_sql(sql)
+    return step
+
+
+def _drop_not_null(table, names: List[str], existing: List[str]) -> Callable:
+    def step(connection):
+        if connection.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(connection, table, existing)
+            return
+        preparer = connection.dialect.identifier_preparer
+        for name in names:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ALTER COLUMN {preparer.format_column(table.c[name])} DROP NOT NULL")
+    return step
+
+
+def _rebuild_sqlite_table(connection, table, existing: List[str]):
+    """Copy table into a new one built from the model, then swap the names.
+
+    Renaming the new table into place, rather than the old one out of the
+    way, keeps other tables' foreign keys pointing at the right name.
+    """
+    preparer = connection.dialect.identifier_preparer
+    scratch = MetaData()
+    # Foreign keys of the copy resolve against copies of the tables they name
+    for foreign_key in table.foreign_keys:
+        if foreign_key.column.table.name not in scratch.tables:
+            foreign_key.column.table.to_metadata(scratch)
+    rebuilt = table.to_metadata(scratch, name=f"_{table.name}_upgrade")
+    # Index names are unique per database; they are created after the swap
+    rebuilt.indexes.clear()
+    # Left over if an earlier attempt was interrupted
+    rebuilt.drop(connection, checkfirst=True)
+    rebuilt.create(connection)
+    columns = ', '.join(preparer.quote(name) for name in existing if name in table.c)
+    connection.exec_driver_sql(
+        f"INSERT INTO {preparer.format_table(rebuilt)} ({columns}) "
+        f"SELECT {columns} FROM {preparer.format_table(table)}")
+    connection.exec_driver_sql(f"DROP TABLE {preparer.format_table(table)}")
+    connection.exec_driver_sql(
+        f"ALTER TABLE {preparer.format_table(rebuilt)} RENAME TO {preparer.format_table(table)}")
+    for index in table.indexes:
+        index.create(connection)
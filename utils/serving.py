@@ -0,0 +1,160 @@
+"""Building blocks for the chat serving path: request micro-batching and a
+response cache tied to engine memory versions."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class _Pending:
+    __slots__ = ('item', 'done', 'result', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Group concurrent submit() calls into batches for one process_batch call.
+
+    A single worker thread takes the first waiting item, keeps collecting
+    until max_batch items or max_wait seconds have passed, then runs
+    process_batch(items), which must return one result per item.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch: int = 64, max_wait: float = 0.002):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: List[_Pending] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item, timeout: Optional[float] = 30.0):
+        pending = _Pending(item)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='micro-batcher', daemon=True)
+                self._thread.start()
+            self._queue.append(pending)
+            self._condition.notify()
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for a batch result")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            try:
+                results = self.process_batch([pending.item for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            self.batches += 1
+            self.items += len(batch)
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0
+        }
+
+
+class VersionedCache:
+    """LRU cache whose entries are only valid for the version they were stored at.
+
+    Versions are per namespace (e.g. one per engine) and must increase over
+    time: AIEngine.version_token qualifies, a bare memory_version does not,
+    as it restarts with each reloaded engine. A lookup or store at a newer
+    version drops the namespace's entries in one step; lookups at an older
+    version miss and stores at one are ignored, so a slow request cannot
+    bring back a version that has been replaced.
+
+    The size bound evicts from the least recently used namespace first.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # namespace -> (version, LRU of key -> value), least recently used first
+        self._namespaces: 'OrderedDict[Hashable, Tuple[Any, OrderedDict]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: Hashable, key: Hashable, version: Any):
+        with self._lock:
+            entries = self._entries_at(namespace, version)
+            entry = entries.get(key) if entries is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, namespace: Hashable, key: Hashable, version: Any, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entries = self._entries_at(namespace, version)
+            if entries is None:
+                return
+            if key not in entries:
+                self._size += 1
+            entries[key] = value
+            entries.move_to_end(key)
+            while self._size > self.max_entries:
+                oldest, (_, evicting) = next(iter(self._namespaces.items()))
+                evicting.popitem(last=False)
+                self._size -= 1
+                if not evicting:
+                    del self._namespaces[oldest]
+
+    def _entries_at(self, namespace: Hashable, version: Any) -> Optional[OrderedDict]:
+        """The namespace's entries if version is current, None if it is older"""
+        current = self._namespaces.get(namespace)
+        if current is not None:
+            if current[0] == version:
+                self._namespaces.move_to_end(namespace)
+                return current[1]
+            if version < current[0]:
+                return None
+            self._size -= len(current[1])
+        entries = OrderedDict()
+        self._namespaces[namespace] = (version, entries)
+        self._namespaces.move_to_end(namespace)
+        return entries
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
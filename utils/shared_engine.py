@@ -0,0 +1,349 @@
+"""Share one AIEngine's pattern memory across server worker processes.
+
+A single owner process holds the real engine and its EngineStore. It
+accepts training batches over a multiprocessing connection and
+periodically publishes an immutable pattern index file, swapped in with an
+atomic rename. Workers answer chat requests straight from a read-only
+memory map of the latest file, so N workers share one copy of the memory
+through the page cache. If the owner dies, workers keep answering from the
+last published file; training fails until the owner is back.
+
+Run the owner with:
+
+    python -m utils.shared_engine --data-dir data/engine \
+        --address /tmp/ai-engine.sock --index data/engine/patterns.idx
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.pattern_memory import PatternMemory
+
+_MAGIC = b'AIIDX001'
+# magic, version, pattern count, token count, then (offset, length) of each section
+_SECTIONS = (
+    'token_hashes', 'token_offsets', 'token_blob', 'posting_offsets', 'postings',
+    'pattern_sizes', 'confidences', 'key_offsets', 'key_blob',
+    'response_ranges', 'response_offsets', 'response_blob'
+)
+_HEADER = struct.Struct('<8sQQQ' + 'QQ' * len(_SECTIONS))
+
+
+def token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _blob(strings: List[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b''.join(encoded)
+
+
+def write_index(patterns: PatternMemory, path: str, version: int):
+    """Publish patterns as an index file, replacing path atomically.
+
+    Takes a PatternMemory.snapshot() rather than the engine: the token
+    index and pattern sizes are rebuilt here from the keys, the same way
+    AIEngine.rebuild_index does, so nothing is read from the live engine.
+    """
+    keys = patterns.keys
+
+    token_index: Dict[str, List[int]] = {}
+    pattern_sizes = np.empty(len(keys), dtype=np.uint32)
+    for pattern_id, key in enumerate(keys):
+        words = set(key.lower().split())
+        pattern_sizes[pattern_id] = len(words)
+        for word in words:
+            ids = token_index.get(word)
+            if ids is None:
+                token_index[word] = [pattern_id]
+            else:
+                ids.append(pattern_id)
+
+    tokens = list(token_index)
+    hashes = np.array([token_hash(t) for t in tokens], dtype=np.uint64)
+    order = np.argsort(hashes, kind='stable')
+    tokens = [tokens[i] for i in order]
+    token_offsets, token_blob = _blob(tokens)
+    posting_lists = [np.array(token_index[t], dtype=np.uint32) for t in tokens]
+    posting_offsets = np.zeros(len(tokens) + 1, dtype=np.uint64)
+    np.cumsum([len(p) for p in posting_lists], out=posting_offsets[1:])
+
+    responses = [patterns.responses(i) for i in range(len(keys))]
+    response_ranges = np.zeros(len(keys) + 1, dtype=np.uint64)
+    np.cumsum([len(r) for r in responses], out=response_ranges[1:])
+    key_offsets, key_blob = _blob(keys)
+    response_offsets, response_blob = _blob([r for rs in responses for r in rs])
+
+    sections = {
+        'token_hashes': hashes[order].tobytes(),
+        'token_offsets': token_offsets.tobytes(),
+        'token_blob': token_blob,
+        'posting_offsets': posting_offsets.tobytes(),
+        'postings': (np.concatenate(posting_lists) if posting_lists
+                     else np.empty(0, dtype=np.uint32)).tobytes(),
+        'pattern_sizes': pattern_sizes.tobytes(),
+        'confidences': np.array(patterns.confidences, dtype=np.float64).tobytes(),
+        'key_offsets': key_offsets.tobytes(),
+        'key_blob': key_blob,
+        'response_ranges': response_ranges.tobytes(),
+        'response_offsets': response_offsets.tobytes(),
+        'response_blob': response_blob,
+    }
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        layout = []
+        for name in _SECTIONS:
+            # Keep every section 8-byte aligned for zero-copy NumPy views
+            f.write(b'\0' * (-f.tell() % 8))
+            layout.extend((f.tell(), len(sections[name])))
+            f.write(sections[name])
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, version, len(keys), len(tokens), *layout))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class PatternIndexReader:
+    """Read-only, zero-copy view of a published pattern index.
+
+    Scoring follows AIEngine._find_best_match exactly: Jaccard from shared
+    token counts times confidence, first pattern wins ties.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = _HEADER.unpack_from(self._map, 0)
+        if fields[0] != _MAGIC:
+            raise ValueError(f"{path} is not a pattern index file")
+        self.version, self.pattern_count, self.token_count = fields[1:4]
+        layout = fields[4:]
+        dtypes = {
+            'token_hashes': np.uint64, 'token_offsets': np.uint64, 'posting_offsets': np.uint64,
+            'postings': np.uint32, 'pattern_sizes': np.uint32, 'confidences': np.float64,
+            'key_offsets': np.uint64, 'response_ranges': np.uint64, 'response_offsets': np.uint64,
+        }
+        view = memoryview(self._map)
+        for i, name in enumerate(_SECTIONS):
+            offset, length = layout[2 * i], layout[2 * i + 1]
+            section = view[offset:offset + length]
+            if name in dtypes:
+                section = np.frombuffer(section, dtype=dtypes[name])
+            setattr(self, name, section)
+
+    def same_file(self, stat: os.stat_result) -> bool:
+        return (stat.st_ino, stat.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    @staticmethod
+    def _string(offsets: np.ndarray, blob, i: int) -> str:
+        return bytes(blob[int(offsets[i]):int(offsets[i + 1])]).decode('utf-8')
+
+    def _postings(self, token: str) -> Optional[np.ndarray]:
+        h = np.uint64(token_hash(token))
+        i = int(np.searchsorted(self.token_hashes, h))
+        while i < self.token_count and self.token_hashes[i] == h:
+            if self._string(self.token_offsets, self.token_blob, i) == token:
+                return self.postings[int(self.posting_offsets[i]):int(self.posting_offsets[i + 1])]
+            i += 1
+        return None
+
+    def find_best_match(self, input_text: str) -> Tuple[Optional[int], float]:
+        words = set(input_text.lower().split())
+        postings = [p for p in (self._postings(w) for w in words) if p is not None and len(p)]
+        if not postings:
+            return None, 0
+        # np.unique sorts ids, i.e. insertion order, so argmax keeps first-wins ties
+        ids, shared = np.unique(np.concatenate(postings), return_counts=True)
+        union = len(words) + self.pattern_sizes[ids].astype(np.int64) - shared
+        scores = (shared / union) * self.confidences[ids]
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None, 0
+        return int(ids[best]), float(scores[best])
+
+    def pattern(self, pattern_id: int) -> str:
+        return self._string(self.key_offsets, self.key_blob, pattern_id)
+
+    def responses(self, pattern_id: int) -> List[str]:
+        start, end = int(self.response_ranges[pattern_id]), int(self.response_ranges[pattern_id + 1])
+        return [self._string(self.response_offsets, self.response_blob, i) for i in range(start, end)]
+
+
+class SharedEngineClient:
+    """Worker-side stand-in for AIEngine in multi-process mode.
+
+    Reads come from the owner's published index file, re-opened whenever a
+    newer one has been swapped in. Training is forwarded to the owner and
+    raises RuntimeError while it cannot be reached; reads carry on from the
+    last index opened.
+    """
+
+    def __init__(self, address: str, index_path: str, authkey: bytes,
+                 refresh_interval: float = 0.5, min_confidence_threshold: float = 0.6):
+        self.address = address
+        self.index_path = index_path
+        self.authkey = authkey
+        self.refresh_interval = refresh_interval
+        self.min_confidence_threshold = min_confidence_threshold
+        self.current_level = 1
+        # Mirrors the owner's level stats as of the last training reply
+        self.memory = {'level_stats': {}}
+        self._reader: Optional[PatternIndexReader] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _call(self, *message):
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send(message)
+                reply = conn.recv()
+        except (OSError, EOFError) as e:
+            raise RuntimeError(f"Engine owner at {self.address} is not reachable: {e}")
+        if reply[0] == 'error':
+            raise RuntimeError(reply[1])
+        return reply[1]
+
+    def reader(self) -> Optional[PatternIndexReader]:
+        """Return the current index, checking for a newer one at most every refresh_interval"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.refresh_interval:
+            with self._lock:
+                self._checked_at = now
+                try:
+                    stat = os.stat(self.index_path)
+                except FileNotFoundError:
+                    return self._reader
+                if self._reader is None or not self._reader.same_file(stat):
+                    self._reader = PatternIndexReader(self.index_path)
+        return self._reader
+
+    @property
+    def memory_version(self) -> int:
+        reader = self.reader()
+        return reader.version if reader else 0
+
+    def train_batch(self, pairs: List[Tuple[str, str]]) -> Tuple[List[float], str]:
+        result = self._call('train', list(pairs))
+        self.current_level = result['level']
+        self.memory = {'level_stats': result['level_stats']}
+        return result['scores'], result['message']
+
+    def train(self, input_text: str, expected_output: str) -> Tuple[float, str, Dict]:
+        scores, message = self.train_batch([(input_text, expected_output)])
+        return scores[0], message, {}
+
+    def generate_response(self, input_text: str) -> Tuple[str, float]:
+        reader = self.reader()
+        if reader is None or not reader.pattern_count:
+            return "I haven't learned enough patterns yet.", 0.1
+
+        best_match, best_score = reader.find_best_match(input_text)
+        if best_match is not None and best_score > self.min_confidence_threshold:
+            return random.choice(reader.responses(best_match)), best_score
+
+        return "I'm not sure how to respond to that.", max(0.3, best_score)
+
+
+class EngineOwner:
+    """The single writer: trains the engine and publishes index versions"""
+
+    def __init__(self, store, address: str, index_path: str, authkey: bytes,
+                 publish_interval: float = 1.0):
+        self.store = store
+        self.engine = store.load()
+        self.address = address
+        self.index_path = index_path
+        self.authkey = authkey
+        self.publish_interval = publish_interval
+        self.published_version = -1
+        # Training holds _lock; publishing holds it only to copy the patterns
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+    def publish(self):
+        """Write a new index file if memory changed since the last one"""
+        with self._publish_lock:
+            with self._lock:
+                version = self.engine.memory_version
+                if version == self.published_version:
+                    return
+                patterns = self.engine.patterns.snapshot()
+            write_index(patterns, self.index_path, version)
+            self.published_version = version
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.publish_interval)
+            self.publish()
+
+    def _handle(self, message):
+        if message[0] == 'train':
+            with self._lock:
+                scores, text = self.engine.train_batch(message[1])
+                return {
+                    'scores': scores,
+                    'message': text,
+                    'level': self.engine.current_level,
+                    'level_stats': dict(self.engine.memory['level_stats'])
+                }
+        raise ValueError(f"Unknown request: {message[0]}")
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                while True:
+                    message = conn.recv()
+                    try:
+                        conn.send(('ok', self._handle(message)))
+                    except Exception as e:
+                        conn.send(('error', str(e)))
+            except EOFError:
+                pass
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self.publish()
+        threading.Thread(target=self._publish_loop, daemon=True).start()
+        with Listener(self.address, authkey=self.authkey) as listener:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+
+def main():
+    from utils.persistence import EngineStore
+
+    parser = argparse.ArgumentParser(description="Run the shared AIEngine owner process")
+    parser.add_argument('--data-dir', default=os.environ.get('ENGINE_DATA_DIR', 'data/engine'))
+    parser.add_argument('--address', default=os.environ.get('ENGINE_OWNER_ADDRESS', '/tmp/ai-engine.sock'))
+    parser.add_argument('--index', default=os.environ.get('ENGINE_INDEX_PATH', 'data/engine/patterns.idx'))
+    parser.add_argument('--publish-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    authkey = os.environ.get('ENGINE_AUTHKEY', 'dev_key').encode()
+    owner = EngineOwner(EngineStore(args.data_dir), args.address, args.index, authkey,
+                        publish_interval=args.publish_interval)
+    try:
+        owner.serve_forever()
+    finally:
+        owner.store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Pull-style readers for walking large JSON or MessagePack documents.
+
+Both readers expose the same small interface so importers can descend into
+the parts of a document they want to stream (objects and arrays) and read
+everything else as complete values:
+
+    for key in reader.iter_object():
+        items = reader.iter_array_if_next() if key == 'rows' else None
+        if items is None:
+            value = reader.read_value()
+        else:
+            for _ in items:
+                row = reader.read_value()
+
+Every key yielded by iter_object and every step of an array iterator must
+have its value consumed before advancing.
+"""
+import gzip
+import io
+import json
+from typing import IO, Iterator, Optional, Tuple
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+class JsonStreamReader:
+    """Incremental JSON reader over a text stream, holding one value at a time"""
+
+    def __init__(self, stream: IO[str], chunk_size: int = 64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Read more text, growing the read size with the pending value"""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        chunk = self.stream.read(max(self.chunk_size, len(self._buffer)))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Invalid JSON: expected one of {chars!r}, found {char or 'end of file'!r}")
+        self._pos += 1
+        return char
+
+    def read_value(self):
+        """Decode the next complete JSON value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut off by the buffer edge decodes as a shorter number
+            # ("-2." of "-2.5e10" gives -2), so it must end before the edge
+            if not self._eof and (end == len(self._buffer) or self._buffer[end] in _NUMBER_CHARS):
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON: object keys must be strings")
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def _iter_array(self) -> Iterator[None]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield None
+            if self._expect(',]') == ']':
+                return
+
+    def iter_array_if_next(self) -> Optional[Iterator[None]]:
+        return self._iter_array() if self._peek() == '[' else None
+
+
+class MsgpackStreamReader:
+    """The same interface over a MessagePack stream"""
+
+    def __init__(self, stream: IO[bytes]):
+        import msgpack
+        self._unpacker = msgpack.Unpacker(stream, raw=False)
+
+    def read_value(self):
+        return self._unpacker.unpack()
+
+    def iter_object(self) -> Iterator[str]:
+        for _ in range(self._unpacker.read_map_header()):
+            key = self._unpacker.unpack()
+            if not isinstance(key, str):
+                raise ValueError("Invalid msgpack: map keys must be strings")
+            yield key
+
+    def iter_array_if_next(self) -> Optional[Iterator[None]]:
+        try:
+            length = self._unpacker.read_array_header()
+        except ValueError:
+            return None
+        return (None for _ in range(length))
+
+
+def stream_format(filename: str) -> Tuple[str, str]:
+    """(compression, format) from a file name such as model.msgpack.zst"""
+    name = filename.lower()
+    compression = 'none'
+    if name.endswith('.gz'):
+        compression, name = 'gzip', name[:-3]
+    elif name.endswith('.zst'):
+        compression, name = 'zstd', name[:-4]
+    for fmt in ('msgpack', 'json'):
+        if name.endswith('.' + fmt):
+            return compression, fmt
+    raise ValueError("Invalid file format. Please upload a .json or .msgpack file, optionally .gz/.zst compressed")
+
+
+def open_stream_reader(stream: IO[bytes], filename: str):
+    """Pick decompression and format from the file name"""
+    compression, fmt = stream_format(filename)
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif compression == 'zstd':
+        import zstandard
+        stream = zstandard.ZstdDecompressor().stream_reader(stream)
+
+    if fmt == 'msgpack':
+        return MsgpackStreamReader(stream)
+    return JsonStreamReader(io.TextIOWrapper(stream, encoding='utf-8'))
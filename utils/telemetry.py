@@ -0,0 +1,226 @@
+"""Coalesced training telemetry for Socket.IO clients.
+
+Training steps are recorded per stream (the shared engine or one model)
+into a pending delta: the latest confidence of every pattern that changed
+and a histogram of scores. Every `interval` seconds the deltas are merged
+into each subscriber's own delta, and subscribers that are due get one
+frame carrying everything since their last one. A subscriber is due when
+its rate cap allows another frame and it has fewer than `max_in_flight`
+unacknowledged frames; otherwise the frame is skipped and its changes
+stay merged for the next one, so slow clients get fewer, larger frames
+rather than an unbounded backlog. A subscriber whose pending delta grows
+past `max_patterns` gets a reset frame instead and should clear its view.
+Every reset frame, including the first one after subscribing, is followed
+by a snapshot frame holding the `max_patterns` most confident patterns of
+the stream's engine, so the view is repopulated without waiting for
+training to touch those patterns again.
+"""
+import heapq
+import threading
+import time
+import weakref
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+HISTOGRAM_BINS = 10
+
+
+class _Delta:
+    """Changes accumulated since the last frame"""
+
+    def __init__(self, reset: bool = False):
+        self.patterns: Dict[str, float] = {}
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.samples = 0
+        self.reset = reset
+
+    def add(self, patterns: Dict[str, float], histogram: np.ndarray, samples: int, max_patterns: int):
+        if not self.reset:
+            self.patterns.update(patterns)
+            if len(self.patterns) > max_patterns:
+                self.patterns = {}
+                self.reset = True
+        self.histogram += histogram
+        self.samples += samples
+
+    def merge(self, other: '_Delta', max_patterns: int):
+        if other.reset:
+            self.patterns = {}
+            self.reset = True
+        self.add(other.patterns, other.histogram, other.samples, max_patterns)
+
+    @property
+    def empty(self) -> bool:
+        return not self.samples and not self.reset
+
+
+class _Subscriber:
+    def __init__(self, sid: str, stream, min_interval: float):
+        self.sid = sid
+        self.stream = stream
+        self.min_interval = min_interval
+        self.delta = _Delta(reset=True)
+        self.last_sent = 0.0
+        self.in_flight: Dict[int, float] = {}
+        self.sent = 0
+        self.skipped = 0
+
+
+class TrainingTelemetry:
+    def __init__(self, send: Callable[[str, Dict, Callable], None], interval: float = 0.25,
+                 max_rate: float = 4.0, max_in_flight: int = 2, ack_timeout: float = 5.0,
+                 max_patterns: int = 1000):
+        """send(sid, frame, on_ack) delivers one frame to one client"""
+        self.send = send
+        self.interval = interval
+        self.max_rate = max_rate
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.max_patterns = max_patterns
+        self._lock = threading.Lock()
+        self._pending: Dict[object, _Delta] = {}
+        self._summaries: Dict[object, Dict] = {}
+        # Weak, so telemetry does not keep evicted model engines alive
+        self._engines = weakref.WeakValueDictionary()
+        self._subscribers: Dict[str, _Subscriber] = {}
+        self._sequence = 0
+
+    def observer(self, stream, engine) -> Callable[[List[float], Dict[str, float]], None]:
+        """Callback for engine.training_observer that records into a stream"""
+        with self._lock:
+            self._engines[stream] = engine
+
+        def observe(scores, patterns):
+            self.record(stream, scores, patterns, self._summary(engine))
+        return observe
+
+    @staticmethod
+    def _summary(engine) -> Dict:
+        return {
+            'level': engine.current_level,
+            'level_stats': dict(engine.memory['level_stats']),
+            'pattern_count': len(engine.pattern_keys)
+        }
+
+    def _view(self, stream) -> Optional[Tuple[Dict[str, float], Dict]]:
+        """The stream engine's most confident patterns and its summary"""
+        with self._lock:
+            engine = self._engines.get(stream)
+        if engine is None:
+            return None
+        top = heapq.nlargest(self.max_patterns,
+                             zip(engine.pattern_keys, engine.patterns.confidences),
+                             key=itemgetter(1))
+        return dict(top), self._summary(engine)
+
+    def record(self, stream, scores: List[float], patterns: Dict[str, float], summary: Dict):
+        histogram, _ = np.histogram(scores, bins=HISTOGRAM_BINS, range=(0.0, 1.0))
+        with self._lock:
+            delta = self._pending.get(stream)
+            if delta is None:
+                delta = self._pending[stream] = _Delta()
+            delta.add(patterns, histogram, len(scores), self.max_patterns)
+            self._summaries[stream] = summary
+
+    def subscribe(self, sid: str, stream, max_rate: Optional[float] = None):
+        rate = min(max_rate or self.max_rate, self.max_rate)
+        with self._lock:
+            self._subscribers[sid] = _Subscriber(sid, stream, 1.0 / rate)
+
+    def unsubscribe(self, sid: str):
+        with self._lock:
+            self._subscribers.pop(sid, None)
+
+    def ack(self, sid: str, seq: int):
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is not None:
+                subscriber.in_flight.pop(seq, None)
+
+    def flush(self):
+        """Merge pending deltas into subscribers and send the frames that are due"""
+        now = time.monotonic()
+        frames = []
+        resets = []
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for subscriber in self._subscribers.values():
+                delta = pending.get(subscriber.stream)
+                if delta is not None:
+                    subscriber.delta.merge(delta, self.max_patterns)
+                if subscriber.delta.empty:
+                    continue
+
+                # Frames never acknowledged count as lost after a timeout
+                for seq, sent_at in list(subscriber.in_flight.items()):
+                    if now - sent_at > self.ack_timeout:
+                        del subscriber.in_flight[seq]
+                if (now - subscriber.last_sent < subscriber.min_interval
+                        or len(subscriber.in_flight) >= self.max_in_flight):
+                    subscriber.skipped += 1
+                    continue
+
+                self._sequence += 1
+                frames.append((subscriber.sid, self._frame(subscriber, self._sequence,
+                                                           subscriber.delta)))
+                if subscriber.delta.reset:
+                    resets.append(subscriber)
+                subscriber.delta = _Delta()
+                subscriber.last_sent = now
+                subscriber.in_flight[self._sequence] = now
+                subscriber.sent += 1
+
+        if resets:
+            # Read outside the lock so training steps are not held up
+            views = {stream: self._view(stream) for stream in {s.stream for s in resets}}
+            with self._lock:
+                for subscriber in resets:
+                    view = views[subscriber.stream]
+                    if view is None or self._subscribers.get(subscriber.sid) is not subscriber:
+                        continue
+                    patterns, summary = view
+                    snapshot = _Delta()
+                    snapshot.patterns = patterns
+                    self._sequence += 1
+                    frames.append((subscriber.sid, self._frame(subscriber, self._sequence, snapshot,
+                                                               summary, is_snapshot=True)))
+                    subscriber.in_flight[self._sequence] = now
+                    subscriber.sent += 1
+
+        for sid, frame in frames:
+            self.send(sid, frame, lambda *args, sid=sid, seq=frame['seq']: self.ack(sid, seq))
+
+    def _frame(self, subscriber: _Subscriber, seq: int, delta: _Delta,
+               summary: Optional[Dict] = None, is_snapshot: bool = False) -> Dict:
+        if summary is None:
+            summary = self._summaries.get(subscriber.stream, {})
+        return {
+            'seq': seq,
+            'stream': subscriber.stream,
+            'reset': delta.reset,
+            'snapshot': is_snapshot,
+            'samples': delta.samples,
+            'patterns': delta.patterns,
+            'histogram': {'bin_width': 1.0 / HISTOGRAM_BINS, 'counts': delta.histogram.tolist()},
+            'skipped_frames': subscriber.skipped,
+            **summary
+        }
+
+    def run(self, sleep: Callable[[float], None] = time.sleep):
+        """Flush loop for a background task"""
+        while True:
+            sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Telemetry error: {str(e)}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'frames_sent': sum(s.sent for s in self._subscribers.values()),
+                'frames_skipped': sum(s.skipped for s in self._subscribers.values())
+            }